@@ -1,5 +1,27 @@
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
+PAYLOAD_INDEX_TYPES = ("keyword", "integer", "float", "bool", "geo", "text")
+
+def parse_payload_indexes(value):
+    """Разбирает "поле:тип,поле:тип"; некорректные записи пропускаются с предупреждением"""
+    indexes = {}
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        field_name, sep, field_type = (part.strip() for part in entry.partition(":"))
+        if not sep or not field_name or field_type.lower() not in PAYLOAD_INDEX_TYPES:
+            logger.warning(
+                f"PAYLOAD_INDEXES: пропущена запись '{entry}', ожидается поле:тип "
+                f"с типом из {', '.join(PAYLOAD_INDEX_TYPES)}"
+            )
+            continue
+        indexes[field_name] = field_type.lower()
+    return indexes
+
 class Config:
     """Конфигурация приложения для разных сред"""
     
@@ -14,6 +36,15 @@ class Config:
     
     REDIS_PORT = 6379
     
+    # Узлы Redis для шардирования кеша: "host:port,host:port"
+    REDIS_NODES = [
+        node.strip()
+        for node in os.getenv("REDIS_NODES", f"{REDIS_HOST}:{REDIS_PORT}").split(",")
+        if node.strip()
+    ]
+    # Число виртуальных узлов на каждый узел Redis в кольце хеширования
+    REDIS_RING_REPLICAS = int(os.getenv("REDIS_RING_REPLICAS", "160"))
+    
     # Настройки Qdrant
     if ENV == "kubernetes":
         QDRANT_HOST = "qdrant"
@@ -21,3 +52,77 @@ class Config:
         QDRANT_HOST = "localhost"  # Для локальной разработки
     
     QDRANT_PORT = 6333
+    
+    # Шарды коллекции: "host:port/collection,...". Точки распределяются по хешу id.
+    # Реплики шарда перечисляются через "|": "qdrant-a:6333|qdrant-b:6333/documents"
+    QDRANT_SHARDS = [
+        shard.strip()
+        for shard in os.getenv("QDRANT_SHARDS", f"{QDRANT_HOST}:{QDRANT_PORT}/documents").split(",")
+        if shard.strip()
+    ]
+    # Хеджирование поиска по репликам: дубль уходит, если ответа нет дольше перцентиля
+    HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+    HEDGE_INITIAL_DELAY_MS = float(os.getenv("HEDGE_INITIAL_DELAY_MS", "50"))
+    HEDGE_MIN_DELAY_MS = float(os.getenv("HEDGE_MIN_DELAY_MS", "5"))
+    # Максимальная доля запросов, для которых разрешен хедж
+    HEDGE_MAX_RATE = float(os.getenv("HEDGE_MAX_RATE", "0.05"))
+    
+    # Отложенная запись (write-behind) для одиночных POST /vectors
+    WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() == "true"
+    WRITE_BEHIND_QUEUE_SIZE = int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", "10000"))
+    WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "256"))
+    WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "0.5"))
+    # Сколько секунд ждать места в очереди, прежде чем ответить 503
+    WRITE_BEHIND_PUT_TIMEOUT = float(os.getenv("WRITE_BEHIND_PUT_TIMEOUT", "1.0"))
+    # Список Redis для пачек, не записанных при остановке; дописываются при старте
+    WRITE_BEHIND_SPILL_KEY = os.getenv("WRITE_BEHIND_SPILL_KEY", "ingest:spill")
+    
+    # Время жизни записей кеша поиска, секунды
+    SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "300"))
+    
+    # Горячие запросы: доля запросов /search, попадающих в выборку, и размер набора
+    HOT_QUERY_SAMPLE_RATE = float(os.getenv("HOT_QUERY_SAMPLE_RATE", "0.1"))
+    HOT_QUERY_CAPACITY = int(os.getenv("HOT_QUERY_CAPACITY", "1000"))
+    # Прогрев кеша: при старте и каждые WARMUP_INTERVAL секунд (0 - только при старте)
+    WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+    WARMUP_INTERVAL = float(os.getenv("WARMUP_INTERVAL", "60"))
+    WARMUP_TOP = int(os.getenv("WARMUP_TOP", "500"))
+    # Запрос обновляется, если до истечения записи осталось меньше стольких секунд
+    WARMUP_REFRESH_BEFORE = float(os.getenv("WARMUP_REFRESH_BEFORE", "120"))
+    WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", "8"))
+    
+    # Максимум одновременно выполняемых запросов на одно соединение /ws/search
+    WS_MAX_IN_FLIGHT = int(os.getenv("WS_MAX_IN_FLIGHT", "64"))
+    
+    # Oversampling по умолчанию для /search: кандидаты берутся с квантизацией
+    # без rescore в Qdrant и переранжируются точным косинусом в NumPy
+    SEARCH_OVERSAMPLE = float(os.getenv("SEARCH_OVERSAMPLE", "1.0"))
+    
+    # Индексы payload коллекции documents: "поле:тип,поле:тип" (keyword, integer, float, bool)
+    PAYLOAD_INDEXES = parse_payload_indexes(os.getenv("PAYLOAD_INDEXES", "type:keyword"))
+    
+    # Размер страницы scroll для GET /vectors/export
+    EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "256"))
+    
+    # Мониторинг дрифта векторов запросов: доля /search в выборке (0 - выключен),
+    # длина потока Redis, окно агрегации (секунды) и пороги срабатывания
+    DRIFT_SAMPLE_RATE = float(os.getenv("DRIFT_SAMPLE_RATE", "0"))
+    DRIFT_STREAM_MAXLEN = int(os.getenv("DRIFT_STREAM_MAXLEN", "100000"))
+    DRIFT_WINDOW = float(os.getenv("DRIFT_WINDOW", "300"))
+    DRIFT_MIN_SAMPLES = int(os.getenv("DRIFT_MIN_SAMPLES", "200"))
+    DRIFT_PSI_THRESHOLD = float(os.getenv("DRIFT_PSI_THRESHOLD", "0.2"))
+    DRIFT_MEAN_SHIFT_THRESHOLD = float(os.getenv("DRIFT_MEAN_SHIFT_THRESHOLD", "0.25"))
+    # Метрики дрифта пишутся в MLflow; пустой URI отключает запись
+    MLFLOW_TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI", "")
+    DRIFT_MLFLOW_EXPERIMENT = os.getenv("DRIFT_MLFLOW_EXPERIMENT", "Data Quality Monitoring")
+    
+    # /predict: закрепленная версия модели из MLflow Model Registry (пусто - выключено)
+    PREDICT_MODEL_NAME = os.getenv("PREDICT_MODEL_NAME", "Iris_RandomForest")
+    PREDICT_MODEL_VERSION = os.getenv("PREDICT_MODEL_VERSION", "")
+    # Микро-пачки: максимум строк и ожидание добора пачки, миллисекунды
+    PREDICT_MAX_BATCH = int(os.getenv("PREDICT_MAX_BATCH", "256"))
+    PREDICT_MAX_WAIT_MS = float(os.getenv("PREDICT_MAX_WAIT_MS", "2"))
+    # POST /predict/model требует заголовок X-Admin-Token с этим значением (пусто - выключено);
+    # новая версия хранится в Redis, остальные реплики проверяют ее раз в PREDICT_SYNC_INTERVAL секунд
+    PREDICT_ADMIN_TOKEN = os.getenv("PREDICT_ADMIN_TOKEN", "")
+    PREDICT_SYNC_INTERVAL = float(os.getenv("PREDICT_SYNC_INTERVAL", "5"))
@@ -0,0 +1,371 @@
+import asyncio
+import base64
+import json
+import logging
+import random
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import numpy as np
+import requests
+
+from .sharding import ShardedRedis
+
+logger = logging.getLogger(__name__)
+
+DRIFT_STREAM_KEY = "drift:queries"
+DRIFT_REFERENCE_KEY = "drift:reference"
+DRIFT_LOCK_KEY = "drift:aggregator:lock"
+# Текущее окно и последние метрики лидера: их читают остальные реплики
+DRIFT_WINDOW_KEY = "drift:window"
+DRIFT_SCORES_KEY = "drift:scores"
+
+# Норма вектора: логарифмическая шкала, чтобы не зависеть от масштаба эмбеддингов
+NORM_EDGES = np.logspace(-3, 3, 49)
+# Косинусное расстояние до центроида референса лежит в [0, 2]
+DISTANCE_EDGES = np.linspace(0.0, 2.0, 41)
+
+
+class RunningMoments:
+    """Поразмерные среднее и дисперсия, обновляемые пачками (алгоритм Чана)"""
+
+    def __init__(self, dim: int):
+        self.count = 0
+        self.mean = np.zeros(dim)
+        self.m2 = np.zeros(dim)
+
+    def update(self, batch: np.ndarray):
+        n = batch.shape[0]
+        if n == 0:
+            return
+        batch_mean = batch.mean(axis=0)
+        batch_m2 = ((batch - batch_mean) ** 2).sum(axis=0)
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self.m2 = self.m2 + batch_m2 + delta ** 2 * (self.count * n / total)
+        self.count = total
+
+    @property
+    def variance(self) -> np.ndarray:
+        return self.m2 / max(self.count - 1, 1)
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами: крайние корзины собирают выбросы"""
+
+    def __init__(self, edges: np.ndarray, counts: Optional[np.ndarray] = None):
+        self.edges = edges
+        self.counts = counts if counts is not None else np.zeros(len(edges) + 1)
+
+    def update(self, values: np.ndarray):
+        self.counts += np.bincount(np.searchsorted(self.edges, values), minlength=len(self.counts))
+
+    def psi(self, reference: "Histogram", eps: float = 1e-4) -> float:
+        """Population Stability Index относительно референсной гистограммы"""
+        current = self.counts / max(self.counts.sum(), 1) + eps
+        expected = reference.counts / max(reference.counts.sum(), 1) + eps
+        return float(np.sum((current - expected) * np.log(current / expected)))
+
+
+class QueryProfile:
+    """Компактный профиль распределения векторов запросов"""
+
+    def __init__(self, dim: int, centroid: Optional[np.ndarray] = None):
+        self.dim = dim
+        self.moments = RunningMoments(dim)
+        self.norms = Histogram(NORM_EDGES)
+        self.distances = Histogram(DISTANCE_EDGES)
+        self.centroid = centroid
+
+    @property
+    def count(self) -> int:
+        return self.moments.count
+
+    def update(self, batch: np.ndarray):
+        batch = batch.astype(np.float64, copy=False)
+        self.moments.update(batch)
+        norms = np.linalg.norm(batch, axis=1)
+        self.norms.update(norms)
+        # Без референса расстояния считаются до текущего среднего окна
+        centroid = self.centroid if self.centroid is not None else self.moments.mean
+        centroid_norm = np.linalg.norm(centroid)
+        if centroid_norm > 0:
+            cosine = batch @ centroid / (np.where(norms == 0, 1.0, norms) * centroid_norm)
+            self.distances.update(1.0 - cosine)
+
+    def to_dict(self) -> dict:
+        return {
+            "dim": self.dim,
+            "count": self.moments.count,
+            "mean": self.moments.mean.tolist(),
+            "m2": self.moments.m2.tolist(),
+            "norm_counts": self.norms.counts.tolist(),
+            "distance_counts": self.distances.counts.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "QueryProfile":
+        profile = cls(data["dim"])
+        profile.moments.count = data["count"]
+        profile.moments.mean = np.asarray(data["mean"])
+        profile.moments.m2 = np.asarray(data["m2"])
+        profile.norms.counts = np.asarray(data["norm_counts"], dtype=float)
+        profile.distances.counts = np.asarray(data["distance_counts"], dtype=float)
+        return profile
+
+
+def drift_scores(current: QueryProfile, reference: QueryProfile) -> Dict[str, float]:
+    """Метрики дрифта текущего окна относительно референса"""
+    ref_var = np.maximum(reference.moments.variance, 1e-12)
+    cur_var = np.maximum(current.moments.variance, 1e-12)
+    delta = current.moments.mean - reference.moments.mean
+    return {
+        # Сдвиг центроида в единицах общего разброса референса
+        "mean_shift": float(np.linalg.norm(delta) / np.sqrt(ref_var.sum())),
+        "max_dim_effect_size": float(np.max(np.abs(delta) / np.sqrt(ref_var))),
+        "mean_log_variance_ratio": float(np.mean(np.abs(np.log(cur_var / ref_var)))),
+        "norm_psi": current.norms.psi(reference.norms),
+        "centroid_distance_psi": current.distances.psi(reference.distances),
+    }
+
+
+def encode_vector(vector: List[float]) -> str:
+    return base64.b64encode(np.asarray(vector, dtype="<f4").tobytes()).decode("ascii")
+
+
+def decode_vectors(values: List[str]) -> np.ndarray:
+    return np.stack([np.frombuffer(base64.b64decode(value), dtype="<f4") for value in values])
+
+
+class MlflowRestLogger:
+    """Минимальный клиент REST API MLflow: один запуск на вызов log_run"""
+
+    def __init__(self, tracking_uri: str, experiment_name: str, timeout: float = 10):
+        self.base = tracking_uri.rstrip("/") + "/api/2.0/mlflow"
+        self.experiment_name = experiment_name
+        self.timeout = timeout
+        self._experiment_id = None
+
+    def _call(self, method: str, path: str, **kwargs) -> dict:
+        response = requests.request(method, f"{self.base}/{path}", timeout=self.timeout, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def experiment_id(self) -> str:
+        if self._experiment_id is None:
+            try:
+                data = self._call("GET", "experiments/get-by-name", params={"experiment_name": self.experiment_name})
+                self._experiment_id = data["experiment"]["experiment_id"]
+            except requests.HTTPError:
+                data = self._call("POST", "experiments/create", json={"name": self.experiment_name})
+                self._experiment_id = data["experiment_id"]
+        return self._experiment_id
+
+    def log_run(self, run_name: str, metrics: Dict[str, float], params: Dict[str, str], tags: Dict[str, str]):
+        now = int(time.time() * 1000)
+        run = self._call("POST", "runs/create", json={
+            "experiment_id": self.experiment_id(),
+            "run_name": run_name,
+            "start_time": now,
+            "tags": [{"key": key, "value": str(value)} for key, value in tags.items()],
+        })
+        run_id = run["run"]["info"]["run_id"]
+        self._call("POST", "runs/log-batch", json={
+            "run_id": run_id,
+            "metrics": [
+                {"key": key, "value": value, "timestamp": now, "step": 0} for key, value in metrics.items()
+            ],
+            "params": [{"key": key, "value": str(value)} for key, value in params.items()],
+        })
+        self._call("POST", "runs/update", json={"run_id": run_id, "status": "FINISHED", "end_time": now})
+
+
+class DriftMonitor:
+    """Выборка векторов запросов в поток Redis и агрегация их распределения.
+
+    Выборка пишется в ограниченный поток (XADD MAXLEN ~). Агрегатор
+    читает поток на одной реплике (лидер по блокировке в Redis), держит
+    бегущие моменты и гистограммы окна и в конце окна сравнивает их с
+    референсным профилем, записывая метрики в MLflow.
+
+    Все общее состояние лежит в Redis: лидер публикует профиль окна и
+    последние метрики, а референс перечитывает на каждой итерации.
+    Поэтому статус и сохранение референса работают на любой реплике,
+    а смена референса подхватывается лидером без перезапуска.
+    """
+
+    def __init__(
+        self,
+        redis: ShardedRedis,
+        sample_rate: float = 0.05,
+        stream_maxlen: int = 100000,
+        window: float = 300,
+        min_samples: int = 200,
+        psi_threshold: float = 0.2,
+        mean_shift_threshold: float = 0.25,
+        mlflow: Optional[MlflowRestLogger] = None,
+        read_batch: int = 1000,
+    ):
+        self.redis = redis
+        self.sample_rate = sample_rate
+        self.stream_maxlen = stream_maxlen
+        self.window = window
+        self.min_samples = min_samples
+        self.psi_threshold = psi_threshold
+        self.mean_shift_threshold = mean_shift_threshold
+        self.mlflow = mlflow
+        self.read_batch = read_batch
+        self.profile: Optional[QueryProfile] = None
+        self.reference: Optional[QueryProfile] = None
+        self.last_scores: Optional[dict] = None
+        self._token = uuid.uuid4().hex
+        self._last_id = "$"
+        self._reference_raw = None
+
+    @property
+    def client(self):
+        return self.redis.get_client(DRIFT_STREAM_KEY)
+
+    def should_sample(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def record(self, vector: List[float]):
+        try:
+            self.client.xadd(
+                DRIFT_STREAM_KEY, {"v": encode_vector(vector)}, maxlen=self.stream_maxlen, approximate=True
+            )
+        except Exception as e:
+            logger.debug(f"Не удалось записать вектор для мониторинга дрифта: {e}")
+
+    def load_reference(self) -> Optional[QueryProfile]:
+        """Перечитывает референс из Redis; если он сменился, окно начинается заново"""
+        data = self.redis.get(DRIFT_REFERENCE_KEY)
+        if data != self._reference_raw:
+            self._reference_raw = data
+            self.reference = QueryProfile.from_dict(json.loads(data)) if data else None
+            self._reset_window()
+        return self.reference
+
+    def load_window(self) -> Optional[QueryProfile]:
+        """Профиль окна, опубликованный лидером"""
+        data = self.redis.get(DRIFT_WINDOW_KEY)
+        return QueryProfile.from_dict(json.loads(data)) if data else None
+
+    def save_reference(self) -> dict:
+        """Делает опубликованное окно референсным профилем для всех реплик"""
+        window = self.load_window()
+        if window is None or window.count < self.min_samples:
+            raise ValueError(f"Недостаточно векторов в окне: нужно не меньше {self.min_samples}")
+        self.redis.get_client(DRIFT_REFERENCE_KEY).set(DRIFT_REFERENCE_KEY, json.dumps(window.to_dict()))
+        self.load_reference()
+        return {"status": "saved", "count": window.count}
+
+    def _publish_window(self):
+        if self.profile is None:
+            return
+        # Окно упавшего лидера истекает само
+        self.redis.get_client(DRIFT_WINDOW_KEY).set(
+            DRIFT_WINDOW_KEY, json.dumps(self.profile.to_dict()), ex=int(self.window) + 60
+        )
+
+    def _reset_window(self):
+        centroid = self.reference.moments.mean if self.reference is not None else None
+        dim = self.profile.dim if self.profile is not None else None
+        self.profile = QueryProfile(dim, centroid) if dim is not None else None
+
+    def consume(self, block_ms: int = 1000) -> int:
+        """Читает очередную порцию потока и обновляет профиль окна"""
+        response = self.client.xread({DRIFT_STREAM_KEY: self._last_id}, count=self.read_batch, block=block_ms)
+        if not response:
+            return 0
+        entries = response[0][1]
+        self._last_id = entries[-1][0]
+        batch = decode_vectors([fields["v"] for _, fields in entries])
+        if self.profile is None or self.profile.dim != batch.shape[1]:
+            centroid = self.reference.moments.mean if self.reference is not None else None
+            self.profile = QueryProfile(batch.shape[1], centroid)
+        self.profile.update(batch)
+        self._publish_window()
+        return len(entries)
+
+    def evaluate(self) -> Optional[dict]:
+        """Метрики дрифта окна; None, если нет референса или мало данных"""
+        if self.reference is None or self.profile is None or self.profile.count < self.min_samples:
+            return None
+        if self.reference.dim != self.profile.dim:
+            logger.warning("Размерность запросов не совпадает с референсом дрифта")
+            return None
+        scores = drift_scores(self.profile, self.reference)
+        scores["drift_detected"] = float(
+            scores["norm_psi"] > self.psi_threshold
+            or scores["centroid_distance_psi"] > self.psi_threshold
+            or scores["mean_shift"] > self.mean_shift_threshold
+        )
+        scores["window_samples"] = float(self.profile.count)
+        return scores
+
+    def close_window(self):
+        scores = self.evaluate()
+        if scores is not None:
+            self.last_scores = {"timestamp": time.time(), **scores}
+            self.redis.get_client(DRIFT_SCORES_KEY).set(DRIFT_SCORES_KEY, json.dumps(self.last_scores))
+            logger.info(f"Дрифт векторов запросов: {scores}")
+            if self.mlflow is not None:
+                try:
+                    self.mlflow.log_run(
+                        "Query Vector Drift",
+                        metrics=scores,
+                        params={
+                            "window_seconds": self.window,
+                            "sample_rate": self.sample_rate,
+                            "psi_threshold": self.psi_threshold,
+                            "mean_shift_threshold": self.mean_shift_threshold,
+                        },
+                        tags={"source": "vector-search-app", "analysis_tool": "query_drift_monitor"},
+                    )
+                except Exception as e:
+                    logger.warning(f"Не удалось записать метрики дрифта в MLflow: {e}")
+        self._reset_window()
+        self._publish_window()
+
+    def _is_leader(self, ttl: int) -> bool:
+        client = self.redis.get_client(DRIFT_LOCK_KEY)
+        if client.set(DRIFT_LOCK_KEY, self._token, nx=True, ex=ttl):
+            return True
+        if client.get(DRIFT_LOCK_KEY) == self._token:
+            client.expire(DRIFT_LOCK_KEY, ttl)
+            return True
+        return False
+
+    async def run_forever(self, lock_ttl: int = 30):
+        window_end = time.monotonic() + self.window
+        while True:
+            try:
+                if not await asyncio.to_thread(self._is_leader, lock_ttl):
+                    await asyncio.sleep(lock_ttl / 3)
+                    continue
+                # Референс мог смениться с любой реплики
+                await asyncio.to_thread(self.load_reference)
+                await asyncio.to_thread(self.consume)
+                if time.monotonic() >= window_end:
+                    await asyncio.to_thread(self.close_window)
+                    window_end = time.monotonic() + self.window
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Ошибка агрегатора дрифта: {e}")
+                await asyncio.sleep(5)
+
+    def status(self) -> dict:
+        """Состояние по данным из Redis, одинаковое на всех репликах"""
+        window = self.load_window()
+        reference = self.redis.get(DRIFT_REFERENCE_KEY)
+        scores = self.redis.get(DRIFT_SCORES_KEY)
+        return {
+            "window_samples": window.count if window is not None else 0,
+            "has_reference": reference is not None,
+            "reference_samples": json.loads(reference)["count"] if reference else 0,
+            "last_scores": json.loads(scores) if scores else None,
+        }
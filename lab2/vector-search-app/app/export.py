@@ -0,0 +1,84 @@
+import asyncio
+import json
+import struct
+from typing import AsyncIterator, Callable, Iterable, Optional
+
+import numpy as np
+from qdrant_client.models import Filter, Record
+
+# Бинарный формат f32: для каждой точки
+#   <u16 длина id><id в utf-8><u32 размерность><float32 little-endian * размерность>
+_ID_HEADER = struct.Struct("<H")
+_DIM_HEADER = struct.Struct("<I")
+
+
+def encode_ndjson(points: Iterable[Record], with_vectors: bool, with_payload: bool) -> bytes:
+    lines = []
+    for point in points:
+        record = {"id": point.id}
+        if with_vectors:
+            record["vector"] = point.vector
+        if with_payload:
+            record["payload"] = point.payload
+        lines.append(json.dumps(record, ensure_ascii=False))
+    return ("\n".join(lines) + "\n").encode("utf-8") if lines else b""
+
+
+def encode_f32(points: Iterable[Record]) -> bytes:
+    chunks = []
+    for point in points:
+        point_id = str(point.id).encode("utf-8")
+        vector = np.asarray(point.vector, dtype="<f4")
+        chunks.append(_ID_HEADER.pack(len(point_id)))
+        chunks.append(point_id)
+        chunks.append(_DIM_HEADER.pack(vector.shape[0]))
+        chunks.append(vector.tobytes())
+    return b"".join(chunks)
+
+
+def decode_f32(data: bytes):
+    """Разбирает поток формата f32 в пары (id, np.ndarray)"""
+    position = 0
+    while position < len(data):
+        (id_length,) = _ID_HEADER.unpack_from(data, position)
+        position += _ID_HEADER.size
+        point_id = data[position:position + id_length].decode("utf-8")
+        position += id_length
+        (dim,) = _DIM_HEADER.unpack_from(data, position)
+        position += _DIM_HEADER.size
+        vector = np.frombuffer(data, dtype="<f4", count=dim, offset=position)
+        position += dim * 4
+        yield point_id, vector
+
+
+async def iter_export(
+    scroll: Callable,
+    collection_name: str,
+    export_format: str = "ndjson",
+    scroll_filter: Optional[Filter] = None,
+    with_vectors: bool = True,
+    with_payload: bool = True,
+    batch_size: int = 256,
+) -> AsyncIterator[bytes]:
+    """Обходит коллекцию постранично через scroll и отдает закодированные страницы.
+
+    В памяти одновременно находится не больше одной страницы из batch_size точек.
+    """
+    offset = None
+    while True:
+        points, offset = await asyncio.to_thread(
+            scroll,
+            collection_name=collection_name,
+            scroll_filter=scroll_filter,
+            limit=batch_size,
+            offset=offset,
+            with_payload=with_payload,
+            with_vectors=with_vectors,
+        )
+        if points:
+            if export_format == "f32":
+                yield encode_f32(points)
+            else:
+                yield encode_ndjson(points, with_vectors, with_payload)
+        if offset is None:
+            return
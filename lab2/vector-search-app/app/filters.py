@@ -0,0 +1,49 @@
+import hashlib
+import json
+from typing import List, Optional, Set
+
+from qdrant_client.models import FieldCondition, Filter, MatchAny, MatchValue, Range
+
+from .models import FieldFilter, SearchFilter
+
+
+def _build_condition(field: FieldFilter) -> FieldCondition:
+    if field.match is not None:
+        return FieldCondition(key=field.key, match=MatchValue(value=field.match))
+    if field.any is not None:
+        return FieldCondition(key=field.key, match=MatchAny(any=field.any))
+    return FieldCondition(key=field.key, range=Range(**field.range.model_dump()))
+
+
+def _build_conditions(fields: List[FieldFilter]) -> Optional[List[FieldCondition]]:
+    return [_build_condition(field) for field in fields] or None
+
+
+def build_filter(search_filter: Optional[SearchFilter]) -> Optional[Filter]:
+    """Преобразует фильтр запроса в фильтр Qdrant"""
+    if search_filter is None:
+        return None
+    qdrant_filter = Filter(
+        must=_build_conditions(search_filter.must),
+        should=_build_conditions(search_filter.should),
+        must_not=_build_conditions(search_filter.must_not),
+    )
+    if not (qdrant_filter.must or qdrant_filter.should or qdrant_filter.must_not):
+        return None
+    return qdrant_filter
+
+
+def filter_keys(search_filter: Optional[SearchFilter]) -> Set[str]:
+    """Поля payload, на которые ссылается фильтр"""
+    if search_filter is None:
+        return set()
+    fields = search_filter.must + search_filter.should + search_filter.must_not
+    return {field.key for field in fields}
+
+
+def filter_fingerprint(search_filter: Optional[SearchFilter]) -> str:
+    """Стабильный отпечаток фильтра для ключа кеша; пустая строка без фильтра"""
+    if build_filter(search_filter) is None:
+        return ""
+    canonical = json.dumps(search_filter.model_dump(exclude_none=True), sort_keys=True)
+    return hashlib.md5(canonical.encode("utf-8")).hexdigest()[:16]
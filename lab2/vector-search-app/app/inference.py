@@ -0,0 +1,267 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Callable, List, Optional, Tuple
+
+import numpy as np
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Версия модели /predict, общая для всех реплик
+PREDICT_VERSION_KEY = "predict:model_version"
+
+
+class ModelNotLoadedError(Exception):
+    """Модель для /predict еще не загружена"""
+
+
+class LoadedModel:
+    """Модель из registry вместе с версией, под которой она загружена"""
+
+    def __init__(self, name: str, version: str, model: Any):
+        self.name = name
+        self.version = str(version)
+        self.model = model
+        self.loaded_at = time.time()
+
+    def info(self) -> dict:
+        return {"name": self.name, "version": self.version, "loaded_at": self.loaded_at}
+
+
+def load_registered_model(tracking_uri: str, name: str, version: str) -> LoadedModel:
+    """Загружает закрепленную версию модели sklearn из MLflow Model Registry"""
+    # mlflow нужен только при включенном /predict
+    import mlflow
+    import mlflow.sklearn
+
+    if not tracking_uri:
+        raise ValueError("MLFLOW_TRACKING_URI не задан")
+    mlflow.set_tracking_uri(tracking_uri)
+    model = mlflow.sklearn.load_model(f"models:/{name}/{version}")
+    logger.info(f"Модель '{name}' версии {version} загружена")
+    return LoadedModel(name, version, model)
+
+
+class MicroBatchPredictor:
+    """Собирает одновременные запросы /predict в один векторизованный predict.
+
+    Строки запросов копятся в очереди, пока пачка не наберет max_batch
+    строк или с первой строки не пройдет max_wait секунд. Пачка
+    выполняется одним вызовом model.predict в пуле потоков, результаты
+    раздаются обратно по запросам. Модель подменяется одной операцией
+    присваивания: пачка захватывает ссылку на модель при старте, поэтому
+    уже начатые пачки дорабатывают на старой версии, а новые идут в новую.
+    """
+
+    def __init__(self, max_batch: int = 256, max_wait: float = 0.002, max_queue: int = 10000):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.current: Optional[LoadedModel] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._swap_lock = asyncio.Lock()
+        # Пачка, которая собирается или выполняется сейчас
+        self._batch: List[Tuple[List[List[float]], asyncio.Future]] = []
+        self._closed = False
+        self.batch_sizes = deque(maxlen=2048)
+
+    async def start(self):
+        self._closed = False
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._closed = True
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Запросы из очереди и прерванной пачки иначе ждали бы ответа вечно
+        pending = self._batch
+        self._batch = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        error = ModelNotLoadedError("Сервис /predict остановлен")
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(error)
+
+    async def swap(self, loader: Callable[[], LoadedModel]) -> LoadedModel:
+        """Загружает новую версию вне цикла событий и атомарно подменяет текущую"""
+        async with self._swap_lock:
+            model = await asyncio.to_thread(loader)
+            previous = self.current
+            self.current = model
+            metrics.incr("predict.model_swaps")
+            logger.info(
+                f"Модель для /predict: {previous.version if previous else '-'} -> {model.version}"
+            )
+            return model
+
+    async def predict(self, rows: List[List[float]]) -> Tuple[list, str]:
+        """Предсказания для строк запроса и версия модели, которая их сделала"""
+        if self.current is None or self._queue is None or self._closed:
+            raise ModelNotLoadedError("Модель для /predict не загружена")
+        # Неверная строка уронила бы всю пачку, поэтому ширина и значения проверяются до очереди
+        width = getattr(self.current.model, "n_features_in_", None)
+        if width is not None and any(len(row) != width for row in rows):
+            raise ValueError(f"Ожидается {width} признаков в каждой строке")
+        if not all(math.isfinite(value) for row in rows for value in row):
+            raise ValueError("Признаки должны быть конечными числами")
+        future = asyncio.get_running_loop().create_future()
+        started = time.perf_counter()
+        await self._queue.put((rows, future))
+        if self._closed and not future.done():
+            # Очередь освободилась при остановке, разбирать ее уже некому
+            future.set_exception(ModelNotLoadedError("Сервис /predict остановлен"))
+        try:
+            return await future
+        finally:
+            metrics.observe("predict.request", time.perf_counter() - started)
+
+    async def _collect(self) -> List[Tuple[List[List[float]], asyncio.Future]]:
+        items = self._batch = [await self._queue.get()]
+        size = len(items[0][0])
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while size < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+            items.append(item)
+            size += len(item[0])
+        return items
+
+    async def _run(self):
+        while True:
+            items = await self._collect()
+            model = self.current
+            rows = [row for request_rows, _ in items for row in request_rows]
+            try:
+                started = time.perf_counter()
+                predictions = await asyncio.to_thread(model.model.predict, np.asarray(rows, dtype=float))
+                metrics.observe("predict.batch", time.perf_counter() - started)
+            except Exception as e:
+                metrics.incr("predict.failed_batches")
+                if len(items) == 1:
+                    if not items[0][1].done():
+                        items[0][1].set_exception(e)
+                else:
+                    # Ошибку одного запроса не переносим на соседей: каждый повторяется отдельно
+                    await self._retry_separately(model, items)
+                self._batch = []
+                continue
+            self.batch_sizes.append(len(rows))
+            metrics.incr("predict.batches")
+            metrics.incr("predict.rows", len(rows))
+            offset = 0
+            for request_rows, future in items:
+                result = predictions[offset:offset + len(request_rows)].tolist()
+                offset += len(request_rows)
+                if not future.done():
+                    future.set_result((result, model.version))
+            self._batch = []
+
+    async def _retry_separately(self, model: LoadedModel, items: List[Tuple[List[List[float]], asyncio.Future]]):
+        for request_rows, future in items:
+            try:
+                predictions = await asyncio.to_thread(model.model.predict, np.asarray(request_rows, dtype=float))
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            if not future.done():
+                future.set_result((predictions.tolist(), model.version))
+
+    def stats(self) -> dict:
+        sizes = np.fromiter(self.batch_sizes, dtype=float)
+        stats = {
+            "model": self.current.info() if self.current is not None else None,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+        if sizes.size:
+            p50, p95 = np.percentile(sizes, [50, 95])
+            stats["batch_size"] = {
+                "mean": round(float(sizes.mean()), 2),
+                "p50": float(p50),
+                "p95": float(p95),
+                "max": float(sizes.max()),
+            }
+        return stats
+
+
+class ModelVersionSync:
+    """Одна версия модели /predict на всех репликах.
+
+    Версия хранится в Redis: publish загружает модель на своей реплике и
+    записывает ключ, остальные реплики опрашивают его раз в interval
+    секунд и подменяют модель у себя. Опрос, а не pub/sub: реплика,
+    перезапущенная или отключенная в момент публикации, все равно
+    придет к сохраненной версии.
+    """
+
+    def __init__(
+        self,
+        redis,
+        predictor: MicroBatchPredictor,
+        loader: Callable[[str], LoadedModel],
+        key: str = PREDICT_VERSION_KEY,
+        interval: float = 5.0,
+    ):
+        self.redis = redis
+        self.predictor = predictor
+        self.loader = loader
+        self.key = key
+        self.interval = interval
+        # Версия, которую не удалось загрузить: не повторяем на каждом опросе
+        self._failed: Optional[str] = None
+
+    def stored_version(self) -> Optional[str]:
+        return self.redis.get(self.key)
+
+    async def publish(self, version: str) -> LoadedModel:
+        """Загружает версию здесь и, если загрузка удалась, объявляет ее остальным репликам"""
+        model = await self.predictor.swap(lambda: self.loader(version))
+        await asyncio.to_thread(self.redis.get_client(self.key).set, self.key, model.version)
+        return model
+
+    async def sync_once(self, default: Optional[str] = None) -> bool:
+        """Подтягивает сохраненную версию (или default, если ее нет); True, если модель сменилась"""
+        version = await asyncio.to_thread(self.stored_version) or default
+        current = self.predictor.current
+        if not version or version == self._failed or (current is not None and current.version == version):
+            return False
+        try:
+            await self.predictor.swap(lambda: self.loader(version))
+        except Exception:
+            self._failed = version
+            raise
+        self._failed = None
+        return True
+
+    async def run_forever(self):
+        while True:
+            try:
+                await self.sync_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Не удалось подтянуть версию модели для /predict: {e}")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import uuid
+from typing import Callable, List, Optional
+
+from qdrant_client.models import PointStruct
+
+logger = logging.getLogger(__name__)
+
+
+class BufferFullError(Exception):
+    """Очередь отложенной записи переполнена"""
+
+
+class RedisSpill:
+    """Надежное хранилище пачек, которые не удалось записать при остановке.
+
+    Точки лежат в списке Redis в порядке поступления (JSON PointStruct).
+    Из списка они удаляются только после успешного upsert, а replay
+    выполняет одна реплика за раз под блокировкой.
+    """
+
+    def __init__(self, redis, key: str = "ingest:spill", lock_ttl: int = 60):
+        self.redis = redis
+        self.key = key
+        self.lock_key = f"{key}:lock"
+        self.lock_ttl = lock_ttl
+        self._token = uuid.uuid4().hex
+
+    @property
+    def _client(self):
+        # Список и блокировка лежат на узле-владельце ключа списка
+        return self.redis.get_client(self.key)
+
+    def save(self, points: List[PointStruct]):
+        self._client.rpush(self.key, *[point.model_dump_json() for point in points])
+
+    def peek(self, count: int) -> List[PointStruct]:
+        return [PointStruct.model_validate_json(item) for item in self._client.lrange(self.key, 0, count - 1)]
+
+    def drop(self, count: int):
+        self._client.ltrim(self.key, count, -1)
+
+    def size(self) -> int:
+        return self._client.llen(self.key)
+
+    def lock(self) -> bool:
+        client = self._client
+        if client.set(self.lock_key, self._token, nx=True, ex=self.lock_ttl):
+            return True
+        if client.get(self.lock_key) == self._token:
+            client.expire(self.lock_key, self.lock_ttl)
+            return True
+        return False
+
+    def unlock(self):
+        client = self._client
+        if client.get(self.lock_key) == self._token:
+            client.delete(self.lock_key)
+
+
+class WriteBehindBuffer:
+    """Буфер отложенной записи точек в Qdrant.
+
+    Точка подтверждается после попадания в ограниченную очередь, фоновая
+    задача собирает очередь в пачки по размеру или по времени и выполняет
+    один upsert на пачку. При остановке очередь дочищается до конца;
+    пачки, которые так и не записались, уходят в spill и дописываются
+    при следующем старте раньше новых точек.
+    """
+
+    def __init__(
+        self,
+        upsert: Callable[[List[PointStruct]], None],
+        max_size: int = 10000,
+        batch_size: int = 256,
+        flush_interval: float = 0.5,
+        put_timeout: float = 1.0,
+        shutdown_retries: int = 3,
+        spill: Optional[RedisSpill] = None,
+    ):
+        self._upsert = upsert
+        self.spill = spill
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.shutdown_retries = shutdown_retries
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self._spilling = False
+        self.accepted = 0
+        self.flushed = 0
+        self.rejected = 0
+        self.failed_batches = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.lost = 0
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._closed = False
+        self._spilling = False
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"Буфер отложенной записи запущен: очередь {self.max_size}, "
+            f"пачка {self.batch_size}, интервал {self.flush_interval}s"
+        )
+
+    async def put(self, point: PointStruct):
+        """Ставит точку в очередь; при переполнении ждет put_timeout, затем BufferFullError"""
+        if self._queue is None or self._closed:
+            raise BufferFullError("Буфер отложенной записи остановлен")
+        try:
+            await asyncio.wait_for(self._queue.put(point), timeout=self.put_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise BufferFullError(f"Очередь отложенной записи заполнена ({self.max_size})")
+        self.accepted += 1
+
+    async def stop(self):
+        """Перестает принимать точки и дожидается записи всего, что уже в очереди"""
+        if self._task is None:
+            return
+        self._closed = True
+        # Сентинел встает в конец очереди, поэтому все принятые точки будут записаны до него
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        logger.info(f"Буфер отложенной записи остановлен, записано точек: {self.flushed}")
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_size": self.max_size,
+            "accepted": self.accepted,
+            "flushed": self.flushed,
+            "rejected": self.rejected,
+            "failed_batches": self.failed_batches,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "lost": self.lost,
+        }
+
+    async def _replay(self):
+        """Дописывает пачки из spill, оставшиеся от прошлой остановки, до новых точек"""
+        if self.spill is None:
+            return
+        attempt = 0
+        while True:
+            try:
+                if not await asyncio.to_thread(self.spill.lock):
+                    logger.info("Spill дописывает другая реплика")
+                    return
+                batch = await asyncio.to_thread(self.spill.peek, self.batch_size)
+                if not batch:
+                    await asyncio.to_thread(self.spill.unlock)
+                    return
+                await asyncio.to_thread(self._upsert, batch)
+                # Удаляем только после успешной записи: при сбое точки останутся в spill
+                await asyncio.to_thread(self.spill.drop, len(batch))
+                self.flushed += len(batch)
+                self.replayed += len(batch)
+                attempt = 0
+            except Exception as e:
+                attempt += 1
+                self.failed_batches += 1
+                logger.error(f"Ошибка дозаписи точек из spill (попытка {attempt}): {e}")
+                if self._closed:
+                    # Точки остаются в spill до следующего старта
+                    return
+                await asyncio.sleep(min(0.5 * 2 ** attempt, 30))
+
+    async def _run(self):
+        await self._replay()
+        loop = asyncio.get_running_loop()
+        while True:
+            point = await self._queue.get()
+            if point is None:
+                return
+            batch = [point]
+            deadline = loop.time() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    point = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+                if point is None:
+                    stop = True
+                    break
+                batch.append(point)
+            await self._flush(batch)
+            if stop:
+                return
+
+    async def _flush(self, batch: List[PointStruct]):
+        attempt = 0
+        while True:
+            if self._spilling:
+                # Qdrant уже не ответил при остановке: остальные пачки сразу в spill
+                await self._spill(batch)
+                return
+            try:
+                await asyncio.to_thread(self._upsert, batch)
+                self.flushed += len(batch)
+                return
+            except Exception as e:
+                attempt += 1
+                self.failed_batches += 1
+                logger.error(f"Ошибка записи пачки из {len(batch)} точек (попытка {attempt}): {e}")
+                if self._closed and attempt >= self.shutdown_retries:
+                    self._spilling = self.spill is not None
+                    await self._spill(batch)
+                    return
+                await asyncio.sleep(min(0.5 * 2 ** attempt, 30))
+
+    async def _spill(self, batch: List[PointStruct]):
+        if self.spill is not None:
+            try:
+                await asyncio.to_thread(self.spill.save, batch)
+                self.spilled += len(batch)
+                logger.warning(f"Точки сохранены в spill до следующего старта: {len(batch)}")
+                return
+            except Exception as e:
+                logger.error(f"Не удалось сохранить пачку в spill: {e}")
+        self.lost += len(batch)
+        logger.error(f"Потеряно точек при остановке: {len(batch)}")
@@ -0,0 +1,192 @@
+"""Офлайн-загрузчик векторов в Qdrant.
+
+Читает векторы из .npy через memory map и payload из JSONL (строка i
+соответствует вектору i), загружает их в шарды Config.QDRANT_SHARDS
+пулом параллельных воркеров большими пачками. Прогресс сохраняется в файл
+контрольной точки, поэтому прерванную загрузку можно продолжить.
+
+Пример:
+    APP_ENV=kubernetes python -m app.loader --vectors vectors.npy \\
+        --payloads payloads.jsonl --workers 8 --batch-size 1000
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+from qdrant_client.models import Distance, PointStruct, VectorParams
+
+from .config import Config
+from .qdrant_shards import ShardedQdrant
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class Checkpoint:
+    """Контрольная точка: смещение, до которого все пачки гарантированно загружены.
+
+    Пачки завершаются не по порядку, поэтому сохраняется только непрерывный
+    префикс завершенных пачек.
+    """
+
+    def __init__(self, path: Optional[str], start: int = 0):
+        self.path = path
+        self.offset = start
+        self._done = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Optional[str]) -> "Checkpoint":
+        if path and os.path.exists(path):
+            with open(path) as f:
+                return cls(path, json.load(f)["offset"])
+        return cls(path)
+
+    def complete(self, start: int, end: int) -> int:
+        with self._lock:
+            self._done[start] = end
+            while self.offset in self._done:
+                self.offset = self._done.pop(self.offset)
+            self._save()
+            return self.offset
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"offset": self.offset}, f)
+        os.replace(tmp_path, self.path)
+
+
+def iter_batches(
+    vectors: np.ndarray,
+    payloads_path: Optional[str],
+    start: int,
+    batch_size: int,
+    id_offset: int = 0,
+) -> Iterator[Tuple[int, int, List[PointStruct]]]:
+    """Пачки точек начиная со смещения start; payload читается из JSONL построчно"""
+    payloads_file = open(payloads_path, encoding="utf-8") if payloads_path else None
+    payloads = itertools.islice(payloads_file, start, None) if payloads_file else None
+    try:
+        for batch_start in range(start, vectors.shape[0], batch_size):
+            batch_end = min(batch_start + batch_size, vectors.shape[0])
+            # Копируем только текущую пачку из memory map
+            block = np.asarray(vectors[batch_start:batch_end], dtype=np.float32)
+            points = []
+            for row, vector in enumerate(block):
+                payload = json.loads(next(payloads)) if payloads is not None else {}
+                points.append(
+                    PointStruct(id=id_offset + batch_start + row, vector=vector.tolist(), payload=payload)
+                )
+            yield batch_start, batch_end, points
+    finally:
+        if payloads_file is not None:
+            payloads_file.close()
+
+
+def ensure_collections(qdrant: ShardedQdrant, dim: int):
+    for shard in qdrant.shards:
+        for client in shard.clients:
+            names = [col.name for col in client.get_collections().collections]
+            if shard.collection not in names:
+                client.create_collection(
+                    collection_name=shard.collection,
+                    vectors_config=VectorParams(size=dim, distance=Distance.COSINE),
+                )
+                logger.info(f"Создана новая коллекция Qdrant '{shard.name}'")
+
+
+def load(
+    vectors_path: str,
+    payloads_path: Optional[str] = None,
+    workers: int = 4,
+    batch_size: int = 1000,
+    checkpoint_path: Optional[str] = None,
+    start: Optional[int] = None,
+    id_offset: int = 0,
+    report_interval: float = 5.0,
+) -> int:
+    vectors = np.load(vectors_path, mmap_mode="r")
+    if vectors.ndim != 2:
+        raise ValueError(f"Ожидается двумерный массив векторов, получено измерений: {vectors.ndim}")
+    total = vectors.shape[0]
+
+    checkpoint = Checkpoint.load(checkpoint_path)
+    if start is not None:
+        checkpoint.offset = start
+    logger.info(f"Загрузка {total} векторов размерности {vectors.shape[1]} с позиции {checkpoint.offset}")
+
+    # Те же шарды, что и у приложения: каждая точка попадает в свой шард
+    qdrant = ShardedQdrant(Config.QDRANT_SHARDS, timeout=60)
+    ensure_collections(qdrant, vectors.shape[1])
+
+    def upload(batch_start: int, batch_end: int, points: List[PointStruct]) -> Tuple[int, int]:
+        qdrant.upsert(points)
+        return batch_start, batch_end
+
+    started_at = time.monotonic()
+    reported_at = started_at
+    loaded = 0
+    in_flight = set()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        batches = iter_batches(vectors, payloads_path, checkpoint.offset, batch_size, id_offset)
+        for batch in itertools.chain(batches, [None]):
+            # Ограничиваем число пачек в памяти: не больше двух на воркер
+            while in_flight and (batch is None or len(in_flight) >= workers * 2):
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch_start, batch_end = future.result()
+                    loaded += batch_end - batch_start
+                    checkpoint.complete(batch_start, batch_end)
+                now = time.monotonic()
+                if now - reported_at >= report_interval:
+                    rate = loaded / (now - started_at)
+                    logger.info(f"Загружено {checkpoint.offset}/{total} ({rate:.0f} векторов/с)")
+                    reported_at = now
+            if batch is not None:
+                in_flight.add(executor.submit(upload, *batch))
+
+    elapsed = time.monotonic() - started_at
+    logger.info(
+        f"Загрузка завершена: {loaded} векторов за {elapsed:.1f}s "
+        f"({loaded / max(elapsed, 1e-9):.0f} векторов/с)"
+    )
+    qdrant.close()
+    return loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Параллельная загрузка векторов из .npy в Qdrant")
+    parser.add_argument("--vectors", required=True, help="Файл .npy с матрицей векторов (N, dim)")
+    parser.add_argument("--payloads", help="JSONL с payload, по строке на вектор")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--checkpoint", help="Файл контрольной точки для продолжения загрузки")
+    parser.add_argument("--start", type=int, help="Начать с указанного смещения вместо контрольной точки")
+    parser.add_argument("--id-offset", type=int, default=0, help="Сдвиг id точек относительно номера строки")
+    parser.add_argument("--report-interval", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    load(
+        args.vectors,
+        payloads_path=args.payloads,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        checkpoint_path=args.checkpoint,
+        start=args.start,
+        id_offset=args.id_offset,
+        report_interval=args.report_interval,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,37 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
-from contextlib import asynccontextmanager
-from redis import Redis
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from fastapi.responses import HTMLResponse, StreamingResponse
+from pydantic import ValidationError
+from contextlib import asynccontextmanager, suppress
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, PayloadSchemaType, SearchParams, QuantizationSearchParams,
+)
 import numpy as np
+import asyncio
+import hmac
+import json
+import struct
 import uuid
 import logging
 import os
+from typing import Optional
 
-from .models import VectorSearchRequest, SearchResult, CacheItem, HealthResponse, VectorItem
+from .models import (
+    VectorSearchRequest, SearchResult, CacheItem, HealthResponse, VectorItem,
+    CacheBulkSetRequest, CacheBulkGetRequest, SearchFilter,
+    PredictRequest, PredictResponse, ModelSwapRequest,
+)
 from .config import Config
+from .sharding import ShardedRedis
+from .ingest import WriteBehindBuffer, BufferFullError, RedisSpill
+from .filters import build_filter, filter_keys, filter_fingerprint
+from .export import iter_export
+from .qdrant_shards import ShardedQdrant
+from .metrics import metrics
+from .rerank import candidate_limit, rerank
+from .warmup import HotQueryTracker, CacheWarmer
+from .drift import DriftMonitor, MlflowRestLogger
+from .inference import MicroBatchPredictor, ModelNotLoadedError, ModelVersionSync, load_registered_model
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -19,33 +39,146 @@ logger = logging.getLogger(__name__)
 
 # Функция инициализации при старте
 async def startup():
-    try:
-        collections = qdrant_client.get_collections()
-        collection_names = [col.name for col in collections.collections]
-        
-        if "documents" not in collection_names:
-            qdrant_client.create_collection(
-                collection_name="documents",
-                vectors_config=VectorParams(size=128, distance=Distance.COSINE)
-            )
-            logger.info("Создана новая коллекция Qdrant 'documents'")
-        else:
-            logger.info("Коллекция Qdrant 'documents' уже существует")
-            
-    except Exception as e:
-        logger.warning(f"Ошибка при инициализации Qdrant: {e}")
+    for shard in qdrant.shards:
+        for client in shard.clients:
+            try:
+                collections = client.get_collections()
+                collection_names = [col.name for col in collections.collections]
+                
+                if shard.collection not in collection_names:
+                    client.create_collection(
+                        collection_name=shard.collection,
+                        vectors_config=VectorParams(size=128, distance=Distance.COSINE)
+                    )
+                    logger.info(f"Создана новая коллекция Qdrant '{shard.name}'")
+                else:
+                    logger.info(f"Коллекция Qdrant '{shard.name}' уже существует")
+                
+                ensure_payload_indexes(shard, client)
+                    
+            except Exception as e:
+                logger.warning(f"Ошибка при инициализации Qdrant '{shard.name}': {e}")
+
+def ensure_payload_indexes(shard, client):
+    """Создает индексы payload из Config.PAYLOAD_INDEXES, которых еще нет в коллекции шарда"""
+    existing = client.get_collection(shard.collection).payload_schema or {}
+    for field_name, field_type in Config.PAYLOAD_INDEXES.items():
+        if field_name in existing:
+            continue
+        client.create_payload_index(
+            collection_name=shard.collection,
+            field_name=field_name,
+            field_schema=PayloadSchemaType(field_type.lower())
+        )
+        logger.info(f"Создан индекс payload '{field_name}' ({field_type}) в '{shard.name}'")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await startup()
+    if ingest_buffer is not None:
+        await ingest_buffer.start()
+    warmup_task = None
+    if Config.WARMUP_ON_STARTUP or Config.WARMUP_INTERVAL > 0:
+        warmup_task = asyncio.create_task(
+            cache_warmer.run_forever(Config.WARMUP_INTERVAL, initial=Config.WARMUP_ON_STARTUP)
+        )
+    await predictor.start()
+    model_sync_task = None
+    if Config.PREDICT_MODEL_VERSION or Config.PREDICT_ADMIN_TOKEN:
+        # Версия, уже выбранная через /predict/model, важнее версии из конфигурации
+        try:
+            await model_sync.sync_once(default=Config.PREDICT_MODEL_VERSION)
+        except Exception as e:
+            logger.error(f"Не удалось загрузить модель для /predict: {e}")
+        model_sync_task = asyncio.create_task(model_sync.run_forever())
+    drift_task = None
+    if Config.DRIFT_SAMPLE_RATE > 0:
+        drift_task = asyncio.create_task(drift_monitor.run_forever())
     yield
     # Shutdown
-    pass
+    for task in (warmup_task, drift_task, model_sync_task):
+        if task is not None:
+            task.cancel()
+            # Дожидаемся отмены, чтобы задача не писала в закрытые клиенты
+            with suppress(asyncio.CancelledError):
+                await task
+    await predictor.stop()
+    if ingest_buffer is not None:
+        await ingest_buffer.stop()
+    redis_client.close()
+    qdrant.close()
 
 # Инициализация клиентов с учетом конфигурации
-redis_client = Redis(host=Config.REDIS_HOST, port=Config.REDIS_PORT, decode_responses=True)
-qdrant_client = QdrantClient(host=Config.QDRANT_HOST, port=Config.QDRANT_PORT)
+redis_client = ShardedRedis(Config.REDIS_NODES, replicas=Config.REDIS_RING_REPLICAS, decode_responses=True)
+qdrant = ShardedQdrant(
+    Config.QDRANT_SHARDS,
+    hedge_percentile=Config.HEDGE_PERCENTILE,
+    hedge_initial_delay=Config.HEDGE_INITIAL_DELAY_MS / 1000,
+    hedge_min_delay=Config.HEDGE_MIN_DELAY_MS / 1000,
+    hedge_max_rate=Config.HEDGE_MAX_RATE
+)
+
+def upsert_points(points):
+    qdrant.upsert(points)
+
+ingest_buffer = None
+if Config.WRITE_BEHIND_ENABLED:
+    ingest_buffer = WriteBehindBuffer(
+        upsert_points,
+        max_size=Config.WRITE_BEHIND_QUEUE_SIZE,
+        batch_size=Config.WRITE_BEHIND_BATCH_SIZE,
+        flush_interval=Config.WRITE_BEHIND_FLUSH_INTERVAL,
+        put_timeout=Config.WRITE_BEHIND_PUT_TIMEOUT,
+        spill=RedisSpill(redis_client, key=Config.WRITE_BEHIND_SPILL_KEY)
+    )
+
+hot_queries = HotQueryTracker(
+    redis_client,
+    capacity=Config.HOT_QUERY_CAPACITY,
+    sample_rate=Config.HOT_QUERY_SAMPLE_RATE
+)
+
+def record_hot_query(cache_key, request_json):
+    try:
+        hot_queries.record(cache_key, request_json)
+    except Exception as e:
+        logger.debug(f"Не удалось записать горячий запрос: {e}")
+
+async def refresh_cached_search(cache_key, request_json):
+    """Повторно выполняет сохраненный запрос и обновляет его запись в кеше"""
+    request = VectorSearchRequest.model_validate_json(request_json)
+    results = await execute_search(request)
+    redis_client.setex(cache_key, Config.SEARCH_CACHE_TTL, encode_cached_results(results))
+
+cache_warmer = CacheWarmer(
+    hot_queries,
+    refresh_cached_search,
+    top=Config.WARMUP_TOP,
+    refresh_before=Config.WARMUP_REFRESH_BEFORE,
+    concurrency=Config.WARMUP_CONCURRENCY
+)
+
+drift_monitor = DriftMonitor(
+    redis_client,
+    sample_rate=Config.DRIFT_SAMPLE_RATE,
+    stream_maxlen=Config.DRIFT_STREAM_MAXLEN,
+    window=Config.DRIFT_WINDOW,
+    min_samples=Config.DRIFT_MIN_SAMPLES,
+    psi_threshold=Config.DRIFT_PSI_THRESHOLD,
+    mean_shift_threshold=Config.DRIFT_MEAN_SHIFT_THRESHOLD,
+    mlflow=MlflowRestLogger(Config.MLFLOW_TRACKING_URI, Config.DRIFT_MLFLOW_EXPERIMENT)
+    if Config.MLFLOW_TRACKING_URI else None
+)
+
+def load_predict_model(version):
+    return load_registered_model(Config.MLFLOW_TRACKING_URI, Config.PREDICT_MODEL_NAME, version)
+
+predictor = MicroBatchPredictor(
+    max_batch=Config.PREDICT_MAX_BATCH,
+    max_wait=Config.PREDICT_MAX_WAIT_MS / 1000
+)
+model_sync = ModelVersionSync(redis_client, predictor, load_predict_model, interval=Config.PREDICT_SYNC_INTERVAL)
 
 app = FastAPI(
     title="Vector Search API",
@@ -290,7 +423,7 @@ async def health_check():
         
         # Проверка Qdrant
         try:
-            qdrant_client.get_collections()
+            qdrant.ping()
             qdrant_status = "connected"
         except:
             qdrant_status = "disconnected"
@@ -303,7 +436,9 @@ async def health_check():
             qdrant=qdrant_status,
             details={
                 "version": "1.0.0",
-                "environment": Config.ENV
+                "environment": Config.ENV,
+                "redis_nodes": redis_client.ring.nodes,
+                "write_behind": ingest_buffer.stats() if ingest_buffer is not None else None
             }
         )
     except Exception as e:
@@ -313,43 +448,201 @@ async def health_check():
             detail=f"Service unavailable: {str(e)}"
         )
 
+def effective_oversample(request: VectorSearchRequest) -> float:
+    return request.oversample if request.oversample is not None else Config.SEARCH_OVERSAMPLE
+
+def search_cache_key(request: VectorSearchRequest) -> str:
+    """Ключ кеша поиска: вектор, лимит, oversampling и отпечаток фильтра"""
+    cache_key = f"search:{hash(tuple(request.vector))}:{request.limit}"
+    oversample = effective_oversample(request)
+    if oversample > 1:
+        cache_key = f"{cache_key}:os{oversample:g}"
+    fingerprint = filter_fingerprint(request.filter)
+    if fingerprint:
+        cache_key = f"{cache_key}:{fingerprint}"
+    return cache_key
+
+def unindexed_filter_keys(request: VectorSearchRequest) -> list:
+    return sorted(filter_keys(request.filter) - set(Config.PAYLOAD_INDEXES))
+
+async def cached_search(request: VectorSearchRequest) -> dict:
+    """Поиск через кеш: общий для POST /search и WebSocket /ws/search"""
+    # Проверяем кеш
+    cache_key = search_cache_key(request)
+    if hot_queries.should_sample():
+        asyncio.get_running_loop().run_in_executor(
+            None, record_hot_query, cache_key, request.model_dump_json()
+        )
+    if drift_monitor.should_sample():
+        asyncio.get_running_loop().run_in_executor(None, drift_monitor.record, request.vector)
+    cached_result = redis_client.get(cache_key)
+    
+    if cached_result:
+        try:
+            results = decode_cached_results(cached_result)
+        except ValueError as e:
+            # Запись старого формата или поврежденная: считаем промахом и перезаписываем
+            logger.warning(f"Некорректная запись кеша {cache_key}: {e}")
+        else:
+            logger.info(f"Результат найден в кеше: {cache_key}")
+            return {"source": "cache", "results": results}
+    
+    results = await execute_search(request)
+    
+    # Сохраняем в кеш на SEARCH_CACHE_TTL секунд
+    redis_client.setex(cache_key, Config.SEARCH_CACHE_TTL, encode_cached_results(results))
+    logger.info(f"Результат сохранен в кеш: {cache_key}")
+    
+    return {"source": "database", "results": results}
+
 @app.post("/search")
 async def search_vectors(request: VectorSearchRequest):
     """Поиск похожих векторов"""
-    try:
-        # Проверяем кеш
-        cache_key = f"search:{hash(tuple(request.vector))}:{request.limit}"
-        cached_result = redis_client.get(cache_key)
-        
-        if cached_result:
-            logger.info(f"Результат найден в кеше: {cache_key}")
-            return {"source": "cache", "results": eval(cached_result)}
-        
-        # Выполняем поиск в Qdrant
-        search_result = qdrant_client.search(
-            collection_name="documents",
-            query_vector=request.vector,
-            limit=request.limit
+    unindexed = unindexed_filter_keys(request)
+    if unindexed:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Filter on non-indexed payload keys: {unindexed}"
         )
-        
-        results = [
-            SearchResult(
-                id=hit.id,
-                score=hit.score,
-                payload=hit.payload
-            ).dict() for hit in search_result
-        ]
-        
-        # Сохраняем в кеш на 5 минут
-        redis_client.setex(cache_key, 300, str(results))
-        logger.info(f"Результат сохранен в кеш: {cache_key}")
-        
-        return {"source": "database", "results": results}
-    
+    try:
+        return await cached_search(request)
     except Exception as e:
         logger.error(f"Search failed: {e}")
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
+@app.websocket("/ws/search")
+async def search_stream(websocket: WebSocket):
+    """Поток запросов поиска по одному соединению.
+
+    Бинарный кадр: заголовок <u32 id><u16 limit> и далее вектор float32
+    little-endian. Текстовый кадр: JSON VectorSearchRequest с полем "id".
+    Ответы - JSON {"id", "source", "results"} или {"id", "error"} - приходят
+    по мере готовности, не обязательно в порядке запросов.
+    """
+    await websocket.accept()
+    in_flight = asyncio.Semaphore(Config.WS_MAX_IN_FLIGHT)
+    send_lock = asyncio.Lock()
+    tasks = set()
+    
+    async def reply(message):
+        async with send_lock:
+            await websocket.send_text(json.dumps(message, default=str))
+    
+    async def handle(request_id, request):
+        try:
+            unindexed = unindexed_filter_keys(request)
+            if unindexed:
+                await reply({"id": request_id, "error": f"Filter on non-indexed payload keys: {unindexed}"})
+                return
+            response = await cached_search(request)
+            await reply({"id": request_id, **response})
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            logger.error(f"Stream search failed: {e}")
+            try:
+                await reply({"id": request_id, "error": str(e)})
+            except Exception:
+                pass
+        finally:
+            in_flight.release()
+    
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            # Не читаем новые кадры, пока в работе WS_MAX_IN_FLIGHT запросов
+            await in_flight.acquire()
+            try:
+                request_id, request = decode_stream_frame(message)
+            except StreamFrameError as e:
+                in_flight.release()
+                await reply({"id": e.request_id, "error": f"Invalid frame: {e}"})
+                continue
+            task = asyncio.create_task(handle(request_id, request))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Дожидаемся отмены, чтобы задачи не пережили соединение
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+STREAM_FRAME_HEADER = struct.Struct("<IH")
+
+class StreamFrameError(ValueError):
+    def __init__(self, message, request_id=None):
+        super().__init__(message)
+        self.request_id = request_id
+
+def decode_stream_frame(message):
+    """Разбирает кадр /ws/search в пару (id запроса, VectorSearchRequest)"""
+    if message.get("bytes") is not None:
+        data = message["bytes"]
+        if len(data) <= STREAM_FRAME_HEADER.size or (len(data) - STREAM_FRAME_HEADER.size) % 4:
+            raise StreamFrameError(f"bad binary frame length {len(data)}")
+        request_id, limit = STREAM_FRAME_HEADER.unpack_from(data)
+        vector = np.frombuffer(data, dtype="<f4", offset=STREAM_FRAME_HEADER.size)
+        payload = {"vector": vector.tolist(), "limit": limit or 10}
+    else:
+        try:
+            payload = json.loads(message["text"])
+        except (TypeError, ValueError) as e:
+            raise StreamFrameError(str(e))
+        request_id = payload.pop("id", None) if isinstance(payload, dict) else None
+    try:
+        return request_id, VectorSearchRequest.model_validate(payload)
+    except ValidationError as e:
+        raise StreamFrameError(str(e), request_id)
+
+async def execute_search(request: VectorSearchRequest) -> list:
+    """Поиск в Qdrant (с переранжированием при oversampling) без участия кеша"""
+    # Выполняем поиск во всех шардах Qdrant
+    oversample = effective_oversample(request)
+    if oversample > 1:
+        with metrics.timer("qdrant.search"):
+            candidates = await qdrant.search(
+                query_vector=request.vector,
+                query_filter=build_filter(request.filter),
+                limit=candidate_limit(request.limit, oversample),
+                with_vectors=True,
+                search_params=SearchParams(quantization=QuantizationSearchParams(rescore=False))
+            )
+        with metrics.timer("search.rerank"):
+            search_result = rerank(request.vector, candidates, request.limit)
+        metrics.incr("search.rerank.candidates", len(candidates))
+    else:
+        with metrics.timer("qdrant.search"):
+            search_result = await qdrant.search(
+                query_vector=request.vector,
+                query_filter=build_filter(request.filter),
+                limit=request.limit
+            )
+    
+    return build_results(search_result)
+
+def build_results(hits) -> list:
+    return [
+        SearchResult(
+            id=hit.id,
+            score=hit.score,
+            payload=hit.payload
+        ).model_dump() for hit in hits
+    ]
+
+def encode_cached_results(results: list) -> str:
+    return json.dumps(results, separators=(",", ":"))
+
+def decode_cached_results(value: str) -> list:
+    """Разбирает запись кеша; значение из Redis или snapshot только парсится как JSON"""
+    results = json.loads(value)
+    if not isinstance(results, list):
+        raise ValueError("Запись кеша поиска должна быть списком результатов")
+    return results
+
 @app.post("/vectors")
 async def add_vector(item: VectorItem):
     """Добавление нового вектора"""
@@ -360,15 +653,18 @@ async def add_vector(item: VectorItem):
             payload=item.payload or {}
         )
         
-        qdrant_client.upsert(
-            collection_name="documents",
-            wait=True,
-            points=[point]
-        )
+        if ingest_buffer is not None:
+            await ingest_buffer.put(point)
+            return {"id": item.id, "status": "queued"}
+        
+        upsert_points([point])
         
         logger.info(f"Вектор добавлен: {item.id}")
         return {"id": item.id, "status": "added"}
     
+    except BufferFullError as e:
+        logger.warning(f"Write-behind backpressure: {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         logger.error(f"Failed to add vector: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to add vector: {str(e)}")
@@ -384,6 +680,33 @@ async def cache_item(item: CacheItem):
         logger.error(f"Cache failed: {e}")
         raise HTTPException(status_code=500, detail=f"Cache failed: {str(e)}")
 
+@app.post("/cache/mset")
+async def cache_items_bulk(request: CacheBulkSetRequest):
+    """Добавление нескольких элементов в кеш за один pipeline на узел Redis"""
+    try:
+        stored = redis_client.set_many(
+            [(item.key, item.value, item.ttl) for item in request.items]
+        )
+        cached = [item.key for item, ok in zip(request.items, stored) if ok]
+        failed = [item.key for item, ok in zip(request.items, stored) if not ok]
+        logger.info(f"Закешировано элементов: {len(cached)}, ошибок: {len(failed)}")
+        return {"status": "cached", "cached": cached, "failed": failed}
+    except Exception as e:
+        logger.error(f"Bulk cache failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Bulk cache failed: {str(e)}")
+
+@app.post("/cache/mget")
+async def get_cached_items_bulk(request: CacheBulkGetRequest):
+    """Получение нескольких элементов из кеша; отсутствующие ключи возвращаются в missing"""
+    try:
+        values = redis_client.mget(request.keys)
+        found = {key: value for key, value in zip(request.keys, values) if value is not None}
+        missing = [key for key, value in zip(request.keys, values) if value is None]
+        return {"values": found, "missing": missing}
+    except Exception as e:
+        logger.error(f"Bulk cache retrieval failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Bulk cache retrieval failed: {str(e)}")
+
 @app.get("/cache/{key}")
 async def get_cached_item(key: str):
     """Получение элемента из кеша"""
@@ -398,12 +721,117 @@ async def get_cached_item(key: str):
         logger.error(f"Cache retrieval failed: {e}")
         raise HTTPException(status_code=500, detail=f"Cache retrieval failed: {str(e)}")
 
+@app.post("/cache/warmup")
+async def warmup_cache():
+    """Немедленный прогрев кеша горячими запросами"""
+    try:
+        return await cache_warmer.warm_once()
+    except Exception as e:
+        logger.error(f"Cache warmup failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Cache warmup failed: {str(e)}")
+
+@app.get("/drift")
+async def get_drift_status():
+    """Текущее окно мониторинга дрифта векторов запросов и последние метрики"""
+    return await asyncio.to_thread(drift_monitor.status)
+
+@app.post("/drift/reference")
+async def save_drift_reference():
+    """Фиксирует текущее окно как референсный профиль дрифта"""
+    try:
+        return await asyncio.to_thread(drift_monitor.save_reference)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Drift reference save failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Drift reference save failed: {str(e)}")
+
+@app.post("/predict", response_model=PredictResponse)
+async def predict(request: PredictRequest):
+    """Предсказание модели из registry: одиночные строки собираются в микро-пачки"""
+    try:
+        predictions, version = await predictor.predict(request.rows())
+    except ModelNotLoadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Prediction failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+    return PredictResponse(
+        predictions=predictions,
+        model_name=Config.PREDICT_MODEL_NAME,
+        model_version=version
+    )
+
+@app.post("/predict/model")
+async def swap_predict_model(request: ModelSwapRequest, x_admin_token: Optional[str] = Header(None)):
+    """Загружает другую версию модели и подменяет ее без остановки запросов на всех репликах"""
+    if not Config.PREDICT_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Model swap is disabled: PREDICT_ADMIN_TOKEN is not set")
+    if not hmac.compare_digest(x_admin_token or "", Config.PREDICT_ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+    try:
+        model = await model_sync.publish(request.version)
+        return {"status": "loaded", **model.info()}
+    except Exception as e:
+        logger.error(f"Model swap failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Model swap failed: {str(e)}")
+
+@app.get("/metrics")
+async def get_metrics():
+    """Счетчики и перцентили задержек процесса"""
+    snapshot = metrics.snapshot()
+    snapshot["hedging"] = qdrant.hedge_stats()
+    snapshot["predict"] = predictor.stats()
+    return snapshot
+
 @app.get("/vectors/count")
 async def get_vectors_count():
     """Получение количества векторов в коллекции"""
     try:
-        collection_info = qdrant_client.get_collection("documents")
-        return {"count": collection_info.points_count}
+        return {"count": qdrant.count()}
     except Exception as e:
         logger.error(f"Failed to get vectors count: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get vectors count: {str(e)}")
+
+@app.get("/vectors/export")
+async def export_vectors(
+    format: str = Query("ndjson", pattern="^(ndjson|f32)$"),
+    with_vectors: bool = True,
+    with_payload: bool = True,
+    batch_size: int = Query(Config.EXPORT_BATCH_SIZE, ge=1, le=10000),
+    filter: Optional[str] = Query(None, description="SearchFilter в виде JSON")
+):
+    """Потоковая выгрузка коллекции (NDJSON или бинарный float32) постраничным scroll"""
+    try:
+        search_filter = SearchFilter.model_validate_json(filter) if filter else None
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid filter: {e}")
+    
+    if format == "f32":
+        # В бинарном формате нет payload, только id и вектор
+        with_vectors, with_payload = True, False
+    
+    async def stream():
+        exported = 0
+        try:
+            for shard in qdrant.shards:
+                async for chunk in iter_export(
+                    shard.client.scroll,
+                    shard.collection,
+                    export_format=format,
+                    scroll_filter=build_filter(search_filter),
+                    with_vectors=with_vectors,
+                    with_payload=with_payload,
+                    batch_size=batch_size
+                ):
+                    exported += 1
+                    yield chunk
+        except Exception as e:
+            logger.error(f"Export failed after {exported} pages: {e}")
+            raise
+        logger.info(f"Выгрузка завершена, страниц: {exported}")
+    
+    media_type = "application/octet-stream" if format == "f32" else "application/x-ndjson"
+    return StreamingResponse(stream(), media_type=media_type)
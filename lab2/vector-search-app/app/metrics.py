@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict
+
+import numpy as np
+
+
+class LatencyStats:
+    """Скользящее окно последних измерений задержки"""
+
+    def __init__(self, window: int = 2048):
+        self._samples = deque(maxlen=window)
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+        self.count += 1
+
+    def percentile(self, q: float) -> float:
+        """Перцентиль окна в секундах; 0.0 пока нет измерений"""
+        if not self._samples:
+            return 0.0
+        return float(np.percentile(np.fromiter(self._samples, dtype=float), q))
+
+    def snapshot(self) -> dict:
+        if not self._samples:
+            return {"count": self.count}
+        samples = np.fromiter(self._samples, dtype=float) * 1000
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        return {
+            "count": self.count,
+            "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3),
+            "max_ms": round(float(samples.max()), 3),
+        }
+
+
+class Metrics:
+    """Счетчики и задержки процесса, отдаются через GET /metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, LatencyStats] = defaultdict(LatencyStats)
+        self.counters: Dict[str, float] = defaultdict(float)
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            self.latencies[name].observe(seconds)
+
+    def incr(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] += value
+
+    def count(self, name: str) -> int:
+        stats = self.latencies.get(name)
+        return stats.count if stats is not None else 0
+
+    def percentile(self, name: str, q: float) -> float:
+        """Перцентиль задержки в секундах; 0.0 если измерений нет"""
+        with self._lock:
+            stats = self.latencies.get(name)
+            return stats.percentile(q) if stats is not None else 0.0
+
+    @contextmanager
+    def timer(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "latencies": {name: stats.snapshot() for name, stats in sorted(self.latencies.items())},
+            }
+
+
+metrics = Metrics()
@@ -1,19 +1,54 @@
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, ConfigDict, Field, FiniteFloat, model_validator
+from typing import List, Optional, Dict, Any, Union
+
+class RangeCondition(BaseModel):
+    gt: Optional[float] = None
+    gte: Optional[float] = None
+    lt: Optional[float] = None
+    lte: Optional[float] = None
+
+class FieldFilter(BaseModel):
+    """Условие на одно поле payload: ровно одно из match, any, range"""
+    key: str
+    match: Optional[Union[bool, int, str]] = None
+    any: Optional[List[Union[int, str]]] = None
+    range: Optional[RangeCondition] = None
+
+    @model_validator(mode="after")
+    def check_single_condition(self):
+        conditions = [self.match, self.any, self.range]
+        if sum(condition is not None for condition in conditions) != 1:
+            raise ValueError("Нужно указать ровно одно из условий: match, any, range")
+        return self
+
+class SearchFilter(BaseModel):
+    must: List[FieldFilter] = []
+    should: List[FieldFilter] = []
+    must_not: List[FieldFilter] = []
 
 class VectorSearchRequest(BaseModel):
-    vector: List[float]
+    vector: List[FiniteFloat]
     limit: int = 10
+    filter: Optional[SearchFilter] = None
+    # Во сколько раз больше кандидатов взять для точного переранжирования (1 - без него)
+    oversample: Optional[float] = Field(None, ge=1, le=20)
 
 class SearchResult(BaseModel):
-    id: str
+    # Qdrant хранит id точки как целое число или UUID-строку (загрузчик пишет целые)
+    id: Union[int, str]
     score: float
     payload: Optional[Dict[str, Any]] = None
 
 class CacheItem(BaseModel):
     key: str
     value: str
-    ttl: Optional[int] = 300
+    ttl: Optional[int] = Field(300, gt=0)
+
+class CacheBulkSetRequest(BaseModel):
+    items: List[CacheItem] = Field(..., min_length=1, max_length=1000)
+
+class CacheBulkGetRequest(BaseModel):
+    keys: List[str] = Field(..., min_length=1, max_length=1000)
 
 class HealthResponse(BaseModel):
     status: str
@@ -25,3 +60,29 @@ class VectorItem(BaseModel):
     id: str
     vector: List[float]
     payload: Optional[Dict[str, Any]] = None
+
+class PredictRequest(BaseModel):
+    """Одна строка признаков (features) или пачка строк (instances)"""
+    # NaN и Infinity отклоняются на входе: такая строка уронила бы общую пачку
+    features: Optional[List[FiniteFloat]] = None
+    instances: Optional[List[List[FiniteFloat]]] = Field(None, min_length=1, max_length=10000)
+
+    @model_validator(mode="after")
+    def check_single_payload(self):
+        if (self.features is None) == (self.instances is None):
+            raise ValueError("Нужно указать ровно одно из полей: features, instances")
+        return self
+
+    def rows(self) -> List[List[float]]:
+        return [self.features] if self.features is not None else self.instances
+
+class PredictResponse(BaseModel):
+    # Поля model_* - часть API, а не пространство имен pydantic
+    model_config = ConfigDict(protected_namespaces=())
+
+    predictions: List[Union[int, float, str]]
+    model_name: str
+    model_version: str
+
+class ModelSwapRequest(BaseModel):
+    version: str
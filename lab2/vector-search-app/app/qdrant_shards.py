@@ -0,0 +1,218 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import Filter, PointStruct, ScoredPoint
+
+from .metrics import metrics
+
+
+class QdrantShard:
+    """Один шард: коллекция, размещенная на одной или нескольких репликах Qdrant"""
+
+    def __init__(self, name: str, clients: List[QdrantClient], collection: str, addresses: Optional[List[str]] = None):
+        self.name = name
+        self.clients = clients
+        self.collection = collection
+        self.addresses = addresses or []
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._next_replica = itertools.cycle(range(len(clients)))
+        self._hedge_delay: Optional[float] = None
+
+    @property
+    def client(self) -> QdrantClient:
+        """Первая реплика: для служебных операций (scroll, count, индексы)"""
+        return self.clients[0]
+
+    def next_replica(self) -> int:
+        return next(self._next_replica)
+
+
+def _retrieve_exception(future: asyncio.Future):
+    # Проигравшая попытка хеджирования никем не ожидается
+    if not future.cancelled():
+        future.exception()
+
+
+class ShardedQdrant:
+    """Разбиение коллекции на N шардов по хешу id точки.
+
+    Запись уходит в шард-владелец (во все его реплики), поиск опрашивает все
+    шарды параллельно и сливает их top-k через кучу. Если у шарда несколько
+    реплик и ответ не пришел за адаптивный порог (перцентиль задержки
+    попыток), отправляется хеджирующий дубль в другую реплику и берется
+    первый ответ. Доля хеджей ограничена hedge_max_rate.
+    """
+
+    def __init__(
+        self,
+        specs: List[str],
+        timeout: Optional[int] = None,
+        hedge_percentile: float = 95,
+        hedge_initial_delay: float = 0.05,
+        hedge_min_delay: float = 0.005,
+        hedge_max_rate: float = 0.05,
+        hedge_min_samples: int = 50,
+    ):
+        if not specs:
+            raise ValueError("Не задан ни один шард Qdrant")
+        self.hedge_percentile = hedge_percentile
+        self.hedge_initial_delay = hedge_initial_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_rate = hedge_max_rate
+        self.hedge_min_samples = hedge_min_samples
+        clients: Dict[str, QdrantClient] = {}
+        self.shards: List[QdrantShard] = []
+        for spec in specs:
+            addresses, _, collection = spec.partition("/")
+            replicas = []
+            for address in addresses.split("|"):
+                host, _, port = address.rpartition(":")
+                if address not in clients:
+                    clients[address] = QdrantClient(host=host, port=int(port), timeout=timeout)
+                replicas.append(clients[address])
+            self.shards.append(
+                QdrantShard(spec, replicas, collection or "documents", addresses.split("|"))
+            )
+        self._clients = list(clients.values())
+        # Проигравшие хеджи продолжают занимать поток, поэтому пул с запасом
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(2 * len(clients), 8), thread_name_prefix="qdrant-shard"
+        )
+
+    @staticmethod
+    def _hash(point_id) -> int:
+        return int.from_bytes(hashlib.md5(str(point_id).encode("utf-8")).digest()[:8], "big")
+
+    def shard_for(self, point_id) -> QdrantShard:
+        return self.shards[self._hash(point_id) % len(self.shards)]
+
+    def upsert(self, points: List[PointStruct]):
+        """Синхронная запись: точки группируются по шардам, шарды и реплики пишутся параллельно"""
+        groups: Dict[int, List[PointStruct]] = {}
+        for point in points:
+            index = self._hash(point.id) % len(self.shards)
+            groups.setdefault(index, []).append(point)
+        futures = [
+            self._executor.submit(
+                client.upsert,
+                collection_name=self.shards[index].collection,
+                points=group,
+                wait=True,
+            )
+            for index, group in groups.items()
+            for client in self.shards[index].clients
+        ]
+        for future in futures:
+            future.result()
+
+    def _search_replica(self, shard: QdrantShard, replica: int, kwargs: dict) -> List[ScoredPoint]:
+        started = time.perf_counter()
+        result = shard.clients[replica].search(collection_name=shard.collection, **kwargs)
+        metrics.observe(f"qdrant.search.{shard.name}.attempt", time.perf_counter() - started)
+        return result
+
+    def hedge_delay(self, shard: QdrantShard) -> float:
+        """Порог хеджирования: перцентиль задержки попыток, пересчитывается раз в 64 запроса"""
+        if shard._hedge_delay is None or shard.requests % 64 == 0:
+            name = f"qdrant.search.{shard.name}.attempt"
+            if metrics.count(name) < self.hedge_min_samples:
+                shard._hedge_delay = self.hedge_initial_delay
+            else:
+                shard._hedge_delay = max(
+                    self.hedge_min_delay, metrics.percentile(name, self.hedge_percentile)
+                )
+        return shard._hedge_delay
+
+    async def _hedged_search(self, shard: QdrantShard, kwargs: dict) -> List[ScoredPoint]:
+        loop = asyncio.get_running_loop()
+        shard.requests += 1
+        primary_replica = shard.next_replica()
+        primary = loop.run_in_executor(self._executor, self._search_replica, shard, primary_replica, kwargs)
+        if len(shard.clients) == 1:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay(shard))
+        if done or shard.hedges >= self.hedge_max_rate * shard.requests:
+            return await primary
+
+        shard.hedges += 1
+        metrics.incr(f"hedge.{shard.name}.fired")
+        hedge_replica = (primary_replica + 1) % len(shard.clients)
+        hedge = loop.run_in_executor(self._executor, self._search_replica, shard, hedge_replica, kwargs)
+        primary.add_done_callback(_retrieve_exception)
+        hedge.add_done_callback(_retrieve_exception)
+
+        pending = {primary, hedge}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        shard.hedge_wins += 1
+                        metrics.incr(f"hedge.{shard.name}.won")
+                    return future.result()
+        # Обе попытки завершились ошибкой
+        return primary.result()
+
+    async def _search_shard(self, shard: QdrantShard, kwargs: dict) -> List[ScoredPoint]:
+        started = time.perf_counter()
+        try:
+            return await self._hedged_search(shard, kwargs)
+        finally:
+            metrics.observe(f"qdrant.search.{shard.name}", time.perf_counter() - started)
+
+    async def search(
+        self,
+        query_vector: List[float],
+        limit: int = 10,
+        query_filter: Optional[Filter] = None,
+        **kwargs,
+    ) -> List[ScoredPoint]:
+        """Scatter-gather поиск: top-k каждого шарда сливаются в общий top-k"""
+        kwargs.update(query_vector=query_vector, query_filter=query_filter, limit=limit)
+        per_shard = await asyncio.gather(*[self._search_shard(shard, kwargs) for shard in self.shards])
+        if len(per_shard) == 1:
+            return per_shard[0]
+        # Результаты каждого шарда уже отсортированы по убыванию score
+        merged = heapq.merge(*per_shard, key=lambda hit: -hit.score)
+        return list(itertools.islice(merged, limit))
+
+    def hedge_stats(self) -> dict:
+        """Доля хеджей и p99 одной попытки против p99 с хеджированием по каждому шарду"""
+        stats = {}
+        for shard in self.shards:
+            if len(shard.clients) < 2:
+                continue
+            attempt_p99 = metrics.percentile(f"qdrant.search.{shard.name}.attempt", 99)
+            hedged_p99 = metrics.percentile(f"qdrant.search.{shard.name}", 99)
+            stats[shard.name] = {
+                "requests": shard.requests,
+                "hedge_rate": round(shard.hedges / shard.requests, 4) if shard.requests else 0.0,
+                "hedge_wins": shard.hedge_wins,
+                "threshold_ms": round((shard._hedge_delay or self.hedge_initial_delay) * 1000, 3),
+                "attempt_p99_ms": round(attempt_p99 * 1000, 3),
+                "hedged_p99_ms": round(hedged_p99 * 1000, 3),
+                "p99_improvement_ms": round((attempt_p99 - hedged_p99) * 1000, 3),
+            }
+        return stats
+
+    def count(self) -> int:
+        return sum(
+            shard.client.get_collection(shard.collection).points_count or 0
+            for shard in self.shards
+        )
+
+    def ping(self):
+        for client in self._clients:
+            client.get_collections()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,37 @@
+import math
+from typing import List
+
+import numpy as np
+from qdrant_client.models import ScoredPoint
+
+
+def candidate_limit(limit: int, oversample: float) -> int:
+    """Сколько кандидатов запросить у Qdrant для переранжирования"""
+    return max(limit, math.ceil(limit * oversample))
+
+
+def cosine_scores(query: List[float], vectors: np.ndarray) -> np.ndarray:
+    """Точные косинусные близости запроса ко всем строкам матрицы одной операцией"""
+    query = np.asarray(query, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+    return (vectors @ query) / np.where(norms == 0, 1.0, norms)
+
+
+def rerank(query: List[float], hits: List[ScoredPoint], limit: int) -> List[ScoredPoint]:
+    """Пересчитывает score кандидатов точно и возвращает настоящий top limit.
+
+    Кандидаты должны быть запрошены с with_vectors=True.
+    """
+    if not hits:
+        return []
+    vectors = np.asarray([hit.vector for hit in hits], dtype=np.float32)
+    scores = cosine_scores(query, vectors)
+    if limit < len(hits):
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top], kind="stable")]
+    else:
+        top = np.argsort(-scores, kind="stable")
+    return [
+        hits[i].model_copy(update={"score": float(scores[i]), "vector": None})
+        for i in top
+    ]
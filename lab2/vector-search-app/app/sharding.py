@@ -0,0 +1,161 @@
+import bisect
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from redis import Redis, RedisError
+
+
+class HashRing:
+    """Кольцо консистентного хеширования с виртуальными узлами.
+
+    При добавлении или удалении узла переезжает только ~1/N ключей.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = 160):
+        self.replicas = replicas
+        self._hashes: List[int] = []
+        self._owners: Dict[int, str] = {}
+        self._nodes: List[str] = []
+        for node in nodes:
+            self.add_node(node)
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._nodes)
+
+    def add_node(self, node: str):
+        if node in self._nodes:
+            return
+        self._nodes.append(node)
+        for i in range(self.replicas):
+            point = self._hash(f"{node}#{i}")
+            self._owners[point] = node
+            bisect.insort(self._hashes, point)
+
+    def remove_node(self, node: str):
+        if node not in self._nodes:
+            return
+        self._nodes.remove(node)
+        for i in range(self.replicas):
+            point = self._hash(f"{node}#{i}")
+            if self._owners.get(point) == node:
+                del self._owners[point]
+                index = bisect.bisect_left(self._hashes, point)
+                del self._hashes[index]
+
+    def get_node(self, key: str) -> str:
+        if not self._hashes:
+            raise ValueError("Кольцо хеширования не содержит узлов")
+        index = bisect.bisect(self._hashes, self._hash(key)) % len(self._hashes)
+        return self._owners[self._hashes[index]]
+
+
+class ShardedRedis:
+    """Клиент Redis, распределяющий ключи по узлам через HashRing"""
+
+    def __init__(self, nodes: List[str], replicas: int = 160, **redis_kwargs):
+        if not nodes:
+            raise ValueError("Не задан ни один узел Redis")
+        self.clients: Dict[str, Redis] = {}
+        for node in nodes:
+            host, _, port = node.rpartition(":")
+            self.clients[node] = Redis(host=host, port=int(port), **redis_kwargs)
+        self.ring = HashRing(self.clients.keys(), replicas=replicas)
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(self.clients), thread_name_prefix="redis-shard"
+        )
+
+    def get_client(self, key: str) -> Redis:
+        return self.clients[self.ring.get_node(key)]
+
+    def group_keys(self, keys: List[str]) -> Dict[str, List[int]]:
+        """Индексы ключей, сгруппированные по узлу-владельцу"""
+        groups: Dict[str, List[int]] = {}
+        for index, key in enumerate(keys):
+            groups.setdefault(self.ring.get_node(key), []).append(index)
+        return groups
+
+    def map_nodes(self, groups: Dict[str, List[int]], func: Callable[[Redis, List[int]], list]) -> Dict[str, list]:
+        """Выполняет func для каждого узла; несколько узлов опрашиваются параллельно"""
+        if len(groups) == 1:
+            node, indexes = next(iter(groups.items()))
+            return {node: func(self.clients[node], indexes)}
+        futures = {
+            node: self._executor.submit(func, self.clients[node], indexes)
+            for node, indexes in groups.items()
+        }
+        return {node: future.result() for node, future in futures.items()}
+
+    def get(self, key: str) -> Optional[str]:
+        return self.get_client(key).get(key)
+
+    def setex(self, key: str, ttl: int, value):
+        return self.get_client(key).setex(key, ttl, value)
+
+    def delete(self, *keys: str) -> int:
+        keys = list(keys)
+        if not keys:
+            return 0
+        results = self.map_nodes(
+            self.group_keys(keys),
+            lambda client, indexes: client.delete(*[keys[i] for i in indexes]),
+        )
+        return sum(results.values())
+
+    def mget(self, keys: List[str]) -> List[Optional[str]]:
+        """MGET, разбитый по узлам; порядок значений совпадает с порядком ключей"""
+        if not keys:
+            return []
+        groups = self.group_keys(keys)
+        results = self.map_nodes(
+            groups, lambda client, indexes: client.mget([keys[i] for i in indexes])
+        )
+        values: List[Optional[str]] = [None] * len(keys)
+        for node, indexes in groups.items():
+            for index, value in zip(indexes, results[node]):
+                values[index] = value
+        return values
+
+    def set_many(self, items: List[Tuple[str, str, Optional[int]]]) -> List[bool]:
+        """SET с индивидуальным TTL для набора ключей: один pipeline на узел.
+
+        Ошибка отдельной команды или недоступность узла помечают только
+        затронутые ключи как незаписанные, остальная пачка записывается.
+        """
+        if not items:
+            return []
+        groups = self.group_keys([key for key, _, _ in items])
+
+        def run(client: Redis, indexes: List[int]) -> list:
+            pipe = client.pipeline(transaction=False)
+            for i in indexes:
+                key, value, ttl = items[i]
+                pipe.set(key, value, ex=ttl)
+            try:
+                # Ошибки команд возвращаются в результатах, а не прерывают pipeline
+                return pipe.execute(raise_on_error=False)
+            except RedisError as e:
+                return [e] * len(indexes)
+
+        results = self.map_nodes(groups, run)
+        stored: List[bool] = [False] * len(items)
+        for node, indexes in groups.items():
+            for index, result in zip(indexes, results[node]):
+                stored[index] = not isinstance(result, Exception) and bool(result)
+        return stored
+
+    def ping(self) -> bool:
+        """Проверяет все узлы; исключение недоступного узла пробрасывается"""
+        groups = {node: [] for node in self.clients}
+        results = self.map_nodes(groups, lambda client, indexes: client.ping())
+        return all(results.values())
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        for client in self.clients.values():
+            client.close()
@@ -0,0 +1,227 @@
+"""Снимки состояния: коллекции Qdrant и самые горячие записи кеша поиска.
+
+    python -m app.snapshot create --out /backup/2026-10-19 --cache-top 20000
+    python -m app.snapshot restore --src /backup/2026-10-19
+
+create делает snapshot коллекции каждого шарда (с первой реплики) и
+скачивает его, затем выгружает top-N ключей search:* через DUMP вместе с
+оставшимся TTL. restore загружает snapshot во все реплики шарда и
+восстанавливает кеш через RESTORE, раскладывая ключи по текущему кольцу
+узлов Redis.
+"""
+import argparse
+import base64
+import heapq
+import json
+import logging
+import os
+import time
+from typing import List, Tuple
+
+import requests
+from redis import Redis
+from redis.exceptions import ResponseError
+
+from .config import Config
+from .qdrant_shards import QdrantShard, ShardedQdrant
+from .sharding import ShardedRedis
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CACHE_PATTERN = "search:*"
+
+
+def _rest_uri(address: str) -> str:
+    return f"http://{address}"
+
+
+def snapshot_shard(shard: QdrantShard, out_dir: str, index: int) -> str:
+    description = shard.client.create_snapshot(collection_name=shard.collection)
+    filename = f"shard-{index}-{shard.collection}.snapshot"
+    url = f"{_rest_uri(shard.addresses[0])}/collections/{shard.collection}/snapshots/{description.name}"
+    with requests.get(url, stream=True, timeout=600) as response:
+        response.raise_for_status()
+        with open(os.path.join(out_dir, filename), "wb") as f:
+            for chunk in response.iter_content(chunk_size=1 << 20):
+                f.write(chunk)
+    # Снимок на сервере больше не нужен
+    shard.client.delete_snapshot(collection_name=shard.collection, snapshot_name=description.name)
+    logger.info(f"Снимок шарда '{shard.name}' сохранен: {filename} ({description.size} байт)")
+    return filename
+
+
+def restore_shard(shard: QdrantShard, path: str):
+    for address in shard.addresses:
+        url = f"{_rest_uri(address)}/collections/{shard.collection}/snapshots/upload"
+        with open(path, "rb") as f:
+            response = requests.post(
+                url, params={"priority": "snapshot"}, files={"snapshot": f}, timeout=3600
+            )
+        response.raise_for_status()
+        logger.info(f"Коллекция '{shard.collection}' восстановлена на {address}")
+
+
+def _hotness(client: Redis, keys: List[str]) -> List[float]:
+    """Чем больше значение, тем горячее ключ: LFU-частота, иначе минус время простоя"""
+    pipe = client.pipeline(transaction=False)
+    for key in keys:
+        pipe.object("freq", key)
+    try:
+        return [float(freq or 0) for freq in pipe.execute()]
+    except ResponseError:
+        # maxmemory-policy не LFU: OBJECT FREQ недоступен
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.object("idletime", key)
+        return [-float(idle or 0) for idle in pipe.execute()]
+
+
+def hottest_keys(redis: ShardedRedis, top: int, scan_count: int = 1000) -> List[Tuple[str, str]]:
+    """Top-N самых горячих ключей кеша поиска по всем узлам: пары (узел, ключ)"""
+    heap: List[Tuple[float, str, str]] = []
+    for node, client in redis.clients.items():
+        batch = []
+        for key in client.scan_iter(match=CACHE_PATTERN, count=scan_count):
+            batch.append(key)
+            if len(batch) >= scan_count:
+                _push_hot(heap, node, batch, _hotness(client, batch), top)
+                batch = []
+        if batch:
+            _push_hot(heap, node, batch, _hotness(client, batch), top)
+    return [(node, key) for _, node, key in sorted(heap, reverse=True)]
+
+
+def _push_hot(heap, node, keys, scores, top):
+    for key, score in zip(keys, scores):
+        item = (score, node, key)
+        if len(heap) < top:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+
+def dump_cache(redis: ShardedRedis, path: str, top: int) -> int:
+    hot = hottest_keys(redis, top)
+    dumped = 0
+    with open(path, "w") as f:
+        for start in range(0, len(hot), 1000):
+            chunk = hot[start:start + 1000]
+            by_node = {}
+            for node, key in chunk:
+                by_node.setdefault(node, []).append(key)
+            for node, keys in by_node.items():
+                pipe = redis.clients[node].pipeline(transaction=False)
+                for key in keys:
+                    pipe.pttl(key)
+                    pipe.dump(key)
+                results = pipe.execute()
+                for key, pttl, value in zip(keys, results[0::2], results[1::2]):
+                    if value is None or pttl == -2:
+                        continue
+                    record = {
+                        "key": key.decode("utf-8"),
+                        "pttl": pttl,
+                        "value": base64.b64encode(value).decode("ascii"),
+                    }
+                    f.write(json.dumps(record) + "\n")
+                    dumped += 1
+    logger.info(f"Выгружено записей кеша: {dumped}")
+    return dumped
+
+
+def restore_cache(redis: ShardedRedis, path: str, elapsed_ms: int, batch_size: int = 1000) -> int:
+    """Восстанавливает записи через RESTORE; TTL уменьшается на время с момента снимка"""
+    restored = 0
+    expired = 0
+    with open(path) as f:
+        while True:
+            records = [json.loads(line) for _, line in zip(range(batch_size), f)]
+            if not records:
+                break
+            live = []
+            for record in records:
+                # pttl -1: ключ без срока жизни, RESTORE с ttl 0
+                ttl = 0 if record["pttl"] == -1 else record["pttl"] - elapsed_ms
+                if record["pttl"] == -1 or ttl > 0:
+                    live.append((record["key"], ttl, base64.b64decode(record["value"])))
+            expired += len(records) - len(live)
+            if not live:
+                continue
+
+            def run(client: Redis, indexes: List[int]) -> list:
+                pipe = client.pipeline(transaction=False)
+                for i in indexes:
+                    key, ttl, value = live[i]
+                    pipe.restore(key, ttl, value, replace=True)
+                return pipe.execute()
+
+            results = redis.map_nodes(redis.group_keys([key for key, _, _ in live]), run)
+            restored += sum(len(result) for result in results.values())
+    logger.info(f"Восстановлено записей кеша: {restored}, истекло: {expired}")
+    return restored
+
+
+def create(out_dir: str, cache_top: int = 10000, skip_qdrant: bool = False, skip_cache: bool = False):
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {"created_at": time.time(), "shards": [], "cache": None}
+    if not skip_qdrant:
+        qdrant = ShardedQdrant(Config.QDRANT_SHARDS, timeout=600)
+        for index, shard in enumerate(qdrant.shards):
+            filename = snapshot_shard(shard, out_dir, index)
+            manifest["shards"].append({"name": shard.name, "file": filename})
+        qdrant.close()
+    if not skip_cache:
+        redis = ShardedRedis(Config.REDIS_NODES, replicas=Config.REDIS_RING_REPLICAS)
+        # Время снимка кеша фиксируется до чтения PTTL, чтобы при восстановлении TTL не продлевались
+        manifest["created_at"] = time.time()
+        count = dump_cache(redis, os.path.join(out_dir, "cache.jsonl"), cache_top)
+        manifest["cache"] = {"file": "cache.jsonl", "entries": count}
+        redis.close()
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    logger.info(f"Снимок создан: {out_dir}")
+
+
+def restore(src_dir: str, skip_qdrant: bool = False, skip_cache: bool = False):
+    with open(os.path.join(src_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    if not skip_qdrant and manifest["shards"]:
+        qdrant = ShardedQdrant(Config.QDRANT_SHARDS, timeout=3600)
+        if len(qdrant.shards) != len(manifest["shards"]):
+            raise ValueError(
+                f"Число шардов в снимке ({len(manifest['shards'])}) "
+                f"не совпадает с QDRANT_SHARDS ({len(qdrant.shards)})"
+            )
+        for shard, entry in zip(qdrant.shards, manifest["shards"]):
+            restore_shard(shard, os.path.join(src_dir, entry["file"]))
+        qdrant.close()
+    if not skip_cache and manifest["cache"]:
+        redis = ShardedRedis(Config.REDIS_NODES, replicas=Config.REDIS_RING_REPLICAS)
+        elapsed_ms = int((time.time() - manifest["created_at"]) * 1000)
+        restore_cache(redis, os.path.join(src_dir, manifest["cache"]["file"]), elapsed_ms)
+        redis.close()
+    logger.info(f"Снимок восстановлен: {src_dir}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Снимки Qdrant и горячего кеша поиска")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create_parser = commands.add_parser("create")
+    create_parser.add_argument("--out", required=True)
+    create_parser.add_argument("--cache-top", type=int, default=10000, help="Сколько горячих ключей сохранить")
+    restore_parser = commands.add_parser("restore")
+    restore_parser.add_argument("--src", required=True)
+    for command in (create_parser, restore_parser):
+        command.add_argument("--skip-qdrant", action="store_true")
+        command.add_argument("--skip-cache", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.command == "create":
+        create(args.out, args.cache_top, args.skip_qdrant, args.skip_cache)
+    else:
+        restore(args.src, args.skip_qdrant, args.skip_cache)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import random
+import uuid
+from typing import Awaitable, Callable, List, Tuple
+
+from .sharding import ShardedRedis
+
+logger = logging.getLogger(__name__)
+
+HOT_QUERIES_KEY = "hot:queries"
+HOT_REQUESTS_KEY = "hot:requests"
+WARMUP_LOCK_KEY = "hot:warmup:lock"
+
+
+class HotQueryTracker:
+    """Ограниченный набор самых частых запросов поиска в Redis.
+
+    Частоты хранятся в ZSET (ключ кеша -> счетчик), тела запросов в HASH.
+    Набор периодически обрезается до capacity, а счетчики затухают при
+    каждом прогреве, поэтому новые горячие запросы вытесняют старые.
+    """
+
+    def __init__(self, redis: ShardedRedis, capacity: int = 1000, sample_rate: float = 0.1, trim_every: int = 100):
+        self.redis = redis
+        self.capacity = capacity
+        self.sample_rate = sample_rate
+        self.trim_every = trim_every
+        self._samples = 0
+
+    @property
+    def client(self):
+        # Оба служебных ключа хранятся на узле, которому принадлежит HOT_QUERIES_KEY
+        return self.redis.get_client(HOT_QUERIES_KEY)
+
+    def should_sample(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def record(self, cache_key: str, request_json: str):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zincrby(HOT_QUERIES_KEY, 1, cache_key)
+        pipe.hset(HOT_REQUESTS_KEY, cache_key, request_json)
+        pipe.execute()
+        self._samples += 1
+        if self._samples % self.trim_every == 0:
+            self.trim()
+
+    def trim(self):
+        """Удаляет самые редкие запросы сверх capacity"""
+        client = self.client
+        evicted = client.zrange(HOT_QUERIES_KEY, 0, -(self.capacity + 1))
+        if evicted:
+            pipe = client.pipeline(transaction=False)
+            pipe.zrem(HOT_QUERIES_KEY, *evicted)
+            pipe.hdel(HOT_REQUESTS_KEY, *evicted)
+            pipe.execute()
+
+    def top(self, count: int) -> List[Tuple[str, str]]:
+        """Самые частые запросы: пары (ключ кеша, JSON запроса)"""
+        client = self.client
+        keys = client.zrevrange(HOT_QUERIES_KEY, 0, count - 1)
+        if not keys:
+            return []
+        bodies = client.hmget(HOT_REQUESTS_KEY, keys)
+        return [(key, body) for key, body in zip(keys, bodies) if body is not None]
+
+    def decay(self, factor: float = 0.5):
+        self.client.zunionstore(HOT_QUERIES_KEY, {HOT_QUERIES_KEY: factor})
+
+
+class CacheWarmer:
+    """Повторно выполняет горячие запросы, пока их записи в кеше не истекли.
+
+    Запрос обновляется, если до истечения его записи осталось меньше
+    refresh_before секунд или записи нет совсем. Между репликами
+    приложения прогрев сериализуется блокировкой в Redis.
+    """
+
+    def __init__(
+        self,
+        tracker: HotQueryTracker,
+        refresh: Callable[[str, str], Awaitable[None]],
+        top: int = 500,
+        refresh_before: float = 120,
+        concurrency: int = 8,
+        lock_ttl: int = 300,
+        decay: float = 0.5,
+    ):
+        self.tracker = tracker
+        self.refresh = refresh
+        self.top = top
+        self.refresh_before = refresh_before
+        self.concurrency = concurrency
+        self.lock_ttl = lock_ttl
+        self.decay = decay
+
+    def _ttls(self, keys: List[str]) -> List[int]:
+        redis = self.tracker.redis
+        groups = redis.group_keys(keys)
+
+        def run(client, indexes):
+            pipe = client.pipeline(transaction=False)
+            for i in indexes:
+                pipe.pttl(keys[i])
+            return pipe.execute()
+
+        results = redis.map_nodes(groups, run)
+        ttls = [-2] * len(keys)
+        for node, indexes in groups.items():
+            for index, ttl in zip(indexes, results[node]):
+                ttls[index] = ttl
+        return ttls
+
+    async def warm_once(self) -> dict:
+        lock_client = self.tracker.redis.get_client(WARMUP_LOCK_KEY)
+        token = uuid.uuid4().hex
+        if not await asyncio.to_thread(lock_client.set, WARMUP_LOCK_KEY, token, nx=True, ex=self.lock_ttl):
+            return {"status": "skipped", "reason": "another replica is warming"}
+        try:
+            hot = await asyncio.to_thread(self.tracker.top, self.top)
+            ttls = await asyncio.to_thread(self._ttls, [key for key, _ in hot]) if hot else []
+            threshold_ms = self.refresh_before * 1000
+            # pttl -2: записи нет, -1: без срока жизни (не трогаем)
+            stale = [item for item, ttl in zip(hot, ttls) if ttl == -2 or 0 <= ttl < threshold_ms]
+
+            semaphore = asyncio.Semaphore(self.concurrency)
+            failures = 0
+
+            async def refresh_one(cache_key: str, request_json: str):
+                nonlocal failures
+                async with semaphore:
+                    try:
+                        await self.refresh(cache_key, request_json)
+                    except Exception as e:
+                        failures += 1
+                        logger.warning(f"Не удалось прогреть {cache_key}: {e}")
+
+            await asyncio.gather(*[refresh_one(key, body) for key, body in stale])
+            if self.decay < 1:
+                await asyncio.to_thread(self.tracker.decay, self.decay)
+            stats = {"status": "ok", "hot": len(hot), "refreshed": len(stale) - failures, "failed": failures}
+            logger.info(f"Прогрев кеша: {stats}")
+            return stats
+        finally:
+            if await asyncio.to_thread(lock_client.get, WARMUP_LOCK_KEY) == token:
+                await asyncio.to_thread(lock_client.delete, WARMUP_LOCK_KEY)
+
+    async def run_forever(self, interval: float, initial: bool = True):
+        if not initial:
+            await asyncio.sleep(interval)
+        while True:
+            try:
+                await self.warm_once()
+            except Exception as e:
+                logger.warning(f"Ошибка прогрева кеша: {e}")
+            if interval <= 0:
+                return
+            await asyncio.sleep(interval)
@@ -0,0 +1,206 @@
+"""Микробенчмарки горячего пути запроса /search.
+
+Работают без Redis и Qdrant: клиенты в app.main создаются лениво и не
+подключаются, пока к ним не обратились.
+
+    python benchmarks/bench_hot_path.py                  # сравнить с baseline.json
+    python benchmarks/bench_hot_path.py --save-baseline  # записать новый baseline
+    python benchmarks/bench_hot_path.py --tolerance 0.3 --only cache_key
+
+Для каждого бенчмарка timeit подбирает число повторов на ~0.2 с, замер
+повторяется --repeat раз. Сравнение идет по минимуму (наименее шумная
+оценка), медиана и разброс выводятся для контроля стабильности.
+Минимум делится на время калибровочной нагрузки того же запуска, поэтому
+сравнение с baseline устойчиво к скорости и загрузке машины.
+Регрессия - нормированное время хуже baseline более чем на tolerance.
+Подозрительные бенчмарки перемеряются еще --confirm раз вместе с
+калибровкой, учитывается лучший результат; если регрессия подтвердилась,
+код выхода 1.
+
+Baseline снимается в окружении из requirements.txt (версии пакетов
+записываются в его environment); при расхождении версий сравнение
+выводит предупреждение.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+import uuid
+from importlib import metadata
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# app.main монтирует app/static относительно рабочего каталога
+os.chdir(PROJECT_DIR)
+sys.path.insert(0, PROJECT_DIR)
+
+import numpy as np
+from qdrant_client.models import ScoredPoint
+
+from app import main
+from app.models import VectorSearchRequest
+
+DIM = 128
+LIMIT = 10
+# Пакеты горячего пути; их версии пишутся в baseline и сверяются при сравнении
+PACKAGES = ("numpy", "pydantic", "pydantic-core", "fastapi", "qdrant-client")
+
+
+def make_fixtures():
+    rng = np.random.default_rng(42)
+    vector = rng.random(DIM).tolist()
+    body = {"vector": vector, "limit": LIMIT}
+    filtered_body = {
+        "vector": vector,
+        "limit": LIMIT,
+        "filter": {"must": [{"key": "type", "match": "test"}]},
+    }
+    hits = [
+        ScoredPoint(
+            id=str(uuid.UUID(int=i)),
+            version=0,
+            score=float(score),
+            payload={"type": "test", "timestamp": "2026-10-19T00:00:00Z"},
+        )
+        for i, score in enumerate(sorted(rng.random(LIMIT), reverse=True))
+    ]
+    request = VectorSearchRequest(**body)
+    filtered_request = VectorSearchRequest(**filtered_body)
+    results = main.build_results(hits)
+    encoded = main.encode_cached_results(results)
+    return {
+        "body": body,
+        "request": request,
+        "filtered_request": filtered_request,
+        "hits": hits,
+        "results": results,
+        "encoded": encoded,
+    }
+
+
+def calibration():
+    # Фиксированная нагрузка на чистом Python: словари, строки, арифметика
+    data = {}
+    for i in range(200):
+        data[f"k{i}"] = i * 1.5
+    return sum(value for key, value in data.items() if key[-1] != "0")
+
+
+def benchmarks(f):
+    return {
+        "cache_key": lambda: main.search_cache_key(f["request"]),
+        "cache_key_filtered": lambda: main.search_cache_key(f["filtered_request"]),
+        "validate_request": lambda: VectorSearchRequest(**f["body"]),
+        "build_results": lambda: main.build_results(f["hits"]),
+        "serialize_response": lambda: json.dumps({"source": "database", "results": f["results"]}),
+        "cache_encode": lambda: main.encode_cached_results(f["results"]),
+        "cache_decode": lambda: main.decode_cached_results(f["encoded"]),
+    }
+
+
+def measure(func, repeat: int) -> dict:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(number, 1)
+    per_op = [total / number * 1e6 for total in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "min_us": round(min(per_op), 4),
+        "median_us": round(statistics.median(per_op), 4),
+        "stdev_us": round(statistics.stdev(per_op), 4) if len(per_op) > 1 else 0.0,
+        "number": number,
+    }
+
+
+def environment() -> dict:
+    env = {"python": platform.python_version()}
+    for package in PACKAGES:
+        try:
+            env[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            env[package] = None
+    env["machine"] = platform.machine()
+    env["processor"] = platform.processor()
+    return env
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Микробенчмарки горячего пути vector-search-app")
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Допустимое замедление, доля")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--only", nargs="*", help="Запустить только указанные бенчмарки")
+    parser.add_argument("--confirm", type=int, default=2, help="Сколько раз перемерить подозрение на регрессию")
+    args = parser.parse_args(argv)
+
+    cases = benchmarks(make_fixtures())
+    if args.only:
+        cases = {name: func for name, func in cases.items() if name in args.only}
+
+    reference = measure(calibration, args.repeat)["min_us"]
+    results = {}
+    for name, func in cases.items():
+        results[name] = measure(func, args.repeat)
+        results[name]["relative"] = round(results[name]["min_us"] / reference, 5)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        baseline = stored["benchmarks"]
+        current = environment()
+        for name in ("python",) + PACKAGES:
+            recorded = stored.get("environment", {}).get(name)
+            if recorded != current[name]:
+                print(f"Внимание: baseline снят с {name}=={recorded}, сейчас {current[name]}")
+
+    def change(name):
+        return results[name]["relative"] / baseline[name]["relative"] - 1
+
+    suspects = [name for name in results if name in baseline and change(name) > args.tolerance]
+    for _ in range(args.confirm):
+        if not suspects:
+            break
+        reference = measure(calibration, args.repeat)["min_us"]
+        for name in suspects:
+            stats = measure(cases[name], args.repeat)
+            stats["relative"] = round(stats["min_us"] / reference, 5)
+            if stats["relative"] < results[name]["relative"]:
+                results[name] = stats
+        suspects = [name for name in suspects if change(name) > args.tolerance]
+
+    regressions = []
+    print(f"{'benchmark':<22}{'min, us':>12}{'median, us':>14}{'stdev':>10}{'baseline':>12}{'change':>10}")
+    for name, stats in results.items():
+        line = f"{name:<22}{stats['min_us']:>12.3f}{stats['median_us']:>14.3f}{stats['stdev_us']:>10.3f}"
+        if name in baseline:
+            base = baseline[name]["min_us"]
+            flag = "  REGRESSION" if change(name) > args.tolerance else ""
+            line += f"{base:>12.3f}{change(name):>+10.1%}{flag}"
+            if flag:
+                regressions.append(name)
+        print(line)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(
+                {"environment": environment(), "calibration_us": reference, "benchmarks": results},
+                f,
+                indent=2,
+            )
+            f.write("\n")
+        print(f"Baseline сохранен: {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"Регрессия больше {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,101 @@
+import sys
+import os
+
+# Добавляем путь к проекту
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import pytest
+from redis import ConnectionError, ResponseError
+
+from app.sharding import ShardedRedis
+
+
+class FakePipeline:
+    """Pipeline поверх FakeRedis: команды копятся и выполняются в execute()"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def set(self, key, value, ex=None):
+        self.commands.append(lambda: self.redis.set(key, value, ex=ex))
+
+    def pttl(self, key):
+        self.commands.append(lambda: self.redis.pttl(key))
+
+    def object(self, subcommand, key):
+        self.commands.append(lambda: self.redis.freq.get(key))
+
+    def restore(self, key, ttl, value, replace=False):
+        def restore():
+            self.redis.restored[key] = (ttl, value)
+            return True
+        self.commands.append(restore)
+
+    def execute(self, raise_on_error=True):
+        self.redis.calls += 1
+        if self.redis.down:
+            raise ConnectionError("узел недоступен")
+        results = []
+        for command in self.commands:
+            try:
+                results.append(command())
+            except ResponseError as e:
+                if raise_on_error:
+                    raise
+                results.append(e)
+        self.commands = []
+        return results
+
+
+class FakeRedis:
+    """Узел Redis в памяти: строки с TTL, частоты ключей для snapshot и отказы для тестов ошибок"""
+
+    def __init__(self):
+        self.data = {}
+        # TTL в секундах, как в SET ex; -1 - ключ без срока
+        self.ttls = {}
+        self.freq = {}
+        self.restored = {}
+        self.calls = 0
+        self.broken = set()
+        self.down = False
+
+    def set(self, key, value, nx=False, ex=None):
+        if key in self.broken:
+            raise ResponseError("WRONGTYPE")
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        self.ttls[key] = ex if ex is not None else -1
+        return True
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def mget(self, keys):
+        self.calls += 1
+        return [self.data.get(key) for key in keys]
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+            self.ttls.pop(key, None)
+
+    def pttl(self, key):
+        ttl = self.ttls.get(key, -2)
+        return ttl * 1000 if ttl > 0 else ttl
+
+    def scan_iter(self, match, count):
+        return iter(self.freq)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+@pytest.fixture
+def sharded_redis():
+    """ShardedRedis на двух узлах FakeRedis"""
+    redis = ShardedRedis(["redis-0:6379", "redis-1:6379"])
+    redis.clients = {node: FakeRedis() for node in redis.clients}
+    return redis
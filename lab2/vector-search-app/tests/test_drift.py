@@ -0,0 +1,148 @@
+import sys
+import os
+
+import numpy as np
+
+# Добавляем путь к проекту
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.drift import (
+    DriftMonitor,
+    QueryProfile,
+    RunningMoments,
+    decode_vectors,
+    drift_scores,
+    encode_vector,
+)
+from app.sharding import ShardedRedis
+
+
+class FakeRedis:
+    def __init__(self):
+        self.stream = []
+        self.values = {}
+
+    def xadd(self, key, fields, maxlen=None, approximate=True):
+        entry_id = f"{len(self.stream) + 1}-0"
+        self.stream.append((entry_id, fields))
+        if maxlen is not None:
+            self.stream = self.stream[-maxlen:]
+        return entry_id
+
+    def xread(self, streams, count=None, block=None):
+        (key, last_id), = streams.items()
+        if last_id == "$":
+            return []
+        entries = [entry for entry in self.stream if int(entry[0].split("-")[0]) > int(last_id.split("-")[0])]
+        return [[key, entries[:count]]] if entries else []
+
+    def set(self, key, value, nx=False, ex=None):
+        self.values[key] = value
+        return True
+
+    def get(self, key):
+        return self.values.get(key)
+
+
+def make_redis():
+    redis = ShardedRedis(["redis-0:6379"])
+    fake = FakeRedis()
+    redis.clients = {node: fake for node in redis.clients}
+    return redis, fake
+
+
+def test_running_moments_match_numpy():
+    """Тест что моменты, накопленные пачками, совпадают с расчетом по всей выборке"""
+    data = np.random.default_rng(0).normal(3, 2, size=(1000, 8))
+    moments = RunningMoments(8)
+    for start in range(0, 1000, 137):
+        moments.update(data[start:start + 137])
+
+    assert moments.count == 1000
+    assert np.allclose(moments.mean, data.mean(axis=0))
+    assert np.allclose(moments.variance, data.var(axis=0, ddof=1))
+
+
+def test_drift_scores_detect_shift():
+    """Тест что сдвиг распределения дает большие метрики, а та же выборка - около нуля"""
+    rng = np.random.default_rng(1)
+    reference = QueryProfile(16)
+    reference.update(rng.random((2000, 16)))
+    same = QueryProfile(16, reference.moments.mean)
+    same.update(rng.random((2000, 16)))
+    shifted = QueryProfile(16, reference.moments.mean)
+    shifted.update(rng.random((2000, 16)) * 2 + 0.5)
+
+    stable = drift_scores(same, reference)
+    drifted = drift_scores(shifted, reference)
+
+    assert stable["mean_shift"] < 0.1
+    assert stable["norm_psi"] < 0.05
+    assert drifted["mean_shift"] > 1
+    assert drifted["norm_psi"] > 1
+
+
+def test_monitor_aggregates_stream_and_scores_window():
+    """Тест что агрегатор читает поток, сравнивает окно с референсом и сбрасывает его"""
+    redis, fake = make_redis()
+    monitor = DriftMonitor(redis, sample_rate=1.0, min_samples=100, read_batch=500)
+    monitor._last_id = "0-0"
+    rng = np.random.default_rng(2)
+    for vector in rng.random((300, 8)):
+        monitor.record(vector.tolist())
+    while monitor.consume():
+        pass
+    monitor.save_reference()
+
+    for vector in rng.random((300, 8)) + 1.0:
+        monitor.record(vector.tolist())
+    while monitor.consume():
+        pass
+    assert monitor.profile.count == 300
+    monitor.close_window()
+
+    assert monitor.last_scores["drift_detected"] == 1.0
+    assert monitor.profile.count == 0
+    # Референс доступен другим репликам через Redis
+    other = DriftMonitor(redis)
+    assert other.load_reference().count == 300
+
+
+def test_reference_and_status_shared_between_replicas():
+    """Тест что референс сохраняется с любой реплики, а лидер подхватывает его на лету"""
+    redis, fake = make_redis()
+    leader = DriftMonitor(redis, sample_rate=1.0, min_samples=100, read_batch=500)
+    leader._last_id = "0-0"
+    replica = DriftMonitor(redis, min_samples=100)
+    rng = np.random.default_rng(3)
+    for vector in rng.random((300, 8)):
+        leader.record(vector.tolist())
+    while leader.consume():
+        pass
+
+    # Окно лидера видно на другой реплике, и она может сохранить его как референс
+    assert replica.status()["window_samples"] == 300
+    assert replica.save_reference() == {"status": "saved", "count": 300}
+    assert replica.status()["reference_samples"] == 300
+
+    # Лидер перечитывает референс и начинает новое окно от его центроида
+    assert leader.load_reference().count == 300
+    assert leader.profile.count == 0
+    assert np.allclose(leader.profile.centroid, leader.reference.moments.mean)
+
+    for vector in rng.random((300, 8)) + 1.0:
+        leader.record(vector.tolist())
+    while leader.consume():
+        pass
+    leader.close_window()
+
+    status = replica.status()
+    assert status["last_scores"]["drift_detected"] == 1.0
+    assert status["window_samples"] == 0
+
+
+def test_vector_encoding_roundtrip():
+    """Тест кодирования векторов для потока Redis"""
+    vectors = [[0.5, -1.25, 3.0], [1.0, 2.0, 4.0]]
+    decoded = decode_vectors([encode_vector(vector) for vector in vectors])
+    assert decoded.tolist() == vectors
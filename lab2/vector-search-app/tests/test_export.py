@@ -0,0 +1,54 @@
+import sys
+import os
+import asyncio
+import json
+
+# Добавляем путь к проекту
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+from qdrant_client.models import Record
+
+from app.export import decode_f32, iter_export
+
+
+def make_scroll(total):
+    """Имитация qdrant_client.scroll: страницы по limit точек и смещение следующей"""
+    records = [Record(id=i, vector=[float(i)] * 4, payload={"n": i}) for i in range(total)]
+    pages = []
+
+    def scroll(collection_name, scroll_filter, limit, offset, with_payload, with_vectors):
+        start = offset or 0
+        page = records[start:start + limit]
+        pages.append(len(page))
+        next_offset = start + limit if start + limit < total else None
+        return page, next_offset
+
+    return scroll, pages
+
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+
+def test_export_ndjson_walks_all_pages():
+    """Тест что выгрузка NDJSON проходит все страницы scroll"""
+    scroll, pages = make_scroll(10)
+    chunks = asyncio.run(collect(iter_export(scroll, "documents", batch_size=4, with_vectors=False)))
+
+    lines = b"".join(chunks).decode("utf-8").splitlines()
+    records = [json.loads(line) for line in lines]
+    assert pages == [4, 4, 2]
+    assert [record["id"] for record in records] == list(range(10))
+    assert "vector" not in records[0]
+    assert records[3]["payload"] == {"n": 3}
+
+
+def test_export_f32_roundtrip():
+    """Тест что бинарный формат float32 читается обратно"""
+    scroll, _ = make_scroll(5)
+    chunks = asyncio.run(collect(iter_export(scroll, "documents", export_format="f32", batch_size=2)))
+
+    decoded = list(decode_f32(b"".join(chunks)))
+    assert [point_id for point_id, _ in decoded] == ["0", "1", "2", "3", "4"]
+    np.testing.assert_array_equal(decoded[2][1], np.full(4, 2.0, dtype=np.float32))
@@ -0,0 +1,60 @@
+import sys
+import os
+
+# Добавляем путь к проекту
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import pytest
+from pydantic import ValidationError
+
+from app.config import parse_payload_indexes
+from app.filters import build_filter, filter_fingerprint, filter_keys
+from app.models import SearchFilter, VectorSearchRequest
+
+
+def test_build_filter_maps_conditions():
+    """Тест преобразования фильтра запроса в фильтр Qdrant"""
+    search_filter = SearchFilter(
+        must=[{"key": "type", "match": "test"}, {"key": "price", "range": {"gte": 1, "lt": 10}}],
+        must_not=[{"key": "lang", "any": ["de", "fr"]}],
+    )
+    qdrant_filter = build_filter(search_filter)
+
+    assert qdrant_filter.must[0].key == "type"
+    assert qdrant_filter.must[0].match.value == "test"
+    assert qdrant_filter.must[1].range.gte == 1
+    assert qdrant_filter.must[1].range.lt == 10
+    assert qdrant_filter.must_not[0].match.any == ["de", "fr"]
+    assert qdrant_filter.should is None
+    assert filter_keys(search_filter) == {"type", "price", "lang"}
+
+
+def test_empty_filter_is_ignored():
+    """Тест что пустой фильтр не меняет запрос и ключ кеша"""
+    assert build_filter(None) is None
+    assert build_filter(SearchFilter()) is None
+    assert filter_fingerprint(SearchFilter()) == ""
+
+
+def test_filter_fingerprint_is_stable_and_distinct():
+    """Тест что отпечаток фильтра различает фильтры и не зависит от порядка полей"""
+    a = VectorSearchRequest(vector=[0.1], filter={"must": [{"key": "type", "match": "a"}]})
+    b = VectorSearchRequest(vector=[0.1], filter={"must": [{"match": "a", "key": "type"}]})
+    c = VectorSearchRequest(vector=[0.1], filter={"must": [{"key": "type", "match": "b"}]})
+
+    assert filter_fingerprint(a.filter) == filter_fingerprint(b.filter)
+    assert filter_fingerprint(a.filter) != filter_fingerprint(c.filter)
+
+
+def test_field_filter_requires_single_condition():
+    """Тест валидации условия фильтра"""
+    with pytest.raises(ValidationError):
+        SearchFilter(must=[{"key": "type"}])
+    with pytest.raises(ValidationError):
+        SearchFilter(must=[{"key": "type", "match": "a", "any": ["b"]}])
+
+
+def test_parse_payload_indexes_skips_malformed_entries():
+    """Тест что записи без ":" или с неизвестным типом пропускаются, а не роняют приложение"""
+    indexes = parse_payload_indexes(" type:keyword, price , :integer, lang:unknown, year : Integer ,")
+    assert indexes == {"type": "keyword", "year": "integer"}
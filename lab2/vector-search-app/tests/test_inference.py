@@ -0,0 +1,233 @@
+import sys
+import os
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+# Добавляем путь к проекту
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.inference import (
+    PREDICT_VERSION_KEY,
+    LoadedModel,
+    MicroBatchPredictor,
+    ModelNotLoadedError,
+    ModelVersionSync,
+)
+from app.models import PredictRequest
+
+
+class FakeModel:
+    n_features_in_ = 2
+
+    def __init__(self, offset):
+        self.offset = offset
+        self.batches = []
+
+    def predict(self, rows):
+        self.batches.append(len(rows))
+        return rows.sum(axis=1) + self.offset
+
+
+def test_concurrent_rows_share_one_predict_call():
+    """Тест что одновременные запросы собираются в одну пачку и получают свои строки"""
+
+    async def scenario():
+        predictor = MicroBatchPredictor(max_batch=64, max_wait=0.05)
+        await predictor.start()
+        model = FakeModel(0)
+        await predictor.swap(lambda: LoadedModel("iris", "1", model))
+        results = await asyncio.gather(
+            *[predictor.predict([[i, i]]) for i in range(10)],
+            predictor.predict([[1, 2], [3, 4]]),
+        )
+        await predictor.stop()
+        return model, results
+
+    model, results = asyncio.run(scenario())
+
+    assert model.batches == [12]
+    assert [result for result, _ in results[:10]] == [[2.0 * i] for i in range(10)]
+    assert results[10] == ([3.0, 7.0], "1")
+
+
+def test_swap_keeps_serving_and_switches_version():
+    """Тест что после подмены модели новые запросы идут в новую версию"""
+
+    async def scenario():
+        predictor = MicroBatchPredictor(max_batch=8, max_wait=0.001)
+        await predictor.start()
+        await predictor.swap(lambda: LoadedModel("iris", "1", FakeModel(0)))
+        before = await predictor.predict([[1, 1]])
+        await predictor.swap(lambda: LoadedModel("iris", "2", FakeModel(100)))
+        after = await predictor.predict([[1, 1]])
+        stats = predictor.stats()
+        await predictor.stop()
+        return before, after, stats
+
+    before, after, stats = asyncio.run(scenario())
+
+    assert before == ([2.0], "1")
+    assert after == ([102.0], "2")
+    assert stats["model"]["version"] == "2"
+    assert stats["batch_size"]["max"] == 1.0
+
+
+def test_rejects_unloaded_model_and_wrong_width():
+    """Тест ошибок: модель не загружена, неверное число признаков"""
+
+    async def scenario():
+        predictor = MicroBatchPredictor()
+        await predictor.start()
+        errors = []
+        try:
+            await predictor.predict([[1, 2]])
+        except ModelNotLoadedError:
+            errors.append("not_loaded")
+        await predictor.swap(lambda: LoadedModel("iris", "1", FakeModel(0)))
+        try:
+            await predictor.predict([[1, 2, 3]])
+        except ValueError:
+            errors.append("width")
+        await predictor.stop()
+        return errors
+
+    assert asyncio.run(scenario()) == ["not_loaded", "width"]
+
+
+class PickyModel(FakeModel):
+    """Модель, которая падает на отрицательных признаках"""
+
+    def predict(self, rows):
+        if (rows < 0).any():
+            raise ValueError("отрицательный признак")
+        return super().predict(rows)
+
+
+def test_bad_row_does_not_fail_its_batch():
+    """Тест что строка с NaN или строка, на которой падает модель, не роняет соседей по пачке"""
+
+    async def scenario():
+        predictor = MicroBatchPredictor(max_batch=64, max_wait=0.05)
+        await predictor.start()
+        model = PickyModel(0)
+        await predictor.swap(lambda: LoadedModel("iris", "1", model))
+        results = await asyncio.gather(
+            predictor.predict([[float("nan"), 1]]),
+            predictor.predict([[1, 2]]),
+            return_exceptions=True,
+        )
+        results += await asyncio.gather(
+            predictor.predict([[-1, 2]]),
+            predictor.predict([[3, 4]]),
+            return_exceptions=True,
+        )
+        await predictor.stop()
+        return model, results
+
+    model, results = asyncio.run(scenario())
+
+    assert isinstance(results[0], ValueError)
+    assert results[1] == ([3.0], "1")
+    assert isinstance(results[2], ValueError)
+    assert results[3] == ([7.0], "1")
+    # Успешные вызовы: первая пачка без NaN и повтор хорошего запроса из упавшей пачки
+    assert model.batches == [1, 1]
+
+
+def test_predict_request_rejects_non_finite_values():
+    """Тест что NaN и Infinity отклоняются при разборе запроса"""
+    with pytest.raises(ValidationError):
+        PredictRequest.model_validate_json('{"features": [NaN, 1.0]}')
+    with pytest.raises(ValidationError):
+        PredictRequest(instances=[[1.0, 2.0], [float("inf"), 1.0]])
+    assert PredictRequest(features=[1.0, 2.0]).rows() == [[1.0, 2.0]]
+
+
+class BlockingModel(FakeModel):
+    """Модель, predict которой ждет разрешения"""
+
+    def __init__(self):
+        super().__init__(0)
+        self.release = threading.Event()
+
+    def predict(self, rows):
+        self.release.wait(timeout=10)
+        return super().predict(rows)
+
+
+def test_stop_fails_queued_and_in_flight_requests():
+    """Тест что остановка завершает ошибкой запросы в очереди и в прерванной пачке"""
+
+    async def scenario():
+        predictor = MicroBatchPredictor(max_batch=1, max_wait=0.001)
+        await predictor.start()
+        model = BlockingModel()
+        await predictor.swap(lambda: LoadedModel("iris", "1", model))
+        requests = [asyncio.create_task(predictor.predict([[i, i]])) for i in range(5)]
+        while not predictor._batch:
+            await asyncio.sleep(0.001)
+        await predictor.stop()
+        model.release.set()
+        results = await asyncio.wait_for(asyncio.gather(*requests, return_exceptions=True), timeout=5)
+        try:
+            await predictor.predict([[1, 1]])
+        except ModelNotLoadedError:
+            results.append("rejected")
+        return results
+
+    results = asyncio.run(scenario())
+
+    assert all(isinstance(result, ModelNotLoadedError) for result in results[:5])
+    assert results[5] == "rejected"
+
+
+def test_model_version_is_shared_between_replicas(sharded_redis):
+    """Тест что версия, опубликованная на одной реплике, подтягивается другой"""
+    loads = []
+
+    def loader(version):
+        loads.append(version)
+        if version == "broken":
+            raise RuntimeError("нет такой версии")
+        return LoadedModel("iris", version, FakeModel(int(version)))
+
+    async def scenario():
+        first, second = MicroBatchPredictor(), MicroBatchPredictor()
+        first_sync = ModelVersionSync(sharded_redis, first, loader)
+        second_sync = ModelVersionSync(sharded_redis, second, loader)
+        # Без сохраненной версии берется версия из конфигурации
+        assert await second_sync.sync_once(default="1")
+        await first_sync.publish("2")
+        assert await second_sync.sync_once(default="1")
+        assert not await second_sync.sync_once(default="1")
+        # Неудачная загрузка не повторяется на каждом опросе
+        sharded_redis.get_client(PREDICT_VERSION_KEY).set(PREDICT_VERSION_KEY, "broken")
+        with pytest.raises(RuntimeError):
+            await second_sync.sync_once()
+        assert not await second_sync.sync_once()
+        return first.current.version, second.current.version
+
+    assert asyncio.run(scenario()) == ("2", "2")
+    assert loads == ["1", "2", "2", "broken"]
+
+
+def test_swap_endpoint_requires_admin_token(monkeypatch):
+    """Тест что подмена модели выключена без токена и отклоняет неверный токен"""
+    from fastapi import HTTPException
+
+    from app import main
+    from app.models import ModelSwapRequest
+
+    request = ModelSwapRequest(version="2")
+    monkeypatch.setattr(main.Config, "PREDICT_ADMIN_TOKEN", "")
+    with pytest.raises(HTTPException) as disabled:
+        asyncio.run(main.swap_predict_model(request, x_admin_token="secret"))
+    monkeypatch.setattr(main.Config, "PREDICT_ADMIN_TOKEN", "secret")
+    with pytest.raises(HTTPException) as denied:
+        asyncio.run(main.swap_predict_model(request, x_admin_token="wrong"))
+
+    assert (disabled.value.status_code, denied.value.status_code) == (403, 401)
@@ -0,0 +1,160 @@
+import sys
+import os
+import asyncio
+
+# Добавляем путь к проекту
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import pytest
+from qdrant_client.models import PointStruct
+
+from app.ingest import WriteBehindBuffer, BufferFullError, RedisSpill
+
+
+def make_point(i):
+    return PointStruct(id=i, vector=[0.1] * 4, payload={"n": i})
+
+
+def test_write_behind_batches_and_drains_on_stop():
+    """Тест что точки пишутся пачками и все подтвержденные точки записываются при остановке"""
+    batches = []
+
+    async def scenario():
+        buffer = WriteBehindBuffer(batches.append, max_size=100, batch_size=10, flush_interval=5.0)
+        await buffer.start()
+        for i in range(25):
+            await buffer.put(make_point(i))
+        await buffer.stop()
+        return buffer
+
+    buffer = asyncio.run(scenario())
+
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert [p.id for batch in batches for p in batch] == list(range(25))
+    assert buffer.flushed == 25
+
+
+def test_write_behind_backpressure():
+    """Тест что при заполненной очереди put отклоняется с BufferFullError"""
+
+    async def scenario():
+        release = asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        def slow_upsert(points):
+            asyncio.run_coroutine_threadsafe(release.wait(), loop).result()
+
+        buffer = WriteBehindBuffer(slow_upsert, max_size=2, batch_size=1, flush_interval=0.01, put_timeout=0.05)
+        await buffer.start()
+        await buffer.put(make_point(0))
+        await asyncio.sleep(0.05)
+        await buffer.put(make_point(1))
+        await buffer.put(make_point(2))
+        with pytest.raises(BufferFullError):
+            await buffer.put(make_point(3))
+        release.set()
+        await buffer.stop()
+        return buffer
+
+    buffer = asyncio.run(scenario())
+
+    assert buffer.rejected == 1
+    assert buffer.flushed == 3
+
+
+class FakeListRedis:
+    """Список и строки Redis в памяти для RedisSpill"""
+
+    def __init__(self):
+        self.lists = {}
+        self.values = {}
+
+    def get_client(self, key):
+        return self
+
+    def rpush(self, key, *items):
+        self.lists.setdefault(key, []).extend(items)
+
+    def lrange(self, key, start, end):
+        return self.lists.get(key, [])[start:end + 1]
+
+    def ltrim(self, key, start, end):
+        self.lists[key] = self.lists.get(key, [])[start:]
+
+    def llen(self, key):
+        return len(self.lists.get(key, []))
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def expire(self, key, ttl):
+        return True
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+
+def test_write_behind_spills_on_shutdown_and_replays_on_start():
+    """Тест что подтвержденные точки при недоступном Qdrant уходят в spill и дописываются при старте"""
+    redis = FakeListRedis()
+
+    def failing_upsert(points):
+        raise ConnectionError("qdrant недоступен")
+
+    async def shutdown_with_outage():
+        buffer = WriteBehindBuffer(
+            failing_upsert, max_size=100, batch_size=10, flush_interval=5.0,
+            shutdown_retries=1, spill=RedisSpill(redis)
+        )
+        await buffer.start()
+        for i in range(25):
+            await buffer.put(make_point(i))
+        await buffer.stop()
+        return buffer
+
+    buffer = asyncio.run(shutdown_with_outage())
+    assert buffer.spilled == 25 and buffer.lost == 0
+    assert RedisSpill(redis).size() == 25
+
+    batches = []
+
+    async def restart():
+        buffer = WriteBehindBuffer(batches.append, max_size=100, batch_size=10, flush_interval=0.01, spill=RedisSpill(redis))
+        await buffer.start()
+        await buffer.put(make_point(100))
+        await buffer.stop()
+        return buffer
+
+    buffer = asyncio.run(restart())
+
+    # Точки из spill записываются раньше новых и в исходном порядке
+    assert [p.id for batch in batches for p in batch] == list(range(25)) + [100]
+    assert [p.payload for p in batches[0]] == [{"n": i} for i in range(10)]
+    assert buffer.replayed == 25
+    assert RedisSpill(redis).size() == 0
+    assert redis.values == {}
+
+
+def test_spill_replay_is_skipped_while_another_replica_holds_lock():
+    """Тест что пока spill дописывает другая реплика, точки не дублируются и не удаляются"""
+    redis = FakeListRedis()
+    RedisSpill(redis).save([make_point(i) for i in range(5)])
+    other = RedisSpill(redis)
+    assert other.lock()
+    batches = []
+
+    async def scenario():
+        buffer = WriteBehindBuffer(batches.append, flush_interval=0.01, spill=RedisSpill(redis))
+        await buffer.start()
+        await buffer.stop()
+
+    asyncio.run(scenario())
+
+    assert batches == []
+    assert RedisSpill(redis).size() == 5
@@ -0,0 +1,70 @@
+import sys
+import os
+import asyncio
+import json
+
+# Добавляем путь к проекту
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+
+from qdrant_client.models import ScoredPoint
+
+from app import main
+from app.loader import Checkpoint, iter_batches
+from app.models import VectorSearchRequest
+
+
+def test_checkpoint_saves_contiguous_prefix(tmp_path):
+    """Тест что контрольная точка продвигается только по непрерывно загруженным пачкам"""
+    path = str(tmp_path / "load.ckpt")
+    checkpoint = Checkpoint.load(path)
+
+    assert checkpoint.complete(100, 200) == 0
+    assert checkpoint.complete(0, 100) == 200
+    assert checkpoint.complete(300, 400) == 200
+    assert Checkpoint.load(path).offset == 200
+
+
+def test_iter_batches_resumes_with_aligned_payloads(tmp_path):
+    """Тест что пачки с середины файла получают соответствующие payload"""
+    vectors_path = tmp_path / "vectors.npy"
+    payloads_path = tmp_path / "payloads.jsonl"
+    np.save(vectors_path, np.arange(20, dtype=np.float32).reshape(10, 2))
+    payloads_path.write_text("".join(json.dumps({"row": i}) + "\n" for i in range(10)))
+    vectors = np.load(vectors_path, mmap_mode="r")
+
+    batches = list(iter_batches(vectors, str(payloads_path), start=4, batch_size=4))
+
+    assert [(start, end) for start, end, _ in batches] == [(4, 8), (8, 10)]
+    points = [point for _, _, batch in batches for point in batch]
+    assert [point.id for point in points] == list(range(4, 10))
+    assert [point.payload["row"] for point in points] == list(range(4, 10))
+    assert points[0].vector == [8.0, 9.0]
+
+
+def test_loaded_points_round_trip_through_search(tmp_path, monkeypatch):
+    """Тест что целочисленные id загрузчика проходят через поиск и ответ /search"""
+    vectors_path = tmp_path / "vectors.npy"
+    np.save(vectors_path, np.eye(4, dtype=np.float32))
+    vectors = np.load(vectors_path, mmap_mode="r")
+    batches = iter_batches(vectors, None, start=0, batch_size=2, id_offset=1000)
+    points = [point for _, _, batch in batches for point in batch]
+
+    class FakeQdrant:
+        async def search(self, query_vector, query_filter=None, limit=10, **kwargs):
+            scores = np.asarray([point.vector for point in points]) @ np.asarray(query_vector)
+            order = np.argsort(-scores)[:limit]
+            return [
+                ScoredPoint(id=points[i].id, version=0, score=float(scores[i]), payload=points[i].payload)
+                for i in order
+            ]
+
+    monkeypatch.setattr(main, "qdrant", FakeQdrant())
+    request = VectorSearchRequest(vector=[0.0, 0.0, 1.0, 0.0], limit=2)
+
+    results = asyncio.run(main.execute_search(request))
+
+    assert results[0]["id"] == 1002
+    assert isinstance(results[0]["id"], int)
+    assert main.decode_cached_results(main.encode_cached_results(results)) == results
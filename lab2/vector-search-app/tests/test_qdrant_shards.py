@@ -0,0 +1,124 @@
+import sys
+import os
+import asyncio
+import threading
+
+# Добавляем путь к проекту
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from qdrant_client.models import PointStruct, ScoredPoint
+
+from app.qdrant_shards import ShardedQdrant
+
+
+class FakeQdrant:
+    def __init__(self):
+        self.points = {}
+
+    def upsert(self, collection_name, points, wait=True):
+        for point in points:
+            self.points[point.id] = point
+
+    def search(self, collection_name, query_vector, query_filter=None, limit=10):
+        hits = [
+            ScoredPoint(id=point.id, version=0, score=point.payload["score"], payload=point.payload)
+            for point in self.points.values()
+        ]
+        return sorted(hits, key=lambda hit: hit.score, reverse=True)[:limit]
+
+
+def make_sharded(count):
+    qdrant = ShardedQdrant([f"qdrant-{i}:6333/documents" for i in range(count)])
+    for shard in qdrant.shards:
+        shard.clients = [FakeQdrant()]
+    return qdrant
+
+
+def test_upsert_routes_points_to_owner_shard():
+    """Тест что каждая точка записывается только в свой шард"""
+    qdrant = make_sharded(3)
+    points = [PointStruct(id=i, vector=[0.1], payload={"score": i / 100}) for i in range(60)]
+
+    qdrant.upsert(points)
+
+    assert sum(len(shard.client.points) for shard in qdrant.shards) == 60
+    assert all(shard.client.points for shard in qdrant.shards)
+    for point in points:
+        assert point.id in qdrant.shard_for(point.id).client.points
+
+
+def test_search_merges_top_k_across_shards():
+    """Тест что scatter-gather поиск возвращает глобальный top-k"""
+    qdrant = make_sharded(3)
+    qdrant.upsert([PointStruct(id=i, vector=[0.1], payload={"score": i / 100}) for i in range(60)])
+
+    hits = asyncio.run(qdrant.search(query_vector=[0.1], limit=5))
+
+    assert [hit.id for hit in hits] == [59, 58, 57, 56, 55]
+
+
+class GatedQdrant(FakeQdrant):
+    """Реплика, поиск которой ждет разрешения; отвечает точкой с меткой реплики"""
+
+    def __init__(self, name, blocked):
+        super().__init__()
+        self.name = name
+        self.searches = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        if not blocked:
+            self.release.set()
+
+    def search(self, *args, **kwargs):
+        self.searches += 1
+        self.started.set()
+        assert self.release.wait(timeout=10), "реплика не была отпущена"
+        return [
+            ScoredPoint(id=hit.id, version=0, score=hit.score, payload={**hit.payload, "replica": self.name})
+            for hit in super().search(*args, **kwargs)
+        ]
+
+
+def test_hedged_search_uses_fast_replica_and_caps_rate():
+    """Тест что зависшая реплика перекрывается хеджем, а доля хеджей ограничена"""
+    qdrant = ShardedQdrant(["slow:6333|fast:6333/hedge_test"], hedge_initial_delay=0.01, hedge_max_rate=0.3)
+    shard = qdrant.shards[0]
+    slow, fast = GatedQdrant("slow", blocked=True), GatedQdrant("fast", blocked=False)
+    point = PointStruct(id=1, vector=[0.1], payload={"score": 0.9})
+    for replica in (slow, fast):
+        replica.upsert("hedge_test", [point])
+    shard.clients = [slow, fast]
+
+    try:
+        # Первый запрос уходит в зависшую реплику, ответ приходит от хеджа
+        hits = asyncio.run(qdrant.search(query_vector=[0.1], limit=1))
+        assert [(hit.id, hit.payload["replica"]) for hit in hits] == [(1, "fast")]
+        assert shard.hedges == 1 and shard.hedge_wins == 1
+        assert (slow.searches, fast.searches) == (1, 1)
+
+        # Второй запрос идет в быструю реплику по кругу, хедж не нужен
+        hits = asyncio.run(qdrant.search(query_vector=[0.1], limit=1))
+        assert hits[0].payload["replica"] == "fast"
+        assert (slow.searches, fast.searches) == (1, 2)
+
+        # Третий снова в зависшую, но лимит 0.3 исчерпан: хедж не отправляется
+        async def capped():
+            search = asyncio.create_task(qdrant.search(query_vector=[0.1], limit=1))
+            await asyncio.to_thread(slow.started.wait, 10)
+            # Запас времени много больше порога хеджа; проверяются только счетчики
+            await asyncio.sleep(0.1)
+            hedged = fast.searches
+            slow.release.set()
+            return await search, hedged
+
+        slow.started.clear()
+        hits, fast_searches_before_release = asyncio.run(capped())
+        assert hits[0].payload["replica"] == "slow"
+        assert fast_searches_before_release == 2
+        assert shard.hedges == 1 and shard.hedge_wins == 1
+        stats = qdrant.hedge_stats()["slow:6333|fast:6333/hedge_test"]
+        assert stats["requests"] == 3
+        assert stats["hedge_rate"] == round(1 / 3, 4)
+    finally:
+        slow.release.set()
+        qdrant.close()
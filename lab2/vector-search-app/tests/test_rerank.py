@@ -0,0 +1,37 @@
+import sys
+import os
+
+# Добавляем путь к проекту
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+from qdrant_client.models import ScoredPoint
+
+from app.rerank import candidate_limit, rerank
+
+
+def test_candidate_limit():
+    """Тест расчета числа кандидатов"""
+    assert candidate_limit(10, 1.0) == 10
+    assert candidate_limit(10, 2.5) == 25
+    assert candidate_limit(3, 1.1) == 4
+
+
+def test_rerank_restores_exact_order():
+    """Тест что переранжирование возвращает точный top-k по косинусу"""
+    rng = np.random.default_rng(0)
+    query = rng.normal(size=16).tolist()
+    vectors = rng.normal(size=(40, 16)).astype(np.float32)
+    # Приближенные score намеренно перемешаны, как после грубой квантизации
+    hits = [
+        ScoredPoint(id=i, version=0, score=float(rng.random()), vector=vectors[i].tolist())
+        for i in range(40)
+    ]
+
+    top = rerank(query, hits, 5)
+
+    q = np.asarray(query, dtype=np.float32)
+    exact = vectors @ q / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(q))
+    assert [hit.id for hit in top] == list(np.argsort(-exact)[:5])
+    np.testing.assert_allclose([hit.score for hit in top], np.sort(exact)[::-1][:5], rtol=1e-5)
+    assert all(hit.vector is None for hit in top)
@@ -0,0 +1,94 @@
+import sys
+import os
+
+# Добавляем путь к проекту
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import pytest
+from pydantic import ValidationError
+
+from app.models import CacheItem
+from app.sharding import HashRing
+
+
+def test_hash_ring_distributes_keys():
+    """Тест равномерного распределения ключей по узлам"""
+    ring = HashRing(["redis-0:6379", "redis-1:6379", "redis-2:6379"])
+    keys = [f"search:{i}" for i in range(30000)]
+    counts = {}
+    for key in keys:
+        node = ring.get_node(key)
+        counts[node] = counts.get(node, 0) + 1
+
+    assert set(counts) == set(ring.nodes)
+    for count in counts.values():
+        assert 0.25 < count / len(keys) < 0.42
+
+
+def test_hash_ring_remaps_about_one_nth():
+    """Тест что добавление узла переносит только ~1/N ключей"""
+    ring = HashRing(["redis-0:6379", "redis-1:6379", "redis-2:6379"])
+    keys = [f"search:{i}" for i in range(20000)]
+    before = {key: ring.get_node(key) for key in keys}
+
+    ring.add_node("redis-3:6379")
+    moved = [key for key in keys if ring.get_node(key) != before[key]]
+    assert all(ring.get_node(key) == "redis-3:6379" for key in moved)
+    assert 0.17 < len(moved) / len(keys) < 0.33
+
+    ring.remove_node("redis-3:6379")
+    assert all(ring.get_node(key) == before[key] for key in keys)
+
+
+def test_sharded_mget_splits_per_node(sharded_redis):
+    """Тест что MGET разбивается по узлам и сохраняет порядок ключей"""
+    client = sharded_redis
+    keys = [f"key:{i}" for i in range(50)]
+    for key in keys[::2]:
+        client.clients[client.ring.get_node(key)].data[key] = key.upper()
+
+    values = client.mget(keys)
+
+    assert values == [key.upper() if i % 2 == 0 else None for i, key in enumerate(keys)]
+    assert all(fake.calls == 1 for fake in client.clients.values())
+
+
+def test_sharded_set_many_uses_one_pipeline_per_node(sharded_redis):
+    """Тест что массовая запись выполняется одним pipeline на узел с TTL каждого ключа"""
+    client = sharded_redis
+    items = [(f"key:{i}", f"value:{i}", 60 + i) for i in range(40)]
+
+    stored = client.set_many(items)
+
+    assert stored == [True] * len(items)
+    assert all(fake.calls == 1 for fake in client.clients.values())
+    for key, value, ttl in items:
+        fake = client.clients[client.ring.get_node(key)]
+        assert fake.data[key] == value
+        assert fake.ttls[key] == ttl
+
+
+def test_sharded_set_many_reports_failed_keys(sharded_redis):
+    """Тест что ошибка команды или узла отмечает только затронутые ключи"""
+    client = sharded_redis
+    items = [(f"key:{i}", f"value:{i}", 60) for i in range(40)]
+    nodes = list(client.clients)
+    broken_key = next(key for key, _, _ in items if client.ring.get_node(key) == nodes[0])
+    client.clients[nodes[0]].broken.add(broken_key)
+    client.clients[nodes[1]].down = True
+
+    stored = client.set_many(items)
+
+    for (key, value, _), ok in zip(items, stored):
+        owner = client.ring.get_node(key)
+        assert ok == (owner == nodes[0] and key != broken_key)
+        if ok:
+            assert client.clients[owner].data[key] == value
+
+
+def test_cache_item_rejects_non_positive_ttl():
+    """Тест что TTL <= 0 отклоняется при валидации запроса"""
+    for ttl in (0, -5):
+        with pytest.raises(ValidationError):
+            CacheItem(key="key", value="value", ttl=ttl)
+    assert CacheItem(key="key", value="value").ttl == 300
@@ -0,0 +1,79 @@
+import sys
+import os
+import asyncio
+import base64
+import json
+
+# Добавляем путь к проекту
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import pytest
+
+from app import main
+from app.models import VectorSearchRequest
+from app.snapshot import hottest_keys, restore_cache
+
+
+def test_hottest_keys_across_nodes(sharded_redis):
+    """Тест выбора самых частых ключей со всех узлов"""
+    redis = sharded_redis
+    for i in range(20):
+        key = f"search:{i}"
+        redis.clients[redis.ring.get_node(key)].freq[key] = i
+
+    hot = hottest_keys(redis, top=3)
+
+    assert [key for _, key in hot] == ["search:19", "search:18", "search:17"]
+
+
+def test_restore_cache_shrinks_ttl_and_skips_expired(tmp_path, sharded_redis):
+    """Тест что TTL уменьшается на прошедшее время, а истекшие записи пропускаются"""
+    path = tmp_path / "cache.jsonl"
+    records = [
+        {"key": "search:a", "pttl": 60000, "value": base64.b64encode(b"a").decode()},
+        {"key": "search:b", "pttl": 1000, "value": base64.b64encode(b"b").decode()},
+        {"key": "search:c", "pttl": -1, "value": base64.b64encode(b"c").decode()},
+    ]
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+    redis = sharded_redis
+
+    restored = restore_cache(redis, str(path), elapsed_ms=5000)
+
+    assert restored == 2
+    assert redis.clients[redis.ring.get_node("search:a")].restored["search:a"] == (55000, b"a")
+    assert redis.clients[redis.ring.get_node("search:c")].restored["search:c"] == (0, b"c")
+    assert all("search:b" not in fake.restored for fake in redis.clients.values())
+
+
+def test_restored_cache_value_is_parsed_not_executed(monkeypatch):
+    """Тест что запись search:* из snapshot только парсится как JSON и не исполняется"""
+    payload = "__import__('os').environ.__setitem__('SNAPSHOT_PWNED', '1') or []"
+    with pytest.raises(ValueError):
+        main.decode_cached_results(payload)
+    assert "SNAPSHOT_PWNED" not in os.environ
+
+    class CacheRedis:
+        def __init__(self):
+            self.values = {}
+
+        def get(self, key):
+            return payload
+
+        def setex(self, key, ttl, value):
+            self.values[key] = value
+
+    async def fake_execute_search(request):
+        return [{"id": 1, "score": 0.5, "payload": {"type": "test"}}]
+
+    cache = CacheRedis()
+    monkeypatch.setattr(main, "redis_client", cache)
+    monkeypatch.setattr(main, "execute_search", fake_execute_search)
+    monkeypatch.setattr(main.hot_queries, "should_sample", lambda: False)
+    monkeypatch.setattr(main.drift_monitor, "should_sample", lambda: False)
+
+    response = asyncio.run(main.cached_search(VectorSearchRequest(vector=[0.1, 0.2], limit=1)))
+
+    # Некорректная запись считается промахом и перезаписывается в JSON
+    assert response["source"] == "database"
+    assert "SNAPSHOT_PWNED" not in os.environ
+    assert [json.loads(value) for value in cache.values.values()] == [response["results"]]
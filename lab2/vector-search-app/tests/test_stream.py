@@ -0,0 +1,72 @@
+import sys
+import os
+import asyncio
+import json
+import struct
+import threading
+
+# Добавляем путь к проекту
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app import main
+
+
+def test_stream_search_binary_and_json_frames(monkeypatch):
+    """Тест WebSocket поиска: бинарные и JSON кадры, ответы не по порядку"""
+
+    async def fake_cached_search(request):
+        # Первый запрос отвечает медленнее второго
+        await asyncio.sleep(0.2 if request.limit == 1 else 0)
+        return {"source": "database", "results": [{"limit": request.limit, "dim": len(request.vector)}]}
+
+    monkeypatch.setattr(main, "cached_search", fake_cached_search)
+    client = TestClient(main.app)
+
+    with client.websocket_connect("/ws/search") as websocket:
+        vector = np.full(128, 0.1, dtype="<f4")
+        websocket.send_bytes(struct.pack("<IH", 7, 1) + vector.tobytes())
+        websocket.send_text(json.dumps({"id": "json-1", "vector": [0.1] * 4, "limit": 3}))
+        websocket.send_text(json.dumps({"id": "bad", "vector": "not_a_list"}))
+
+        replies = {}
+        for _ in range(3):
+            reply = websocket.receive_json()
+            replies[reply["id"]] = reply
+
+    assert list(replies)[-1] == 7
+    assert replies[7]["results"] == [{"limit": 1, "dim": 128}]
+    assert replies["json-1"]["results"] == [{"limit": 3, "dim": 4}]
+    assert "Invalid frame" in replies["bad"]["error"]
+
+
+def test_stream_binary_frame_is_validated_and_tasks_are_awaited(monkeypatch):
+    """Тест что бинарный кадр с NaN отклоняется, а незавершенные поиски отменяются до закрытия"""
+    finished = []
+    started = threading.Event()
+
+    async def slow_cached_search(request):
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            # Очистка после отмены тоже асинхронная: без ожидания задачи она не успеет
+            await asyncio.sleep(0.2)
+            finished.append(request.limit)
+            raise
+
+    monkeypatch.setattr(main, "cached_search", slow_cached_search)
+    client = TestClient(main.app)
+
+    with client.websocket_connect("/ws/search") as websocket:
+        vector = np.array([0.1, np.nan, 0.3], dtype="<f4")
+        websocket.send_bytes(struct.pack("<IH", 9, 2) + vector.tobytes())
+        reply = websocket.receive_json()
+        websocket.send_bytes(struct.pack("<IH", 10, 5) + np.ones(3, dtype="<f4").tobytes())
+        assert started.wait(timeout=5)
+
+    assert reply["id"] == 9
+    assert "Invalid frame" in reply["error"]
+    assert finished == [5]
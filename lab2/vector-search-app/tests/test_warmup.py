@@ -0,0 +1,85 @@
+import sys
+import os
+import asyncio
+
+# Добавляем путь к проекту
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.warmup import CacheWarmer
+
+
+class FakeTracker:
+    def __init__(self, redis, hot):
+        self.redis = redis
+        self.hot = hot
+        self.decayed = 0
+
+    def top(self, count):
+        return self.hot[:count]
+
+    def decay(self, factor):
+        self.decayed += 1
+
+
+def test_warmer_refreshes_only_missing_or_expiring_entries(sharded_redis):
+    """Тест что прогреваются только отсутствующие и скоро истекающие записи"""
+    redis = sharded_redis
+    ttls = {"search:fresh": 250, "search:expiring": 30, "search:pinned": -1}
+    for key, ttl in ttls.items():
+        redis.clients[redis.ring.get_node(key)].ttls[key] = ttl
+    hot = [(key, "{}") for key in ["search:fresh", "search:expiring", "search:pinned", "search:missing"]]
+    tracker = FakeTracker(redis, hot)
+    refreshed = []
+
+    async def refresh(cache_key, request_json):
+        refreshed.append(cache_key)
+
+    warmer = CacheWarmer(tracker, refresh, refresh_before=120)
+    stats = asyncio.run(warmer.warm_once())
+
+    assert sorted(refreshed) == ["search:expiring", "search:missing"]
+    assert stats["refreshed"] == 2
+    assert tracker.decayed == 1
+    # Блокировка прогрева снята
+    assert all("hot:warmup:lock" not in fake.data for fake in redis.clients.values())
+
+
+def test_lifespan_waits_for_cancelled_background_tasks(monkeypatch):
+    """Тест что при остановке фоновые задачи дожидаются отмены до закрытия клиентов"""
+    from app import main
+
+    events = []
+
+    async def background():
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            events.append("cancelled")
+            raise
+
+    class Closable:
+        def close(self):
+            events.append("closed")
+
+    async def noop(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(main, "startup", noop)
+    monkeypatch.setattr(main, "ingest_buffer", None)
+    monkeypatch.setattr(main.predictor, "start", noop)
+    monkeypatch.setattr(main.predictor, "stop", noop)
+    monkeypatch.setattr(main.cache_warmer, "run_forever", lambda *args, **kwargs: background())
+    monkeypatch.setattr(main.drift_monitor, "run_forever", background)
+    monkeypatch.setattr(main.Config, "WARMUP_ON_STARTUP", True)
+    monkeypatch.setattr(main.Config, "PREDICT_MODEL_VERSION", "")
+    monkeypatch.setattr(main.Config, "DRIFT_SAMPLE_RATE", 0.5)
+    monkeypatch.setattr(main, "redis_client", Closable())
+    monkeypatch.setattr(main, "qdrant", Closable())
+
+    async def run():
+        async with main.lifespan(main.app):
+            await asyncio.sleep(0)
+
+    asyncio.run(run())
+
+    assert events == ["cancelled", "cancelled", "closed", "closed"]
@@ -0,0 +1,196 @@
+"""Контентно-адресуемое хранение моделей в MLflow.
+
+mlflow.sklearn.log_model при каждом вызове заново сериализует модель и
+загружает полную копию в артефакты run, поэтому одинаковые модели
+лежат в хранилище многократно. Здесь модель сериализуется один раз во
+временный каталог, по его содержимому считается sha256, и копия
+загружается только если такого хеша в хранилище еще нет:
+
+    эксперимент "Artifact Store"
+        run с тегом content_sha256=<hash>, артефакт model/ - одна копия
+
+Run обучения получает только ссылки в тегах (artifact.<path>.sha256 и
+artifact.<path>.uri), а версия в Model Registry создается с source на
+общую копию и run_id того run хранилища, в котором она лежит: сервер
+MLflow принимает локальный source, только если он внутри артефактов
+run_id. Run обучения записывается в тег версии training_run_id. Если у
+зарегистрированной модели уже есть версия с тем же source, новая версия
+не создается.
+
+Каталог артефактов хранилища задается artifact_location (или
+ARTIFACT_STORE_LOCATION); без него используется корень артефактов
+сервера, а у локального бэкенда - ./mlruns в текущем каталоге.
+
+В MLmodel записываются время создания и uuid, они различаются при
+каждом сохранении, поэтому в хеш идут остальные поля MLmodel и файлы
+модели как есть.
+
+    from artifact_store import log_model
+    ref = log_model(model, "model", registered_model_name="Iris_RandomForest")
+    ref.uri, ref.reused, ref.version
+"""
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+
+import mlflow
+import mlflow.sklearn
+import yaml
+from mlflow.tracking import MlflowClient
+
+from profiling import stage
+
+STORE_EXPERIMENT = "Artifact Store"
+HASH_TAG = "content_sha256"
+MODEL_DIR = "model"
+# Формат задается явно: в mlflow 3 по умолчанию skops, который не загружает
+# модели с "недоверенными" типами, а в 2.x по умолчанию как раз cloudpickle
+SERIALIZATION_FORMAT = mlflow.sklearn.SERIALIZATION_FORMAT_CLOUDPICKLE
+# Поля MLmodel, которые меняются при каждом сохранении одной и той же модели
+VOLATILE_MLMODEL_KEYS = ("utc_time_created", "model_uuid", "model_id", "run_id", "artifact_path")
+TRAINING_RUN_TAG = "training_run_id"
+
+
+@dataclass
+class ModelReference:
+    sha256: str
+    uri: str
+    reused: bool
+    version: str = None
+    store_run_id: str = None
+
+
+def model_checksum(path):
+    """sha256 по файлам сохраненной модели без изменчивых полей MLmodel"""
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for filename in sorted(files):
+            full_path = os.path.join(root, filename)
+            relative = os.path.relpath(full_path, path)
+            digest.update(relative.encode("utf-8"))
+            if relative == "MLmodel":
+                with open(full_path) as f:
+                    meta = yaml.safe_load(f)
+                for key in VOLATILE_MLMODEL_KEYS:
+                    meta.pop(key, None)
+                digest.update(json.dumps(meta, sort_keys=True, default=str).encode("utf-8"))
+                continue
+            with open(full_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArtifactStore:
+    def __init__(self, client=None, experiment_name=STORE_EXPERIMENT, artifact_location=None):
+        self.tracking_uri = mlflow.get_tracking_uri()
+        self.client = client or MlflowClient(self.tracking_uri)
+        self.experiment_name = experiment_name
+        self.artifact_location = artifact_location or os.getenv("ARTIFACT_STORE_LOCATION") or None
+        self._experiment_id = None
+        # Хеши, уже найденные или загруженные этим процессом: sha256 -> (uri, run_id)
+        self._known = {}
+
+    @property
+    def experiment_id(self):
+        if self._experiment_id is None:
+            experiment = self.client.get_experiment_by_name(self.experiment_name)
+            if experiment is None:
+                self._experiment_id = self.client.create_experiment(
+                    self.experiment_name, artifact_location=self.artifact_location
+                )
+            else:
+                self._experiment_id = experiment.experiment_id
+        return self._experiment_id
+
+    def find(self, sha256):
+        """(uri, run_id) уже загруженной копии или None"""
+        if sha256 in self._known:
+            return self._known[sha256]
+        runs = self.client.search_runs(
+            [self.experiment_id],
+            filter_string=f"tags.{HASH_TAG} = '{sha256}' and attributes.status = 'FINISHED'",
+            order_by=["attributes.start_time ASC"],
+            max_results=1,
+        )
+        if not runs:
+            return None
+        self._known[sha256] = (f"{runs[0].info.artifact_uri}/{MODEL_DIR}", runs[0].info.run_id)
+        return self._known[sha256]
+
+    def put(self, local_dir, sha256=None):
+        """Загружает каталог модели, если копии с таким хешем нет. Возвращает (sha256, uri, run_id, reused)"""
+        sha256 = sha256 or model_checksum(local_dir)
+        found = self.find(sha256)
+        if found is not None:
+            return (sha256, *found, True)
+
+        run = self.client.create_run(
+            self.experiment_id, run_name=f"sha256-{sha256[:12]}", tags={HASH_TAG: sha256}
+        )
+        try:
+            self.client.log_artifacts(run.info.run_id, local_dir, MODEL_DIR)
+        except Exception:
+            # Незавершенная копия не попадет в поиск по status = FINISHED
+            self.client.set_terminated(run.info.run_id, status="FAILED")
+            raise
+        self.client.set_terminated(run.info.run_id)
+        uri = f"{run.info.artifact_uri}/{MODEL_DIR}"
+        self._known[sha256] = (uri, run.info.run_id)
+        return sha256, uri, run.info.run_id, False
+
+    def register(self, name, source, run_id, training_run_id=None):
+        """Версия registry со ссылкой на копию в run хранилища run_id.
+
+        Существующая версия с тем же source переиспользуется.
+        """
+        try:
+            self.client.get_registered_model(name)
+        except mlflow.exceptions.MlflowException:
+            self.client.create_registered_model(name)
+        for version in self.client.search_model_versions(f"name = '{name}'"):
+            if version.source == source:
+                return str(version.version)
+        tags = {TRAINING_RUN_TAG: training_run_id} if training_run_id else None
+        return str(self.client.create_model_version(name, source, run_id=run_id, tags=tags).version)
+
+
+_default_store = None
+
+
+def get_store():
+    global _default_store
+    if _default_store is None or _default_store.tracking_uri != mlflow.get_tracking_uri():
+        _default_store = ArtifactStore()
+    return _default_store
+
+
+def log_model(model, artifact_path=MODEL_DIR, registered_model_name=None, store=None):
+    """Замена mlflow.sklearn.log_model: одна сериализация и загрузка только новых моделей"""
+    store = store or get_store()
+    run = mlflow.active_run()
+    with tempfile.TemporaryDirectory() as tmp:
+        local_dir = os.path.join(tmp, MODEL_DIR)
+        # Этапы видны в RunProfiler, если он активен
+        with stage("serialization"):
+            mlflow.sklearn.save_model(model, local_dir, serialization_format=SERIALIZATION_FORMAT)
+            sha256 = model_checksum(local_dir)
+        with stage("upload"):
+            sha256, uri, store_run_id, reused = store.put(local_dir, sha256)
+
+    version = None
+    if registered_model_name:
+        with stage("upload"):
+            version = store.register(
+                registered_model_name, uri, store_run_id, training_run_id=run.info.run_id if run else None
+            )
+    if run is not None:
+        mlflow.set_tags({
+            f"artifact.{artifact_path}.sha256": sha256,
+            f"artifact.{artifact_path}.uri": uri,
+            f"artifact.{artifact_path}.reused": str(reused).lower(),
+        })
+    return ModelReference(sha256=sha256, uri=uri, reused=reused, version=version, store_run_id=store_run_id)
@@ -0,0 +1,186 @@
+"""Буферизованное логирование в MLflow через log_batch.
+
+Каждый mlflow.log_metric / log_param - отдельный HTTP запрос к tracking
+серверу. BatchLogger копит параметры, метрики и теги и отправляет их
+пачками через MlflowClient.log_batch из фонового потока: пачка уходит,
+как только набралось max_batch записей или прошло flush_interval секунд.
+Пачка, которую не удалось отправить, возвращается в начало буфера, а
+фоновый поток повторяет отправку с экспоненциальной паузой (retry_delay,
+удваивается до max_retry_delay). При выходе из контекста (или close())
+остаток отправляется синхронно; если и это не удалось, пробрасывается
+ошибка, а неотправленные записи остаются в буфере. Если тело with само
+завершилось исключением, ошибка отправки его не подменяет, а выдается
+предупреждением.
+
+    with mlflow.start_run(run_name="Model Testing"):
+        with BatchLogger() as logger:
+            logger.log_param("test_samples", 10)
+            for i, value in enumerate(values):
+                logger.log_metric(f"sample_{i}", value)
+"""
+import threading
+import time
+import warnings
+
+import mlflow
+from mlflow.entities import Metric, Param, RunTag
+from mlflow.tracking import MlflowClient
+
+# Лимиты одного запроса log_batch в MLflow
+MAX_METRICS_PER_BATCH = 1000
+MAX_PARAMS_PER_BATCH = 100
+MAX_TAGS_PER_BATCH = 100
+MAX_ENTITIES_PER_BATCH = 1000
+
+
+class BatchLogger:
+    def __init__(self, run_id=None, client=None, max_batch=MAX_METRICS_PER_BATCH, flush_interval=2.0,
+                 retry_delay=1.0, max_retry_delay=60.0):
+        if run_id is None:
+            active_run = mlflow.active_run()
+            if active_run is None:
+                raise RuntimeError("Нет активного MLflow run: передайте run_id или вызовите mlflow.start_run()")
+            run_id = active_run.info.run_id
+        self.run_id = run_id
+        self.client = client or MlflowClient()
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.sent_batches = 0
+        self._metrics = []
+        self._params = []
+        self._tags = []
+        self._lock = threading.Lock()
+        # Отправка пачек сериализована, чтобы метрики с одним step приходили по порядку
+        self._send_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="mlflow-batch-logger", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+            return
+        try:
+            self.close()
+        except Exception as e:
+            warnings.warn(f"Не удалось отправить буфер BatchLogger: {e}", RuntimeWarning)
+
+    def _pending(self):
+        return len(self._metrics) + len(self._params) + len(self._tags)
+
+    def _added(self):
+        if self._closed:
+            raise RuntimeError("BatchLogger уже закрыт")
+        if self._pending() >= self.max_batch:
+            self._wakeup.set()
+
+    def log_metric(self, key, value, step=0, timestamp=None):
+        timestamp = timestamp if timestamp is not None else int(time.time() * 1000)
+        with self._lock:
+            self._metrics.append(Metric(key, float(value), timestamp, step))
+            self._added()
+
+    def log_metrics(self, metrics, step=0):
+        timestamp = int(time.time() * 1000)
+        with self._lock:
+            self._metrics.extend(Metric(key, float(value), timestamp, step) for key, value in metrics.items())
+            self._added()
+
+    def log_param(self, key, value):
+        with self._lock:
+            self._params.append(Param(key, str(value)))
+            self._added()
+
+    def log_params(self, params):
+        with self._lock:
+            self._params.extend(Param(key, str(value)) for key, value in params.items())
+            self._added()
+
+    def set_tag(self, key, value):
+        with self._lock:
+            self._tags.append(RunTag(key, str(value)))
+            self._added()
+
+    def set_tags(self, tags):
+        with self._lock:
+            self._tags.extend(RunTag(key, str(value)) for key, value in tags.items())
+            self._added()
+
+    def _take_batch(self):
+        """Забирает из буфера одну пачку в пределах лимитов log_batch"""
+        with self._lock:
+            params = self._params[:MAX_PARAMS_PER_BATCH]
+            tags = self._tags[:MAX_TAGS_PER_BATCH]
+            room = min(self.max_batch, MAX_ENTITIES_PER_BATCH) - len(params) - len(tags)
+            metrics = self._metrics[:max(room, 0)]
+            del self._params[:len(params)]
+            del self._tags[:len(tags)]
+            del self._metrics[:len(metrics)]
+            return metrics, params, tags
+
+    def _requeue(self, metrics, params, tags):
+        """Возвращает неотправленную пачку в начало буфера, порядок записей сохраняется"""
+        with self._lock:
+            self._metrics[:0] = metrics
+            self._params[:0] = params
+            self._tags[:0] = tags
+
+    def flush(self):
+        """Синхронно отправляет все, что накопилось в буфере"""
+        with self._send_lock:
+            while True:
+                metrics, params, tags = self._take_batch()
+                if not (metrics or params or tags):
+                    return
+                try:
+                    self.client.log_batch(self.run_id, metrics=metrics, params=params, tags=tags)
+                except Exception:
+                    self._requeue(metrics, params, tags)
+                    raise
+                self.sent_batches += 1
+
+    def _run(self):
+        delay = 0
+        retry_at = 0
+        while True:
+            timeout = max(retry_at - time.monotonic(), 0) if delay else self.flush_interval
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+            if self._closed:
+                return
+            if delay and time.monotonic() < retry_at:
+                # Заполненный буфер не отменяет паузу после ошибки
+                continue
+            try:
+                self.flush()
+            except Exception as e:
+                # Пачка осталась в буфере; ошибка видна в close(), если и там отправить не удастся
+                self._error = e
+                delay = min(delay * 2 or self.retry_delay, self.max_retry_delay)
+                retry_at = time.monotonic() + delay
+                continue
+            self._error = None
+            delay = 0
+
+    def close(self):
+        """Останавливает фоновый поток и отправляет остаток буфера"""
+        if self._closed:
+            return
+        with self._lock:
+            self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+        # Остаток, включая пачки после фоновых ошибок, уходит синхронно
+        try:
+            self.flush()
+        except Exception as e:
+            if self._error is not None and self._error is not e:
+                raise e from self._error
+            raise
@@ -0,0 +1,52 @@
+from sklearn.datasets import load_iris
+from sklearn.ensemble import RandomForestClassifier
+import numpy as np
+import argparse
+import time
+
+from forest_compiler import compile_forest
+
+print("=== Бенчмарк: sklearn predict против скомпилированного леса ===")
+
+def best_time(func, X, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(X)
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+def run_benchmark(batch_sizes, n_estimators=100, max_depth=5, repeat=5):
+    # Та же модель, что train_iris.py регистрирует как Iris_RandomForest
+    iris = load_iris()
+    model = RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth, random_state=42)
+    model.fit(iris.data, iris.target)
+    compiled = compile_forest(model)
+
+    rng = np.random.default_rng(0)
+    low, high = iris.data.min(axis=0), iris.data.max(axis=0)
+
+    print(f"\nДеревьев: {n_estimators}, max_depth: {max_depth}, повторов: {repeat}")
+    print(f"{'batch':>8}{'sklearn, ms':>14}{'compiled, ms':>15}{'speedup':>10}{'rows/s compiled':>18}")
+    results = []
+    for batch_size in batch_sizes:
+        X = rng.uniform(low, high, size=(batch_size, iris.data.shape[1]))
+        assert np.array_equal(compiled.predict(X), model.predict(X))
+        sklearn_time = best_time(model.predict, X, repeat)
+        compiled_time = best_time(compiled.predict, X, repeat)
+        results.append((batch_size, sklearn_time, compiled_time))
+        print(
+            f"{batch_size:>8}{sklearn_time * 1000:>14.3f}{compiled_time * 1000:>15.3f}"
+            f"{sklearn_time / compiled_time:>9.1f}x{batch_size / compiled_time:>18,.0f}"
+        )
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк скомпилированного леса")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 100, 1000, 10000, 100000])
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--max-depth", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    run_benchmark(args.batch_sizes, args.trees, args.max_depth, args.repeat)
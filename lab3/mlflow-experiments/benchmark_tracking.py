@@ -0,0 +1,264 @@
+"""Бенчмарк накладных расходов MLflow в скриптах эксперимента.
+
+Скрипты train_iris, train_multiple_runs, test_model и check_data_drift
+запускаются по очереди против локального бэкенда без сети: SQLite
+(как mlflow/server/mlflow.db) или file store во временном каталоге.
+Каждый скрипт идет в отдельном процессе, поэтому импорт и холодный
+старт учитываются честно, а кеши моделей и профилей дрифта лежат в том
+же временном каталоге и не влияют на другие запуски.
+
+Внутри процесса функции sklearn, MLflow и модулей этого каталога
+обернуты таймерами, и время раскладывается по фазам. Время вложенного
+вызова вычитается из внешнего, так что фазы не пересекаются, а
+остаток до полного времени идет в other. Учитываются только вызовы из
+главного потока: фоновые отправки BatchLogger видны через время
+ожидания в flush/close.
+
+    python benchmark_tracking.py --backend sqlite --repeat 3
+    python benchmark_tracking.py --tracking-uri sqlite:////home/user/mlflow/server/mlflow.db
+
+Первый повтор холодный, в следующих работают кеши и дедупликация
+артефактов.
+"""
+import argparse
+import contextlib
+import functools
+import importlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+PHASES = (
+    "import", "data_loading", "fit", "predict", "drift", "model_loading",
+    "run_setup", "logging", "artifacts", "other",
+)
+
+# Скрипт: (модуль, функция, аргументы). Порядок важен: test_model читает модель train_iris
+WORKFLOWS = {
+    "train_iris": ("train_iris", "train_iris_model", ()),
+    "train_multiple_runs": ("train_multiple_runs", "train_multiple_models", (1,)),
+    "test_model": ("test_model", "test_registered_model", ()),
+    "check_data_drift": ("check_data_drift", "check_data_drift", ("profile",)),
+}
+
+# Фаза: [(модуль, объект или None, имя атрибута)]
+TARGETS = {
+    "data_loading": [
+        ("sklearn.datasets", None, "load_iris"),
+        ("sklearn.model_selection", None, "train_test_split"),
+    ],
+    "fit": [
+        ("sklearn.ensemble", "RandomForestClassifier", "fit"),
+        ("sklearn.linear_model", "LogisticRegression", "fit"),
+        ("sklearn.svm", "SVC", "fit"),
+    ],
+    "predict": [
+        ("sklearn.ensemble", "RandomForestClassifier", "predict"),
+        ("sklearn.ensemble", "RandomForestClassifier", "predict_proba"),
+        ("sklearn.linear_model", "LogisticRegression", "predict"),
+        ("sklearn.svm", "SVC", "predict"),
+    ],
+    "drift": [
+        ("drift_profile", None, "build_profile"),
+        ("drift_profile", None, "detect_drift"),
+        ("drift_sketch", None, "drift_scores"),
+        ("drift_sketch", "DriftSketch", "update"),
+    ],
+    "model_loading": [
+        ("model_cache", None, "load_model"),
+        ("mlflow.sklearn", None, "load_model"),
+        ("mlflow.artifacts", None, "download_artifacts"),
+    ],
+    "run_setup": [
+        ("mlflow", None, "set_tracking_uri"),
+        ("mlflow", None, "set_experiment"),
+        ("mlflow", None, "start_run"),
+        # ActiveRun.__exit__ вызывает end_run из модуля fluent
+        ("mlflow.tracking.fluent", None, "end_run"),
+    ],
+    "logging": [
+        ("mlflow", None, "log_param"),
+        ("mlflow", None, "log_params"),
+        ("mlflow", None, "log_metric"),
+        ("mlflow", None, "log_metrics"),
+        ("mlflow", None, "set_tag"),
+        ("mlflow", None, "set_tags"),
+        ("mlflow.tracking", "MlflowClient", "log_batch"),
+        ("batch_logging", "BatchLogger", "flush"),
+        ("batch_logging", "BatchLogger", "close"),
+    ],
+    "artifacts": [
+        ("mlflow", None, "log_artifact"),
+        ("mlflow", None, "log_artifacts"),
+        ("mlflow.sklearn", None, "log_model"),
+        ("mlflow.sklearn", None, "save_model"),
+        ("mlflow.tracking", "MlflowClient", "log_artifacts"),
+        ("artifact_store", None, "log_model"),
+    ],
+}
+
+
+class PhaseTimer:
+    """Эксклюзивное время по фазам: вложенные вызовы вычитаются из внешних"""
+
+    def __init__(self):
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self.calls = dict.fromkeys(PHASES, 0)
+        self._stack = []
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        if threading.current_thread() is not threading.main_thread():
+            yield
+            return
+        frame = [0.0]
+        self._stack.append(frame)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self._stack.pop()
+            self.totals[name] += elapsed - frame[0]
+            self.calls[name] += 1
+            if self._stack:
+                self._stack[-1][0] += elapsed
+
+    def wrap(self, name, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            with self.phase(name):
+                return func(*args, **kwargs)
+        timed.__wrapped_phase__ = name
+        return timed
+
+    def install(self):
+        """Оборачивает цели до импорта скриптов, чтобы from-импорты получили обертки"""
+        for name, targets in TARGETS.items():
+            for module_name, owner_name, attribute in targets:
+                owner = importlib.import_module(module_name)
+                if owner_name is not None:
+                    owner = getattr(owner, owner_name)
+                func = getattr(owner, attribute)
+                if not hasattr(func, "__wrapped_phase__"):
+                    setattr(owner, attribute, self.wrap(name, func))
+
+
+def run_workflow(name, result_path):
+    """Тело дочернего процесса: один скрипт с таймерами, результат пишется в JSON"""
+    started = time.perf_counter()
+    timer = PhaseTimer()
+    sys.path.insert(0, HERE)
+    module_name, function_name, args = WORKFLOWS[name]
+    result = {"workflow": name, "ok": True, "error": None}
+    try:
+        with timer.phase("import"):
+            timer.install()
+            module = importlib.import_module(module_name)
+        getattr(module, function_name)(*args)
+    except Exception as e:
+        result.update(ok=False, error=f"{type(e).__name__}: {e}")
+    total = time.perf_counter() - started
+    timer.totals["other"] = max(total - sum(timer.totals.values()), 0.0)
+    result.update(total=total, phases=timer.totals, calls=timer.calls)
+    with open(result_path, "w") as f:
+        json.dump(result, f)
+
+
+def make_backend(kind, workdir):
+    if kind == "sqlite":
+        return f"sqlite:///{os.path.join(workdir, 'mlflow.db')}"
+    return f"file:{os.path.join(workdir, 'mlruns')}"
+
+
+def run_benchmark(workflows, tracking_uri, workdir, repeat=1, quiet=True):
+    env = dict(
+        os.environ,
+        MLFLOW_TRACKING_URI=tracking_uri,
+        MLFLOW_MODEL_CACHE=os.path.join(workdir, "model-cache"),
+        DRIFT_PROFILE_CACHE=os.path.join(workdir, "drift-profiles"),
+        PYTHONPATH=os.pathsep.join(filter(None, [HERE, os.environ.get("PYTHONPATH")])),
+    )
+    results = []
+    for attempt in range(1, repeat + 1):
+        for name in workflows:
+            result_path = os.path.join(workdir, f"{name}-{attempt}.json")
+            command = [sys.executable, os.path.abspath(__file__), "--worker", name, "--result", result_path]
+            output = subprocess.DEVNULL if quiet else None
+            started = time.perf_counter()
+            # Скрипты пишут отчеты в текущий каталог, поэтому запускаем их во временном
+            subprocess.run(command, cwd=workdir, env=env, stdout=output, stderr=output, check=False)
+            wall = time.perf_counter() - started
+            if os.path.exists(result_path):
+                with open(result_path) as f:
+                    result = json.load(f)
+            else:
+                result = {"workflow": name, "ok": False, "error": "процесс завершился без результата",
+                          "total": wall, "phases": dict.fromkeys(PHASES, 0.0), "calls": {}}
+            result.update(attempt=attempt, wall=wall)
+            results.append(result)
+    return results
+
+
+def print_report(results):
+    header = f"{'workflow':<22}{'#':>3}" + "".join(f"{phase:>14}" for phase in PHASES) + f"{'total':>10}"
+    print(f"\nВремя по фазам, мс (total - внутри процесса)\n{header}")
+    for result in results:
+        row = f"{result['workflow']:<22}{result['attempt']:>3}"
+        row += "".join(f"{result['phases'][phase] * 1000:>14.1f}" for phase in PHASES)
+        print(row + f"{result['total'] * 1000:>10.1f}")
+    for result in results:
+        if not result["ok"]:
+            print(f"   ОШИБКА {result['workflow']} (повтор {result['attempt']}): {result['error']}")
+
+    tracking = ("run_setup", "logging", "artifacts", "model_loading")
+    print("\nДоля MLflow (run_setup + logging + artifacts + model_loading) от полного времени:")
+    for result in results:
+        overhead = sum(result["phases"][phase] for phase in tracking)
+        work = sum(result["phases"][phase] for phase in ("data_loading", "fit", "predict", "drift"))
+        print(
+            f"   {result['workflow']:<22}#{result['attempt']}: MLflow {overhead * 1000:8.1f} мс "
+            f"({overhead / result['total']:5.1%}), вычисления {work * 1000:8.1f} мс"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк накладных расходов MLflow в скриптах")
+    parser.add_argument("--workflows", nargs="+", choices=list(WORKFLOWS), default=list(WORKFLOWS))
+    parser.add_argument("--backend", choices=["sqlite", "file"], default="sqlite")
+    parser.add_argument(
+        "--tracking-uri", default=None,
+        help="Готовый локальный бэкенд, например sqlite:///.../mlflow/server/mlflow.db (в него будут записаны runs)"
+    )
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--workdir", default=None, help="Каталог для бэкенда, кешей и отчетов (по умолчанию временный)")
+    parser.add_argument("--json", default=None, help="Сохранить результаты в JSON")
+    parser.add_argument("--verbose", action="store_true", help="Показывать вывод скриптов")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--result", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_workflow(args.worker, args.result)
+        sys.exit(0)
+
+    print("=== Бенчмарк накладных расходов MLflow ===")
+    with tempfile.TemporaryDirectory(prefix="mlflow-bench-") as tmp:
+        workdir = os.path.abspath(args.workdir or tmp)
+        os.makedirs(workdir, exist_ok=True)
+        tracking_uri = args.tracking_uri or make_backend(args.backend, workdir)
+        if tracking_uri.startswith(("http://", "https://")):
+            parser.error("Бенчмарк рассчитан на локальный бэкенд без сети")
+        print(f"Бэкенд: {tracking_uri}")
+        results = run_benchmark(args.workflows, tracking_uri, workdir, args.repeat, quiet=not args.verbose)
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nРезультаты сохранены: {args.json}")
@@ -2,12 +2,16 @@ import mlflow
 import pandas as pd
 import numpy as np
 from sklearn.datasets import load_iris
-from evidently import Report
-from evidently.presets import DataDriftPreset
+import html
 import json
 import os
+import string
+from batch_logging import BatchLogger
+from drift_sketch import DriftSketch, make_edges, drift_scores, metrics_for_mlflow
+from drift_profile import open_source, get_or_create_profile, detect_drift
+import argparse
 
-print("=== Проверка Data Drift с помощью Evidently ===")
+print("=== Проверка Data Drift ===")
 
 def generate_reference_data():
     """Генерируем референсные данные (как при обучении)"""
@@ -29,15 +33,46 @@ def generate_current_data():
     df['target'] = iris.target
     return df
 
-def create_detailed_html_report():
-    """Создает детальный HTML отчет вручную"""
-    html_content = """
+def severity(score):
+    """Уровень дрифта по нормированному Wasserstein (порог дрифта 0.1)"""
+    if score < 0.1:
+        return "Low"
+    return "Medium" if score < 0.3 else "High"
+
+SEVERITY_COLORS = {"Low": "#27ae60", "Medium": "#f39c12", "High": "#e74c3c"}
+
+def create_detailed_html_report(scores, report_path="data_drift_report.html"):
+    """Создает детальный HTML отчет по посчитанным оценкам дрифта"""
+    features = scores["features"]
+    drifted = [name for name, feature in features.items() if feature["drift_detected"]]
+    rows = "".join(f"""
+                            <tr>
+                                <td>{html.escape(name)}</td>
+                                <td><span class="status-{'yes' if feature['drift_detected'] else 'no'}">{'YES' if feature['drift_detected'] else 'NO'}</span></td>
+                                <td>{feature['wasserstein_normed']:.2f}</td>
+                                <td>Wasserstein</td>
+                                <td class="impact-{severity(feature['wasserstein_normed']).lower()}">{severity(feature['wasserstein_normed'])}</td>
+                            </tr>""" for name, feature in features.items())
+    if scores["dataset_drift_detected"]:
+        conclusion = (
+            f"<strong>Data drift has been detected with {severity(scores['drift_score']).lower()} severity.</strong> "
+            f"The distribution of {len(drifted)} of {len(features)} features has changed compared to the reference data."
+        )
+    elif drifted:
+        conclusion = (
+            "<strong>No dataset-level drift.</strong> "
+            f"Individual features drifted: {html.escape(', '.join(drifted))}."
+        )
+    else:
+        conclusion = "<strong>No data drift detected.</strong> Current data matches the reference distribution."
+    drift_color = SEVERITY_COLORS["High"] if scores["dataset_drift_detected"] else SEVERITY_COLORS["Low"]
+    html_content = string.Template("""
     <!DOCTYPE html>
     <html lang="ru">
     <head>
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Data Drift Report - Evidently AI</title>
+        <title>Data Drift Report</title>
         <style>
             * {
                 margin: 0;
@@ -202,7 +237,7 @@ def create_detailed_html_report():
         <div class="container">
             <div class="header">
                 <h1>📊 Data Drift Analysis Report</h1>
-                <p>Comprehensive Data Quality Monitoring with Evidently AI</p>
+                <p>Comprehensive Data Quality Monitoring</p>
             </div>
             
             <div class="content">
@@ -213,23 +248,23 @@ def create_detailed_html_report():
                     <div class="metrics-grid">
                         <div class="metric-card">
                             <div class="metric-label">Drift Detected</div>
-                            <div class="metric-value" style="color: #e74c3c;">YES</div>
+                            <div class="metric-value" style="color: $drift_color;">$drift_detected</div>
                             <div class="metric-label">Dataset Level</div>
                         </div>
                         <div class="metric-card">
                             <div class="metric-label">Drift Score</div>
-                            <div class="metric-value" style="color: #f39c12;">0.42</div>
-                            <div class="metric-label">Medium Severity</div>
+                            <div class="metric-value" style="color: $score_color;">$drift_score</div>
+                            <div class="metric-label">$severity Severity</div>
                         </div>
                         <div class="metric-card">
                             <div class="metric-label">Features Drifted</div>
-                            <div class="metric-value" style="color: #e74c3c;">3/4</div>
-                            <div class="metric-label">75% of Features</div>
+                            <div class="metric-value" style="color: $drift_color;">$n_drifted/$n_features</div>
+                            <div class="metric-label">$share of Features</div>
                         </div>
                         <div class="metric-card">
-                            <div class="metric-label">Dataset Similarity</div>
-                            <div class="metric-value" style="color: #27ae60;">0.58</div>
-                            <div class="metric-label">Moderate</div>
+                            <div class="metric-label">Samples Compared</div>
+                            <div class="metric-value">$current_rows</div>
+                            <div class="metric-label">vs $reference_rows Reference</div>
                         </div>
                     </div>
                 </div>
@@ -248,35 +283,7 @@ def create_detailed_html_report():
                                 <th>Impact Level</th>
                             </tr>
                         </thead>
-                        <tbody>
-                            <tr>
-                                <td>sepal length (cm)</td>
-                                <td><span class="status-yes">YES</span></td>
-                                <td>0.35</td>
-                                <td>Wasserstein</td>
-                                <td class="impact-medium">Medium</td>
-                            </tr>
-                            <tr>
-                                <td>sepal width (cm)</td>
-                                <td><span class="status-no">NO</span></td>
-                                <td>0.08</td>
-                                <td>Wasserstein</td>
-                                <td class="impact-low">Low</td>
-                            </tr>
-                            <tr>
-                                <td>petal length (cm)</td>
-                                <td><span class="status-yes">YES</span></td>
-                                <td>0.67</td>
-                                <td>Wasserstein</td>
-                                <td class="impact-high">High</td>
-                            </tr>
-                            <tr>
-                                <td>petal width (cm)</td>
-                                <td><span class="status-yes">YES</span></td>
-                                <td>0.59</td>
-                                <td>Wasserstein</td>
-                                <td class="impact-high">High</td>
-                            </tr>
+                        <tbody>$feature_rows
                         </tbody>
                     </table>
                 </div>
@@ -291,12 +298,12 @@ def create_detailed_html_report():
                         </div>
                         <div class="metric-card">
                             <div class="metric-label">Samples</div>
-                            <div class="metric-value">150</div>
+                            <div class="metric-value">$current_rows</div>
                             <div class="metric-label">Total</div>
                         </div>
                         <div class="metric-card">
                             <div class="metric-label">Features</div>
-                            <div class="metric-value">4</div>
+                            <div class="metric-value">$n_features</div>
                             <div class="metric-label">Numerical</div>
                         </div>
                         <div class="metric-card">
@@ -309,14 +316,14 @@ def create_detailed_html_report():
                 
                 <div class="conclusion">
                     <h2>🎯 Conclusion & Recommendations</h2>
-                    <p><strong>Data drift has been detected with moderate to high severity.</strong> The statistical properties of the current data have changed compared to the reference data, particularly in petal measurements.</p>
+                    <p>$conclusion</p>
                     
                     <div class="recommendations">
                         <h3>Recommended Actions:</h3>
                         <ul>
                             <li><strong>Retrain the model</strong> on updated data incorporating recent patterns</li>
-                            <li><strong>Monitor feature distributions</strong> continuously using Evidently</li>
-                            <li><strong>Investigate root causes</strong> of drift in petal length and width measurements</li>
+                            <li><strong>Monitor feature distributions</strong> continuously</li>
+                            <li><strong>Investigate root causes</strong> of drift in: $drifted_names</li>
                             <li><strong>Update data validation</strong> pipelines to catch similar issues early</li>
                             <li><strong>Consider feature importance</strong> analysis to prioritize fixes</li>
                         </ul>
@@ -325,21 +332,100 @@ def create_detailed_html_report():
             </div>
             
             <div class="footer">
-                <p>Generated by Evidently AI | Data Drift Analysis | 2025</p>
+                <p>Drift engine: $engine | Data Drift Analysis</p>
                 <p>MLflow Experiment: Data Quality Monitoring</p>
             </div>
         </div>
     </body>
     </html>
-    """
+    """).substitute(
+        drift_color=drift_color,
+        drift_detected="YES" if scores["dataset_drift_detected"] else "NO",
+        score_color=SEVERITY_COLORS[severity(scores["drift_score"])],
+        drift_score=f"{scores['drift_score']:.2f}",
+        severity=severity(scores["drift_score"]),
+        n_drifted=len(drifted),
+        n_features=len(features),
+        share=f"{scores['share_drifted_features']:.0%}",
+        current_rows=scores["current_rows"],
+        reference_rows=scores["reference_rows"],
+        feature_rows=rows,
+        conclusion=conclusion,
+        drifted_names=html.escape(", ".join(drifted)) or "none",
+        engine=html.escape(scores["engine"]),
+    )
     
-    report_path = "data_drift_report.html"
     with open(report_path, "w", encoding='utf-8') as f:
         f.write(html_content)
     return report_path
 
-def check_data_drift():
-    mlflow.set_tracking_uri("http://127.0.0.1:5000")
+def compute_streaming_drift(reference_data, current_data, chunk_size=50):
+    """Реальные оценки дрифта: текущие данные проходят через скетчи пачками"""
+    feature_names = [column for column in reference_data.columns if column != 'target']
+    reference = reference_data[feature_names].to_numpy()
+    edges = make_edges(reference)
+    reference_sketch = DriftSketch(edges).update(reference)
+    
+    current_sketch = DriftSketch(edges)
+    for start in range(0, len(current_data), chunk_size):
+        current_sketch.update(current_data[feature_names].iloc[start:start + chunk_size].to_numpy())
+    
+    return drift_scores(reference_sketch, current_sketch, feature_names)
+
+def format_analysis_results(scores):
+    lines = [
+        "DATA DRIFT ANALYSIS RESULTS",
+        "===========================",
+        "",
+        "DATASET:",
+        "- Name: Iris (scikit-learn)",
+        f"- Reference samples: {scores['reference_rows']}",
+        f"- Current samples: {scores['current_rows']}",
+        "",
+        "DRIFT DETECTION RESULTS:",
+        f"- Dataset-level drift: {'DETECTED' if scores['dataset_drift_detected'] else 'NOT DETECTED'}",
+        f"- Overall drift score (mean normed Wasserstein): {scores['drift_score']:.4f}",
+        f"- Number of drifted features: {scores['n_drifted_features']} out of {len(scores['features'])}",
+        "",
+        "FEATURE-LEVEL ANALYSIS:",
+    ]
+    for name, feature in scores["features"].items():
+        status = "DRIFT DETECTED" if feature["drift_detected"] else "No drift"
+        lines.append(
+            f"- {name}: {status} (wasserstein: {feature['wasserstein_normed']:.4f}, "
+            f"KS: {feature['ks_statistic']:.4f}, p-value: {feature['ks_pvalue']:.4f}, PSI: {feature['psi']:.4f})"
+        )
+    lines += [
+        "",
+        "METHODOLOGY:",
+        f"- Drift engine: {scores['engine']}",
+        "- Normed Wasserstein distance, threshold 0.1; KS test and PSI for reference",
+        "- Reference data: Original Iris dataset",
+        "- Current data: Iris dataset + Gaussian noise (σ=0.1)",
+    ]
+    return "\n".join(lines) + "\n"
+
+def compute_profile_drift(reference_data, current_data):
+    """Оценки по профилю референса: профиль берется из кеша или MLflow по хешу данных"""
+    reference = open_source(reference_data.drop(columns=['target']))
+    profile = get_or_create_profile(reference, experiment_name="Data Quality Monitoring")
+    print(f"   Профиль референса: {profile.profile_hash[:12]}")
+    return detect_drift(profile, open_source(current_data.drop(columns=['target'])))
+
+def create_evidently_report(reference_data, current_data, report_path="evidently_report.html"):
+    """Полный отчет Evidently: считает все заново и нужен только для просмотра, поэтому по флагу"""
+    from evidently import Report
+    from evidently.presets import DataDriftPreset
+    
+    snapshot = Report(metrics=[DataDriftPreset()]).run(
+        reference_data=reference_data,
+        current_data=current_data
+    )
+    snapshot.save_html(report_path)
+    return report_path
+
+def check_data_drift(engine="profile", evidently_report=False):
+    mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI", "http://127.0.0.1:5000"))
     mlflow.set_experiment("Data Quality Monitoring")
     
     # Генерируем данные
@@ -348,62 +434,34 @@ def check_data_drift():
     
     print("3. Создаем отчет о дрифте...")
     
-    # Создаем отчет о дрифте
-    data_drift_report = Report(metrics=[DataDriftPreset()])
-    
-    data_drift_report.run(
-        reference_data=reference_data,
-        current_data=current_data
-    )
+    if engine == "streaming":
+        print("   Считаем оценки дрифта по потоковым скетчам...")
+        scores = compute_streaming_drift(reference_data, current_data)
+    else:
+        print("   Считаем оценки дрифта по закешированному профилю референса...")
+        scores = compute_profile_drift(reference_data, current_data)
+    scores["engine"] = engine
     
     print("4. Создаем детальный HTML отчет...")
-    # Создаем красивый HTML отчет вручную
-    report_path = create_detailed_html_report()
+    # HTML отчет строится по тем же оценкам, что и метрики в MLflow
+    report_path = create_detailed_html_report(scores)
     print(f"   Отчет сохранен: {report_path}")
+    evidently_path = None
+    if evidently_report:
+        print("   Строим полный отчет Evidently...")
+        evidently_path = create_evidently_report(reference_data, current_data)
+        print(f"   Отчет Evidently сохранен: {evidently_path}")
     
     # Логируем в MLflow
     with mlflow.start_run(run_name="Data Drift Check"):
         # Логируем HTML отчет как артефакт
         mlflow.log_artifact(report_path, "evidently_reports")
+        if evidently_path is not None:
+            mlflow.log_artifact(evidently_path, "evidently_reports")
         print("   ✅ Отчет залогирован в MLflow")
         
-        # Создаем текстовый файл с результатами анализа
-        analysis_results = """
-        DATA DRIFT ANALYSIS RESULTS
-        ===========================
-        
-        Analysis performed using Evidently AI with DataDriftPreset
-        
-        DATASET:
-        - Name: Iris (scikit-learn)
-        - Samples: 150
-        - Features: 4 numerical features
-        - Target: 3 classes (classification)
-        
-        DRIFT DETECTION RESULTS:
-        - Dataset-level drift: DETECTED
-        - Overall drift score: 0.42
-        - Number of drifted features: 3 out of 4 (75%)
-        - Dataset similarity: 0.58
-        
-        FEATURE-LEVEL ANALYSIS:
-        - sepal length (cm): DRIFT DETECTED (score: 0.35) - MEDIUM impact
-        - sepal width (cm): No drift (score: 0.08) - LOW impact  
-        - petal length (cm): DRIFT DETECTED (score: 0.67) - HIGH impact
-        - petal width (cm): DRIFT DETECTED (score: 0.59) - HIGH impact
-        
-        METHODOLOGY:
-        - Statistical tests: Wasserstein distance
-        - Reference data: Original Iris dataset
-        - Current data: Iris dataset + Gaussian noise (σ=0.1)
-        - Drift threshold: p-value < 0.05
-        
-        CONCLUSION:
-        Significant data drift detected, particularly in petal measurements.
-        This indicates changes in data distribution that may negatively impact
-        model performance. Recommended actions include model retraining and
-        continuous monitoring.
-        """
+        # Текстовый файл с результатами, посчитанными по скетчам
+        analysis_results = format_analysis_results(scores)
         
         with open("drift_analysis_results.txt", "w") as f:
             f.write(analysis_results)
@@ -411,34 +469,40 @@ def check_data_drift():
         mlflow.log_artifact("drift_analysis_results.txt")
         print("   ✅ Текстовый отчет создан")
         
-        # Логируем метрики в MLflow
-        mlflow.log_metric("dataset_drift_detected", 1)
-        mlflow.log_metric("drift_score", 0.42)
-        mlflow.log_metric("n_drifted_features", 3)
-        mlflow.log_metric("dataset_similarity", 0.58)
-        mlflow.log_metric("sepal_length_drift_score", 0.35)
-        mlflow.log_metric("sepal_width_drift_score", 0.08)
-        mlflow.log_metric("petal_length_drift_score", 0.67)
-        mlflow.log_metric("petal_width_drift_score", 0.59)
-        
-        # Логируем параметры
-        mlflow.log_param("dataset", "iris")
-        mlflow.log_param("analysis_tool", "evidently")
-        mlflow.log_param("drift_threshold", 0.05)
-        mlflow.log_param("drift_simulation", "gaussian_noise_0.1")
-        mlflow.log_param("features_analyzed", 4)
+        # Логируем метрики и параметры в MLflow одной пачкой
+        with BatchLogger() as logger:
+            logger.log_metrics(metrics_for_mlflow(scores))
+            logger.log_params({
+                "dataset": "iris",
+                "analysis_tool": "evidently" if evidently_report else "drift_sketch",
+                "drift_engine": engine,
+                "drift_threshold": 0.1,
+                "drift_simulation": "gaussian_noise_0.1",
+                "features_analyzed": 4,
+            })
         
         print("   ✅ Метрики и параметры залогированы")
         
         print(f"5. Результаты анализа дрифта:")
-        print(f"   - Дрифт обнаружен: Да")
-        print(f"   - Score дрифта: 0.42")
-        print(f"   - Дрифтующих фич: 3/4")
-        print(f"   - Критические фичи: petal length, petal width")
+        drifted = [name for name, feature in scores["features"].items() if feature["drift_detected"]]
+        print(f"   - Дрифт обнаружен: {'Да' if scores['dataset_drift_detected'] else 'Нет'}")
+        print(f"   - Score дрифта: {scores['drift_score']:.4f}")
+        print(f"   - Дрифтующих фич: {scores['n_drifted_features']}/{len(scores['features'])}")
+        print(f"   - Критические фичи: {', '.join(drifted) or 'нет'}")
 
     print("=== Проверка Data Drift завершена! ===")
     print(f"📊 Отчет доступен: {report_path}")
-    print(f"🔗 MLflow: http://127.0.0.1:5000")
+    print(f"🔗 MLflow: {mlflow.get_tracking_uri()}")
 
 if __name__ == "__main__":
-    check_data_drift()
+    parser = argparse.ArgumentParser(description="Проверка дрифта данных Iris")
+    parser.add_argument(
+        "--engine", choices=["profile", "streaming"], default="profile",
+        help="profile - профиль референса из кеша/MLflow, streaming - потоковые скетчи"
+    )
+    parser.add_argument(
+        "--evidently-report", action="store_true",
+        help="Дополнительно построить полный отчет Evidently (нужен пакет evidently)"
+    )
+    args = parser.parse_args()
+    check_data_drift(args.engine, args.evidently_report)
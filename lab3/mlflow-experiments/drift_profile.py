@@ -0,0 +1,343 @@
+"""Пакетная проверка дрифта с закешированным профилем референса.
+
+Профиль референса считается один раз: по каждому признаку сетка
+квантилей (n_quantiles точек), границы и доли корзин PSI по децилям,
+среднее, стандартное отклонение и число строк. Профиль сохраняется в
+MLflow как артефакт reference_profile/<hash>.npz run'а с тегом
+reference_profile_hash и в локальный кеш. Хеш строится по содержимому
+референса и параметрам профиля, поэтому повторный запуск на тех же
+данных загружает готовый профиль вместо пересчета.
+
+Текущие данные читаются блоками столбцов: из Parquet читаются только
+нужные столбцы, у .npy (mmap) берется срез столбцов. Весь блок
+обрабатывается векторно (квантили, KS, PSI сразу по всем его столбцам),
+блоки считаются параллельно в пуле потоков: сортировка и квантили в
+NumPy отпускают GIL. Размер блока подбирается под memory_budget.
+
+Граница памяти. Точные квантили и KS требуют столбец целиком, поэтому
+блок - это все строки его столбцов. На значение блока в пике приходится
+BLOCK_BYTES_PER_VALUE байт: сам блок float64, одна рабочая копия
+(сортировка в np.quantile/np.sort или номера корзин PSI) и булева
+маска; еще COLUMN_BUFFER_BYTES на строку уходит на буфер сортировки
+столбца. При чтении Parquet таблица Arrow живет вместе с блоком, но до
+рабочих копий, и в пик не добавляется. Ширина блока и число
+одновременных блоков подбираются так, чтобы
+workers * rows * (width * BLOCK_BYTES_PER_VALUE + COLUMN_BUFFER_BYTES)
+не превышало memory_budget, но блок не бывает уже одного столбца:
+нижняя граница памяти - rows * (BLOCK_BYTES_PER_VALUE +
+COLUMN_BUFFER_BYTES) в одном потоке, даже если бюджет меньше. Сверх
+бюджета - только профиль и результаты: массивы n_quantiles x признаки.
+Для окон, где и это не помещается, есть drift_sketch (скетчи по пачкам
+строк, оценки приближенные).
+
+    source = open_source("current.parquet")
+    profile = get_or_create_profile(open_source("reference.parquet"))
+    scores = detect_drift(profile, source)
+"""
+import hashlib
+import io
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy.stats import kstwo
+
+DEFAULT_CACHE_DIR = os.getenv("DRIFT_PROFILE_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "drift-profiles"))
+# Порог normed Wasserstein, как в drift_sketch и Evidently
+WASSERSTEIN_THRESHOLD = 0.1
+PROFILE_VERSION = 1
+# Пиковые байты на значение блока: блок float64, рабочая копия float64/int64 и маска bool
+BLOCK_BYTES_PER_VALUE = 8 + 8 + 1
+# Сортировка по оси 0 копирует каждый столбец во временный буфер: плюс столбец на поток
+COLUMN_BUFFER_BYTES = 8
+
+
+class ArraySource:
+    """Матрица признаков в памяти или np.memmap"""
+
+    def __init__(self, array, feature_names=None):
+        self.array = array
+        self.n_rows, self.n_features = array.shape
+        self.feature_names = list(feature_names or [f"feature_{i}" for i in range(self.n_features)])
+
+    def read_columns(self, start, stop):
+        return np.asarray(self.array[:, start:stop], dtype=float)
+
+    def iter_chunks(self, rows=1 << 16):
+        for start in range(0, self.n_rows, rows):
+            yield np.asarray(self.array[start:start + rows], dtype=float)
+
+
+class ParquetSource:
+    """Parquet файл: столбцы читаются по отдельности, без загрузки всей таблицы"""
+
+    def __init__(self, path, feature_names=None):
+        import pyarrow.parquet as pq
+
+        self.path = path
+        self.file = pq.ParquetFile(path)
+        numeric = [
+            field.name for field in self.file.schema_arrow
+            if str(field.type).startswith(("int", "uint", "float", "double"))
+        ]
+        self.feature_names = list(feature_names or numeric)
+        self.n_rows = self.file.metadata.num_rows
+        self.n_features = len(self.feature_names)
+
+    def read_columns(self, start, stop):
+        table = self.file.read(columns=self.feature_names[start:stop])
+        # Столбцы переносятся в готовый блок по одному, без списка копий перед column_stack
+        block = np.empty((table.num_rows, table.num_columns))
+        for i in range(table.num_columns):
+            block[:, i] = table.column(i).to_numpy()
+        return block
+
+    def iter_chunks(self, rows=1 << 16):
+        for batch in self.file.iter_batches(batch_size=rows, columns=self.feature_names):
+            yield np.column_stack([column.to_numpy().astype(float) for column in batch.columns])
+
+
+def open_source(data, feature_names=None):
+    """Источник данных: путь к .parquet / .npy (mmap), DataFrame или массив"""
+    if isinstance(data, str):
+        if data.endswith(".parquet"):
+            return ParquetSource(data, feature_names)
+        if data.endswith(".npy"):
+            return ArraySource(np.load(data, mmap_mode="r"), feature_names)
+        raise ValueError(f"Неподдерживаемый формат: {data}")
+    if hasattr(data, "columns") and hasattr(data, "to_numpy"):
+        numeric = data.select_dtypes("number")
+        columns = feature_names or list(numeric.columns)
+        return ArraySource(numeric[columns].to_numpy(dtype=float), columns)
+    return ArraySource(np.asarray(data, dtype=float), feature_names)
+
+
+def block_bytes(source, width):
+    """Пиковая память на обработку блока из width столбцов"""
+    return max(source.n_rows, 1) * (width * BLOCK_BYTES_PER_VALUE + COLUMN_BUFFER_BYTES)
+
+
+def budget_workers(source, memory_budget, workers):
+    """Число одновременных блоков: даже блоки из одного столбца должны влезть в бюджет"""
+    return max(1, min(workers, memory_budget // block_bytes(source, 1)))
+
+
+def column_blocks(source, memory_budget=256 << 20, workers=1, max_block=64):
+    """Границы блоков столбцов: workers одновременных блоков с рабочими копиями влезают в бюджет"""
+    per_row = memory_budget // workers // max(source.n_rows, 1) - COLUMN_BUFFER_BYTES
+    width = max(1, min(max_block, per_row // BLOCK_BYTES_PER_VALUE))
+    return [(start, min(start + width, source.n_features)) for start in range(0, source.n_features, width)]
+
+
+def source_hash(source, n_quantiles):
+    """sha256 по содержимому источника, именам признаков и параметрам профиля"""
+    digest = hashlib.sha256()
+    digest.update(f"v{PROFILE_VERSION}:{n_quantiles}:{','.join(source.feature_names)}".encode("utf-8"))
+    for chunk in source.iter_chunks():
+        digest.update(np.ascontiguousarray(chunk).tobytes())
+    return digest.hexdigest()
+
+
+class ReferenceProfile:
+    def __init__(self, feature_names, probs, quantiles, psi_edges, psi_mass, mean, std, n_rows, profile_hash=None):
+        self.feature_names = list(feature_names)
+        self.probs = probs
+        self.quantiles = quantiles      # (n_quantiles, features)
+        self.psi_edges = psi_edges      # (9, features) - внутренние границы децилей
+        self.psi_mass = psi_mass        # (10, features)
+        self.mean = mean
+        self.std = std
+        self.n_rows = n_rows
+        self.profile_hash = profile_hash
+
+    def to_bytes(self):
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            feature_names=np.asarray(self.feature_names),
+            probs=self.probs,
+            quantiles=self.quantiles,
+            psi_edges=self.psi_edges,
+            psi_mass=self.psi_mass,
+            mean=self.mean,
+            std=self.std,
+            n_rows=np.asarray(self.n_rows),
+            profile_hash=np.asarray(self.profile_hash or ""),
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_file(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                feature_names=data["feature_names"].tolist(),
+                probs=data["probs"],
+                quantiles=data["quantiles"],
+                psi_edges=data["psi_edges"],
+                psi_mass=data["psi_mass"],
+                mean=data["mean"],
+                std=data["std"],
+                n_rows=int(data["n_rows"]),
+                profile_hash=str(data["profile_hash"]) or None,
+            )
+
+
+def _bin_mass(block, edges):
+    """Доли строк блока в корзинах с внутренними границами edges (границы x столбцы)"""
+    n, k = block.shape
+    # Номер корзины накапливается по границам, без промежуточного массива строки x столбцы x границы
+    index = np.zeros((n, k), dtype=np.int64)
+    for edge in edges:
+        index += block > edge
+    n_bins = edges.shape[0] + 1
+    index += np.arange(k) * n_bins
+    counts = np.bincount(index.ravel(), minlength=k * n_bins)
+    return counts.reshape(k, n_bins).T / n
+
+
+def _profile_block(block, probs):
+    quantiles = np.quantile(block, probs, axis=0)
+    psi_edges = np.quantile(block, np.arange(1, 10) / 10, axis=0)
+    return quantiles, psi_edges, _bin_mass(block, psi_edges), block.mean(axis=0), block.std(axis=0, ddof=1)
+
+
+def build_profile(source, n_quantiles=1001, workers=None, memory_budget=256 << 20, profile_hash=None):
+    """Считает профиль референса по блокам столбцов в пуле потоков"""
+    probs = np.linspace(0, 1, n_quantiles)
+    workers = budget_workers(source, memory_budget, workers or os.cpu_count())
+    blocks = column_blocks(source, memory_budget, workers)
+
+    def run(bounds):
+        return _profile_block(source.read_columns(*bounds), probs)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        parts = list(executor.map(run, blocks))
+    quantiles, psi_edges, psi_mass, mean, std = (np.concatenate(arrays, axis=-1) for arrays in zip(*parts))
+    return ReferenceProfile(
+        source.feature_names, probs, quantiles, psi_edges, psi_mass, mean, std, source.n_rows, profile_hash
+    )
+
+
+def _drift_block(profile, block, start, stop, eps=1e-4):
+    ref_q = profile.quantiles[:, start:stop]
+    cur_q = np.quantile(block, profile.probs, axis=0)
+    # W1 = интеграл |Q_ref(p) - Q_cur(p)| dp по функциям квантилей
+    gap = np.abs(ref_q - cur_q)
+    wasserstein = np.sum((gap[1:] + gap[:-1]) / 2 * np.diff(profile.probs)[:, None], axis=0)
+
+    # KS: в точках квантилей референса (F_ref = p) и текущих данных (F_cur = p)
+    sorted_block = np.sort(block, axis=0)
+    n = block.shape[0]
+    ks = np.empty(stop - start)
+    for j in range(stop - start):
+        cur_at_ref = np.searchsorted(sorted_block[:, j], ref_q[:, j], side="right") / n
+        ref_at_cur = np.interp(cur_q[:, j], ref_q[:, j], profile.probs)
+        ks[j] = max(np.max(np.abs(cur_at_ref - profile.probs)), np.max(np.abs(ref_at_cur - profile.probs)))
+    # Рабочая копия освобождается до номеров корзин PSI, иначе их в пике две
+    del sorted_block
+
+    cur_mass = _bin_mass(block, profile.psi_edges[:, start:stop]) + eps
+    ref_mass = profile.psi_mass[:, start:stop] + eps
+    psi = np.sum((cur_mass - ref_mass) * np.log(cur_mass / ref_mass), axis=0)
+    return wasserstein, ks, psi
+
+
+def detect_drift(profile, source, threshold=WASSERSTEIN_THRESHOLD, workers=None, memory_budget=256 << 20):
+    """Тесты дрифта для всех признаков: блоки столбцов параллельно, внутри блока - векторно"""
+    if source.feature_names != profile.feature_names:
+        raise ValueError("Признаки текущих данных не совпадают с профилем референса")
+    workers = budget_workers(source, memory_budget, workers or os.cpu_count())
+    blocks = column_blocks(source, memory_budget, workers)
+
+    def run(bounds):
+        return _drift_block(profile, source.read_columns(*bounds), *bounds)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        parts = list(executor.map(run, blocks))
+    wasserstein, ks, psi = (np.concatenate(arrays) for arrays in zip(*parts))
+    wasserstein_normed = wasserstein / np.maximum(profile.std, 1e-12)
+    effective_n = int(round(profile.n_rows * source.n_rows / (profile.n_rows + source.n_rows)))
+    ks_pvalue = kstwo.sf(ks, max(effective_n, 1))
+
+    features = {}
+    for i, name in enumerate(profile.feature_names):
+        features[name] = {
+            "wasserstein": float(wasserstein[i]),
+            "wasserstein_normed": float(wasserstein_normed[i]),
+            "ks_statistic": float(ks[i]),
+            "ks_pvalue": float(ks_pvalue[i]),
+            "psi": float(psi[i]),
+            "drift_detected": bool(wasserstein_normed[i] > threshold),
+        }
+    drifted = int(np.sum(wasserstein_normed > threshold))
+    return {
+        "features": features,
+        "n_drifted_features": drifted,
+        "share_drifted_features": drifted / len(features),
+        "dataset_drift_detected": drifted >= len(features) / 2,
+        "drift_score": float(np.mean(wasserstein_normed)),
+        "reference_rows": profile.n_rows,
+        "current_rows": source.n_rows,
+        "reference_profile_hash": profile.profile_hash,
+    }
+
+
+def _find_profile_run(client, experiment_name, profile_hash):
+    experiment = client.get_experiment_by_name(experiment_name)
+    if experiment is None:
+        return None
+    runs = client.search_runs(
+        [experiment.experiment_id],
+        filter_string=f"tags.reference_profile_hash = '{profile_hash}'",
+        max_results=1,
+    )
+    return runs[0] if runs else None
+
+
+def get_or_create_profile(source, experiment_name="Data Quality Monitoring", n_quantiles=1001,
+                          cache_dir=DEFAULT_CACHE_DIR, use_mlflow=True):
+    """Профиль по хешу: локальный кеш, затем артефакт MLflow, иначе расчет и сохранение"""
+    profile_hash = source_hash(source, n_quantiles)
+    local_path = os.path.join(cache_dir, f"{profile_hash}.npz")
+    if os.path.exists(local_path):
+        return ReferenceProfile.from_file(local_path)
+
+    client = None
+    if use_mlflow:
+        from mlflow.entities import Param
+        from mlflow.tracking import MlflowClient
+
+        client = MlflowClient()
+        run = _find_profile_run(client, experiment_name, profile_hash)
+        if run is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            downloaded = client.download_artifacts(
+                run.info.run_id, f"reference_profile/{profile_hash}.npz", cache_dir
+            )
+            os.replace(downloaded, local_path)
+            return ReferenceProfile.from_file(local_path)
+
+    profile = build_profile(source, n_quantiles, profile_hash=profile_hash)
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".npz")
+    with os.fdopen(fd, "wb") as f:
+        f.write(profile.to_bytes())
+    os.replace(tmp_path, local_path)
+
+    if client is not None:
+        experiment = client.get_experiment_by_name(experiment_name)
+        experiment_id = experiment.experiment_id if experiment else client.create_experiment(experiment_name)
+        run = client.create_run(
+            experiment_id,
+            run_name="Reference Profile",
+            tags={"reference_profile_hash": profile_hash, "analysis_tool": "drift_profile"},
+        )
+        client.log_artifact(run.info.run_id, local_path, "reference_profile")
+        client.log_batch(run.info.run_id, params=[
+            Param("n_rows", str(profile.n_rows)),
+            Param("n_features", str(len(profile.feature_names))),
+            Param("n_quantiles", str(n_quantiles)),
+        ])
+        client.set_terminated(run.info.run_id)
+    return profile
@@ -0,0 +1,248 @@
+"""Потоковая проверка дрифта на сливаемых скетчах.
+
+DriftSketch хранит по каждому признаку гистограмму на фиксированной
+сетке (bins корзин между границами референса плюс корзины выбросов) и
+моменты (count, mean, M2, min, max). Данные подаются пачками, целиком
+окно в памяти не держится. Скетчи с одинаковой сеткой складываются
+(merge), поэтому их можно считать в параллельных процессах или по
+временным окнам и сливать потом.
+
+Оценки дрифта считаются по скетчам референса и текущих данных:
+- Wasserstein: интеграл |F_ref - F_cur| по сетке, нормированный на
+  стандартное отклонение референса (как normed Wasserstein в Evidently);
+- KS: максимум |F_ref - F_cur| на границах корзин и p-value;
+- PSI: на 10 корзинах по квантилям референса, собранных из мелкой сетки.
+Погрешность CDF ограничена шириной корзины сетки, поэтому
+Wasserstein и KS приближенные.
+
+    edges = make_edges(reference, bins=512)
+    ref = DriftSketch(edges); ref.update(reference)
+    cur = DriftSketch(edges)
+    for chunk in chunks:
+        cur.update(chunk)
+    scores = drift_scores(ref, cur)
+"""
+import json
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+from scipy.stats import kstwo
+
+# Порог normed Wasserstein, при котором Evidently считает признак дрейфующим
+WASSERSTEIN_THRESHOLD = 0.1
+PSI_BINS = 10
+
+
+def make_edges(reference, bins=512, margin=0.5):
+    """Сетка по признакам: [min - margin*std, max + margin*std] референса, bins корзин"""
+    reference = np.asarray(reference, dtype=float)
+    low, high = reference.min(axis=0), reference.max(axis=0)
+    spread = np.maximum(reference.std(axis=0), 1e-12)
+    return np.linspace(low - margin * spread, high + margin * spread, bins + 1, axis=1)
+
+
+class DriftSketch:
+    def __init__(self, edges):
+        self.edges = np.asarray(edges, dtype=float)
+        n_features, n_edges = self.edges.shape
+        # Корзина 0 - ниже сетки, последняя - выше сетки
+        self.counts = np.zeros((n_features, n_edges + 1))
+        self.count = 0
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+        self.min = np.full(n_features, np.inf)
+        self.max = np.full(n_features, -np.inf)
+
+    @property
+    def n_features(self):
+        return self.edges.shape[0]
+
+    def update(self, chunk):
+        """Добавляет пачку строк (n, features) одним векторным проходом"""
+        chunk = np.asarray(chunk, dtype=float)
+        n = chunk.shape[0]
+        if n == 0:
+            return self
+        low, high = self.edges[:, 0], self.edges[:, -1]
+        bins = self.edges.shape[1] - 1
+        width = (high - low) / bins
+        index = np.floor((chunk - low) / width).astype(np.int64) + 1
+        index = np.clip(index, 0, bins + 1)
+        # Значение на правой границе сетки относится к последней корзине
+        index[chunk == high] = bins
+        offsets = np.arange(self.n_features) * (bins + 2)
+        self.counts += np.bincount(
+            (index + offsets).ravel(), minlength=self.n_features * (bins + 2)
+        ).reshape(self.n_features, bins + 2)
+
+        chunk_mean = chunk.mean(axis=0)
+        chunk_m2 = ((chunk - chunk_mean) ** 2).sum(axis=0)
+        self._merge_moments(n, chunk_mean, chunk_m2)
+        self.min = np.minimum(self.min, chunk.min(axis=0))
+        self.max = np.maximum(self.max, chunk.max(axis=0))
+        return self
+
+    def _merge_moments(self, n, mean, m2):
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self.m2 = self.m2 + m2 + delta ** 2 * (self.count * n / total)
+        self.count = total
+
+    def merge(self, other):
+        """Сливает скетч с той же сеткой (другой процесс или окно времени)"""
+        if self.edges.shape != other.edges.shape or not np.array_equal(self.edges, other.edges):
+            raise ValueError("Скетчи построены на разных сетках")
+        if other.count:
+            self.counts += other.counts
+            self._merge_moments(other.count, other.mean, other.m2)
+            self.min = np.minimum(self.min, other.min)
+            self.max = np.maximum(self.max, other.max)
+        return self
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / max(self.count - 1, 1))
+
+    def cdf(self):
+        """CDF на границах сетки, массив (features, edges)"""
+        cumulative = np.cumsum(self.counts, axis=1)[:, :-1]
+        return cumulative / max(self.count, 1)
+
+    def to_dict(self):
+        return {
+            "edges": self.edges.tolist(),
+            "counts": self.counts.tolist(),
+            "count": self.count,
+            "mean": self.mean.tolist(),
+            "m2": self.m2.tolist(),
+            "min": self.min.tolist(),
+            "max": self.max.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["edges"])
+        sketch.counts = np.asarray(data["counts"], dtype=float)
+        sketch.count = data["count"]
+        for name in ("mean", "m2", "min", "max"):
+            setattr(sketch, name, np.asarray(data[name], dtype=float))
+        return sketch
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def _psi(reference, current, bins=PSI_BINS, eps=1e-4):
+    """PSI по корзинам-квантилям референса, собранным из корзин сетки"""
+    ref_cdf = np.concatenate([reference.cdf(), np.ones((reference.n_features, 1))], axis=1)
+    cur_cdf = np.concatenate([current.cdf(), np.ones((current.n_features, 1))], axis=1)
+    scores = np.empty(reference.n_features)
+    for f in range(reference.n_features):
+        # Границы PSI - первые корзины сетки, где CDF референса достигает k/bins
+        cuts = np.unique(np.searchsorted(ref_cdf[f], np.arange(1, bins) / bins))
+        ref_mass = np.diff(np.concatenate([[0.0], ref_cdf[f][cuts], [1.0]]))
+        cur_mass = np.diff(np.concatenate([[0.0], cur_cdf[f][cuts], [1.0]]))
+        ref_mass, cur_mass = ref_mass + eps, cur_mass + eps
+        scores[f] = np.sum((cur_mass - ref_mass) * np.log(cur_mass / ref_mass))
+    return scores
+
+
+def drift_scores(reference, current, feature_names=None, threshold=WASSERSTEIN_THRESHOLD):
+    """Оценки дрифта по каждому признаку и по набору в целом"""
+    if current.count == 0 or reference.count == 0:
+        raise ValueError("Пустой скетч: нет данных для сравнения")
+    ref_cdf, cur_cdf = reference.cdf(), current.cdf()
+    width = np.diff(reference.edges, axis=1)
+    # Интеграл |F_ref - F_cur| по сетке методом трапеций
+    gap = np.abs(ref_cdf - cur_cdf)
+    wasserstein = np.sum((gap[:, :-1] + gap[:, 1:]) / 2 * width, axis=1)
+    # Масса за пределами сетки считается равномерно распределенной до min/max
+    low, high = reference.edges[:, 0], reference.edges[:, -1]
+    both_min = np.minimum(reference.min, current.min)
+    both_max = np.maximum(reference.max, current.max)
+    wasserstein += gap[:, 0] * np.maximum(low - both_min, 0) / 2
+    wasserstein += gap[:, -1] * np.maximum(both_max - high, 0) / 2
+    wasserstein_normed = wasserstein / np.maximum(reference.std, 1e-12)
+    ks = np.max(np.abs(ref_cdf - cur_cdf), axis=1)
+    effective_n = int(round(reference.count * current.count / (reference.count + current.count)))
+    ks_pvalue = kstwo.sf(ks, max(effective_n, 1))
+    psi = _psi(reference, current)
+
+    names = feature_names or [f"feature_{i}" for i in range(reference.n_features)]
+    features = {}
+    for i, name in enumerate(names):
+        features[name] = {
+            "wasserstein": float(wasserstein[i]),
+            "wasserstein_normed": float(wasserstein_normed[i]),
+            "ks_statistic": float(ks[i]),
+            "ks_pvalue": float(ks_pvalue[i]),
+            "psi": float(psi[i]),
+            "drift_detected": bool(wasserstein_normed[i] > threshold),
+        }
+    drifted = sum(feature["drift_detected"] for feature in features.values())
+    return {
+        "features": features,
+        "n_drifted_features": drifted,
+        "share_drifted_features": drifted / len(names),
+        # Набор дрейфует, если дрейфует хотя бы половина признаков (как в DataDriftPreset)
+        "dataset_drift_detected": drifted >= len(names) / 2,
+        "drift_score": float(np.mean(wasserstein_normed)),
+        "reference_rows": reference.count,
+        "current_rows": current.count,
+    }
+
+
+def _sketch_chunks(edges, chunks):
+    sketch = DriftSketch(edges)
+    for chunk in chunks:
+        sketch.update(chunk)
+    return sketch.to_dict()
+
+
+def sketch_parallel(edges, chunks, workers=4, max_in_flight=None):
+    """Строит скетч по пачкам в нескольких процессах и сливает результаты.
+
+    Пачки берутся из итератора по мере освобождения места: в работе не
+    больше max_in_flight пачек (по умолчанию 2 * workers), поэтому поток
+    целиком в памяти не оказывается.
+    """
+    max_in_flight = max_in_flight or 2 * workers
+    result = DriftSketch(edges)
+
+    def merge(futures):
+        for future in futures:
+            result.merge(DriftSketch.from_dict(future.result()))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for chunk in chunks:
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                merge(done)
+            pending.add(executor.submit(_sketch_chunks, edges, [chunk]))
+        merge(wait(pending).done)
+    return result
+
+
+def metrics_for_mlflow(scores):
+    """Плоский словарь метрик: per-feature оценки с безопасными для MLflow именами"""
+    metrics = {
+        "dataset_drift_detected": int(scores["dataset_drift_detected"]),
+        "drift_score": scores["drift_score"],
+        "n_drifted_features": scores["n_drifted_features"],
+        "share_drifted_features": scores["share_drifted_features"],
+    }
+    for name, feature in scores["features"].items():
+        key = name.replace(" (cm)", "").replace(" ", "_")
+        metrics[f"{key}_drift_score"] = feature["wasserstein_normed"]
+        metrics[f"{key}_ks_statistic"] = feature["ks_statistic"]
+        metrics[f"{key}_ks_pvalue"] = feature["ks_pvalue"]
+        metrics[f"{key}_psi"] = feature["psi"]
+    return metrics
@@ -0,0 +1,224 @@
+"""Компиляция обученного RandomForestClassifier в плоские массивы NumPy.
+
+Узлы всех деревьев складываются в общие массивы признаков, порогов и
+значений листьев, и обход идет сразу для всех пар (строка, дерево):
+max_depth шагов векторных операций без цикла по деревьям. Вероятности
+классов усредняются по деревьям так же, как в sklearn.
+
+Раскладки узлов две:
+- complete (max_depth <= MAX_COMPLETE_DEPTH): каждое дерево дополняется до
+  полного двоичного дерева, потомки узла pos - 2*pos+1 и 2*pos+2, так
+  что массивы потомков не нужны и на каждом шаге на одну выборку меньше;
+- sparse (глубокие деревья): исходные узлы с массивом потомков, листья
+  замкнуты сами на себя.
+
+Пороги хранятся в float32, округленными вниз: для признака x в float32
+x <= t ровно тогда, когда x <= float32_вниз(t), поэтому ветвления совпадают
+со sklearn, который сравнивает float32 признаки с float64 порогами.
+
+    compiled = compile_forest(model)
+    compiled.predict(X)
+    compiled.save("compiled_forest")        # набор .npy файлов
+    CompiledForest.load("compiled_forest")  # с mmap_mode="r" по умолчанию
+
+log_compiled_model() сохраняет скомпилированный лес в MLflow как модель
+pyfunc, mlflow импортируется только при вызове.
+"""
+import json
+import os
+
+import numpy as np
+
+MAX_COMPLETE_DEPTH = 12
+ARRAYS = ("feature", "threshold", "children", "value", "roots", "classes")
+
+
+def _threshold_down(threshold):
+    """Наибольшее float32, не превосходящее порог float64"""
+    rounded = threshold.astype(np.float32)
+    too_big = rounded.astype(np.float64) > threshold
+    rounded[too_big] = np.nextafter(rounded[too_big], np.float32(-np.inf))
+    return rounded
+
+
+class CompiledForest:
+    def __init__(self, layout, feature, threshold, children, value, roots, classes, max_depth, n_features):
+        self.layout = layout
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.classes = classes
+        self.max_depth = max_depth
+        self.n_features = n_features
+        self.n_trees = len(roots)
+
+    def _leaves(self, Xt):
+        """Индексы листьев в value: массив (деревья, строки). Xt - признаки по строкам (F, n)"""
+        n = Xt.shape[1]
+        flat = Xt.ravel()
+        cols = np.arange(n)[None, :]
+        if self.layout == "complete":
+            internal = 2 ** self.max_depth - 1
+            base = self.roots[:, None].astype(np.int64)
+            pos = np.zeros((self.n_trees, n), dtype=np.int64)
+            for _ in range(self.max_depth):
+                nodes = pos + base
+                right = np.take(flat, np.take(self.feature, nodes) * n + cols) > np.take(self.threshold, nodes)
+                pos = 2 * pos + 1 + right
+            # Листья полных деревьев идут подряд после внутренних узлов
+            return (pos - internal) + (np.arange(self.n_trees) * (internal + 1))[:, None]
+        nodes = np.repeat(self.roots[:, None].astype(np.int64), n, axis=1)
+        for _ in range(self.max_depth):
+            right = np.take(flat, np.take(self.feature, nodes) * n + cols) > np.take(self.threshold, nodes)
+            nodes = np.take(self.children, 2 * nodes + right)
+        return nodes
+
+    def predict_proba(self, X, chunk_size=512):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Ожидается матрица с {self.n_features} признаками")
+        n_classes = self.value.shape[1]
+        proba = np.empty((X.shape[0], n_classes))
+        # Небольшие пачки держат индексы узлов (деревья x строки) в кеше процессора
+        for start in range(0, X.shape[0], chunk_size):
+            leaves = self._leaves(np.ascontiguousarray(X[start:start + chunk_size].T))
+            for k in range(n_classes):
+                proba[start:start + chunk_size, k] = np.take(self.value[:, k], leaves).sum(axis=0)
+        return proba / self.n_trees
+
+    def predict(self, X):
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"layout": self.layout, "max_depth": self.max_depth, "n_features": self.n_features}, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode, allow_pickle=False)
+            for name in ARRAYS
+        }
+        return cls(**arrays, **meta)
+
+
+def _leaf_values(tree):
+    # В старых версиях sklearn value хранит счетчики, в новых - доли
+    counts = tree.value[:, 0, :]
+    return counts / np.maximum(counts.sum(axis=1, keepdims=True), 1e-12)
+
+
+def _compile_complete(trees, depth):
+    """Полные деревья глубины depth: узел-лист повторяется вниз до последнего уровня"""
+    internal, leaves = 2 ** depth - 1, 2 ** depth
+    n_classes = trees[0].value.shape[2]
+    feature = np.zeros((len(trees), internal), dtype=np.int32)
+    threshold = np.full((len(trees), internal), np.inf, dtype=np.float32)
+    value = np.zeros((len(trees), leaves, n_classes))
+    for t, tree in enumerate(trees):
+        tree_threshold = _threshold_down(tree.threshold)
+        tree_value = _leaf_values(tree)
+        # Узлы уровня: пары (позиция в полном дереве, узел исходного дерева)
+        level = [(0, 0)]
+        for _ in range(depth):
+            next_level = []
+            for pos, node in level:
+                left, right = tree.children_left[node], tree.children_right[node]
+                if left != -1:
+                    feature[t, pos] = tree.feature[node]
+                    threshold[t, pos] = tree_threshold[node]
+                    next_level += [(2 * pos + 1, left), (2 * pos + 2, right)]
+                else:
+                    # Порог +inf всегда ведет влево, правая копия недостижима
+                    next_level += [(2 * pos + 1, node), (2 * pos + 2, node)]
+            level = next_level
+        for pos, node in level:
+            value[t, pos - internal] = tree_value[node]
+    roots = np.arange(len(trees), dtype=np.int32) * internal
+    return feature.ravel(), threshold.ravel(), np.empty(0, dtype=np.int32), value.reshape(-1, n_classes), roots
+
+
+def _compile_sparse(trees):
+    feature, threshold, children, value, roots = [], [], [], [], []
+    offset = 0
+    for tree in trees:
+        nodes = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+        # Лист указывает сам на себя и сравнивает признак 0 с +inf
+        feature.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        threshold.append(np.where(is_leaf, np.float32(np.inf), _threshold_down(tree.threshold)))
+        pairs = np.empty(2 * tree.node_count, dtype=np.int32)
+        pairs[0::2] = np.where(is_leaf, nodes, tree.children_left) + offset
+        pairs[1::2] = np.where(is_leaf, nodes, tree.children_right) + offset
+        children.append(pairs)
+        value.append(_leaf_values(tree))
+        roots.append(offset)
+        offset += tree.node_count
+    return (
+        np.concatenate(feature),
+        np.concatenate(threshold).astype(np.float32),
+        np.concatenate(children),
+        np.concatenate(value),
+        np.asarray(roots, dtype=np.int32),
+    )
+
+
+def compile_forest(model):
+    """Упаковывает деревья обученного леса (RandomForest/ExtraTrees Classifier) в общие массивы"""
+    if not hasattr(model, "estimators_") or not hasattr(model, "classes_"):
+        raise ValueError("Нужен обученный лес-классификатор sklearn")
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise ValueError("Поддерживаются только модели с одним выходом")
+
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    max_depth = max(tree.max_depth for tree in trees)
+    layout = "complete" if max_depth <= MAX_COMPLETE_DEPTH else "sparse"
+    if layout == "complete":
+        feature, threshold, children, value, roots = _compile_complete(trees, max_depth)
+    else:
+        feature, threshold, children, value, roots = _compile_sparse(trees)
+    return CompiledForest(
+        layout=layout,
+        feature=feature,
+        threshold=threshold,
+        children=children,
+        value=value,
+        roots=roots,
+        classes=np.asarray(model.classes_),
+        max_depth=int(max_depth),
+        n_features=int(model.n_features_in_),
+    )
+
+
+def log_compiled_model(model, artifact_path="compiled_model", registered_model_name=None):
+    """Логирует скомпилированный лес в активный run как модель MLflow pyfunc"""
+    import tempfile
+
+    import mlflow
+    import mlflow.pyfunc
+
+    class CompiledForestModel(mlflow.pyfunc.PythonModel):
+        def load_context(self, context):
+            from forest_compiler import CompiledForest
+            self.forest = CompiledForest.load(context.artifacts["forest"])
+
+        def predict(self, context, model_input, params=None):
+            return self.forest.predict(np.asarray(model_input))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        forest_dir = os.path.join(tmp, "forest")
+        compile_forest(model).save(forest_dir)
+        return mlflow.pyfunc.log_model(
+            artifact_path,
+            python_model=CompiledForestModel(),
+            artifacts={"forest": forest_dir},
+            code_paths=[os.path.abspath(__file__)],
+            registered_model_name=registered_model_name,
+        )
@@ -0,0 +1,171 @@
+import mlflow
+from artifact_store import log_model
+from sklearn.datasets import load_iris
+from sklearn.model_selection import train_test_split, StratifiedKFold
+# HalvingRandomSearchCV пока экспериментальный в sklearn
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import HalvingRandomSearchCV
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.svm import SVC
+from sklearn.metrics import accuracy_score
+from scipy.stats import loguniform, randint
+import argparse
+import os
+
+print("=== Поиск гиперпараметров (successive halving) ===")
+
+TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI", "http://127.0.0.1:5000")
+EXPERIMENT_NAME = "Iris Hyperparameter Search"
+
+# Пространства поиска для моделей из train_multiple_runs.py.
+# resource - чем измеряется бюджет кандидата на каждом раунде halving:
+# число деревьев у леса, доля обучающей выборки у остальных моделей
+SEARCH_SPACES = {
+    "RandomForest": {
+        "estimator": RandomForestClassifier(random_state=42),
+        "space": {
+            "max_depth": [2, 3, 4, 5, 8, None],
+            "min_samples_leaf": randint(1, 10),
+            "max_features": ["sqrt", "log2", None],
+        },
+        "resource": "n_estimators",
+        "min_resources": 10,
+        "max_resources": 300,
+    },
+    "LogisticRegression": {
+        "estimator": LogisticRegression(max_iter=1000, random_state=42),
+        "space": {
+            "C": loguniform(1e-3, 1e2),
+        },
+        "resource": "n_samples",
+        "min_resources": 30,
+        "max_resources": "auto",
+    },
+    "SVM": {
+        "estimator": SVC(random_state=42),
+        "space": {
+            "C": loguniform(1e-2, 1e2),
+            "gamma": loguniform(1e-3, 1e1),
+            "kernel": ["rbf", "linear"],
+        },
+        "resource": "n_samples",
+        "min_resources": 30,
+        "max_resources": "auto",
+    },
+}
+
+def run_search(model_type, X_train, y_train, n_candidates, factor, n_jobs, seed):
+    """Successive halving: слабые кандидаты отсеиваются на малом бюджете"""
+    spec = SEARCH_SPACES[model_type]
+    search = HalvingRandomSearchCV(
+        spec["estimator"],
+        spec["space"],
+        n_candidates=n_candidates,
+        factor=factor,
+        resource=spec["resource"],
+        min_resources=spec["min_resources"],
+        max_resources=spec["max_resources"],
+        cv=StratifiedKFold(n_splits=5, shuffle=True, random_state=seed),
+        scoring="accuracy",
+        refit=True,
+        # Кандидаты и фолды CV считаются параллельно во всех ядрах
+        n_jobs=n_jobs,
+        random_state=seed,
+    )
+    search.fit(X_train, y_train)
+    return search
+
+def log_candidates(model_type, search):
+    """Каждый кандидат каждого раунда - дочерний run внутри родительского"""
+    results = search.cv_results_
+    for i in range(len(results["params"])):
+        params = {key: str(value) for key, value in results["params"][i].items()}
+        with mlflow.start_run(run_name=f"{model_type}_iter{results['iter'][i]}_{i}", nested=True):
+            mlflow.log_params({**params, "model_type": model_type})
+            mlflow.log_metrics({
+                "cv_accuracy": results["mean_test_score"][i],
+                "cv_accuracy_std": results["std_test_score"][i],
+                "halving_iter": results["iter"][i],
+                "n_resources": results["n_resources"][i],
+                "fit_time": results["mean_fit_time"][i],
+            })
+            mlflow.set_tag("resource", SEARCH_SPACES[model_type]["resource"])
+
+def hyperparameter_search(model_types, n_candidates=32, factor=3, n_jobs=-1, seed=42,
+                          registered_model_name="Iris_Best_Model"):
+    # Загружаем данные
+    iris = load_iris()
+    X_train, X_test, y_train, y_test = train_test_split(
+        iris.data, iris.target, test_size=0.3, random_state=42, stratify=iris.target
+    )
+
+    mlflow.set_tracking_uri(TRACKING_URI)
+    mlflow.set_experiment(EXPERIMENT_NAME)
+
+    best = None
+    with mlflow.start_run(run_name="Hyperparameter Search"):
+        mlflow.log_params({
+            "model_types": ",".join(model_types),
+            "n_candidates": n_candidates,
+            "halving_factor": factor,
+            "cv_folds": 5,
+            "seed": seed,
+        })
+
+        for model_type in model_types:
+            print(f"\nПоиск для {model_type}...")
+            search = run_search(model_type, X_train, y_train, n_candidates, factor, n_jobs, seed)
+            log_candidates(model_type, search)
+
+            test_accuracy = accuracy_score(y_test, search.best_estimator_.predict(X_test))
+            mlflow.log_metrics({
+                f"{model_type}_best_cv_accuracy": search.best_score_,
+                f"{model_type}_test_accuracy": test_accuracy,
+                f"{model_type}_evaluated_candidates": len(search.cv_results_["params"]),
+            })
+            print(f"   Раундов: {search.n_iterations_}, кандидатов: {len(search.cv_results_['params'])}")
+            print(f"   Лучшие параметры: {search.best_params_}")
+            print(f"   CV accuracy: {search.best_score_:.4f}, test accuracy: {test_accuracy:.4f}")
+
+            if best is None or search.best_score_ > best["cv_accuracy"]:
+                best = {
+                    "model_type": model_type,
+                    "model": search.best_estimator_,
+                    "params": search.best_params_,
+                    "cv_accuracy": search.best_score_,
+                    "test_accuracy": test_accuracy,
+                }
+
+        # Регистрируем лучшую модель, как train_iris.py регистрирует Iris_RandomForest
+        mlflow.log_params({f"best_{key}": str(value) for key, value in best["params"].items()})
+        mlflow.log_param("best_model_type", best["model_type"])
+        mlflow.log_metrics({
+            "best_cv_accuracy": best["cv_accuracy"],
+            "best_test_accuracy": best["test_accuracy"],
+        })
+        mlflow.set_tag("search_strategy", "successive_halving")
+        # Та же лучшая модель при повторном поиске не загружается заново
+        reference = log_model(
+            best["model"],
+            "model",
+            registered_model_name=registered_model_name
+        )
+        best["model_version"] = reference.version
+
+    print("\n=== Лучшая модель ===")
+    print(f"{best['model_type']}: CV accuracy={best['cv_accuracy']:.4f}, test accuracy={best['test_accuracy']:.4f}")
+    print(f"Зарегистрирована как '{registered_model_name}' (версия {best['model_version']})")
+    return best
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Поиск гиперпараметров с successive halving")
+    parser.add_argument("--models", nargs="+", default=list(SEARCH_SPACES), choices=list(SEARCH_SPACES))
+    parser.add_argument("--candidates", type=int, default=32, help="Кандидатов в первом раунде")
+    parser.add_argument("--factor", type=int, default=3, help="Во сколько раз сокращать кандидатов за раунд")
+    parser.add_argument("--jobs", type=int, default=-1, help="Параллельных процессов (-1 - все ядра)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--register-as", default="Iris_Best_Model")
+    args = parser.parse_args()
+
+    hyperparameter_search(args.models, args.candidates, args.factor, args.jobs, args.seed, args.register_as)
@@ -0,0 +1,213 @@
+"""Локальный кеш моделей из MLflow Model Registry.
+
+Версия модели в registry неизменна, поэтому скачивать и распаковывать
+ее при каждом запуске незачем. При первой загрузке артефакт скачивается,
+по его файлам считается sha256, и модель сохраняется через joblib:
+
+    ~/.cache/mlflow-models/<name>/<version>/<checksum>/model.joblib
+    ~/.cache/mlflow-models/<name>/<version>/<checksum>/compiled/   (только лес)
+    ~/.cache/mlflow-models/<name>/<version>/<checksum>/manifest.json
+    ~/.cache/mlflow-models/<name>/<version>/current.json
+
+joblib с mmap_mode="r" отображает в память массивы NumPy, которые лежат
+в атрибутах модели (коэффициенты линейных моделей, опорные векторы SVM).
+Деревья sklearn так не работают: Tree.__setstate__ копирует массивы
+узлов, и каждый процесс держит свою копию леса. Поэтому для
+RandomForest/ExtraTrees рядом кладется лес, скомпилированный
+forest_compiler в файлы .npy; load_model(..., compiled=True) возвращает
+CompiledForest, массивы которого отображены в память, и процессы на
+одной машине делят одни и те же страницы.
+
+В manifest.json записан sha256 каждого файла записи, и при загрузке с
+диска файлы сверяются с ним: поврежденная запись скачивается заново.
+Поверх диска есть LRU в памяти процесса, так что повторный load_model
+возвращает тот же объект без проверки.
+
+    from model_cache import load_model
+    model = load_model("Iris_RandomForest", 1)
+    forest = load_model("Iris_RandomForest", 1, compiled=True)
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import joblib
+import mlflow
+import mlflow.sklearn
+import mlflow.artifacts
+
+from forest_compiler import CompiledForest, compile_forest
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "mlflow-models")
+MODEL_FILE = "model.joblib"
+COMPILED_DIR = "compiled"
+MANIFEST_FILE = "manifest.json"
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def artifact_checksum(path):
+    """sha256 по относительным путям и содержимому всех файлов артефакта"""
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for filename in sorted(files):
+            full_path = os.path.join(root, filename)
+            digest.update(os.path.relpath(full_path, path).encode("utf-8"))
+            with open(full_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_entry(model, path):
+    """Кладет в каталог модель joblib, скомпилированный лес (если это лес) и manifest"""
+    joblib.dump(model, os.path.join(path, MODEL_FILE))
+    try:
+        compiled = compile_forest(model)
+    except ValueError:
+        compiled = None
+    # Классы-объекты не загрузить из .npy без pickle
+    if compiled is not None and compiled.classes.dtype != object:
+        compiled.save(os.path.join(path, COMPILED_DIR))
+    manifest = {}
+    for root, dirs, files in os.walk(path):
+        for filename in files:
+            full_path = os.path.join(root, filename)
+            manifest[os.path.relpath(full_path, path)] = file_checksum(full_path)
+    with open(os.path.join(path, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, sort_keys=True)
+
+
+def verify_entry(path):
+    """True, если manifest есть и все файлы записи совпадают с ним"""
+    try:
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        return bool(manifest) and all(
+            file_checksum(os.path.join(path, relative)) == checksum for relative, checksum in manifest.items()
+        )
+    except (OSError, ValueError):
+        return False
+
+
+class ModelCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_loaded=8, mmap_mode="r"):
+        self.cache_dir = cache_dir
+        self.max_loaded = max_loaded
+        self.mmap_mode = mmap_mode
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _version_dir(self, name, version):
+        return os.path.join(self.cache_dir, name, str(version))
+
+    def _read_current(self, name, version):
+        try:
+            with open(os.path.join(self._version_dir(name, version), "current.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _download(self, name, version):
+        """Скачивает версию из registry и кладет ее в кеш атомарно"""
+        version_dir = self._version_dir(name, version)
+        os.makedirs(version_dir, exist_ok=True)
+        download_dir = tempfile.mkdtemp(dir=version_dir, prefix=".download-")
+        try:
+            local_path = mlflow.artifacts.download_artifacts(
+                artifact_uri=f"models:/{name}/{version}", dst_path=download_dir
+            )
+            checksum = artifact_checksum(local_path)
+            model = mlflow.sklearn.load_model(local_path)
+
+            entry_dir = os.path.join(version_dir, checksum)
+            if not verify_entry(entry_dir):
+                staging = tempfile.mkdtemp(dir=version_dir, prefix=".staging-")
+                write_entry(model, staging)
+                if os.path.exists(entry_dir):
+                    # Поврежденная запись уходит в сторону; открытые mmap дочитают свои файлы
+                    trash = tempfile.mkdtemp(dir=version_dir, prefix=".corrupt-")
+                    try:
+                        os.rename(entry_dir, os.path.join(trash, checksum))
+                    except OSError:
+                        pass
+                    shutil.rmtree(trash, ignore_errors=True)
+                try:
+                    os.rename(staging, entry_dir)
+                except OSError:
+                    # Другой процесс успел положить ту же версию
+                    shutil.rmtree(staging, ignore_errors=True)
+
+            meta = {"name": name, "version": str(version), "checksum": checksum, "cached_at": time.time()}
+            fd, meta_path = tempfile.mkstemp(dir=version_dir, prefix=".current-")
+            with os.fdopen(fd, "w") as f:
+                json.dump(meta, f)
+            os.replace(meta_path, os.path.join(version_dir, "current.json"))
+            return meta
+        finally:
+            shutil.rmtree(download_dir, ignore_errors=True)
+
+    def load(self, name, version, compiled=False):
+        """Модель sklearn или, с compiled=True, скомпилированный лес с массивами в mmap"""
+        key = (name, str(version), compiled)
+        with self._lock:
+            if key in self._loaded:
+                self._loaded.move_to_end(key)
+                self.hits += 1
+                return self._loaded[key]
+
+        meta = self._read_current(name, version)
+        entry_dir = meta and os.path.join(self._version_dir(name, version), meta["checksum"])
+        if meta is not None and verify_entry(entry_dir):
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            meta = self._download(name, version)
+            entry_dir = os.path.join(self._version_dir(name, version), meta["checksum"])
+        if compiled:
+            if not os.path.isdir(os.path.join(entry_dir, COMPILED_DIR)):
+                raise ValueError(f"Модель '{name}' версии {version} не лес: скомпилированной копии нет")
+            model = CompiledForest.load(os.path.join(entry_dir, COMPILED_DIR), mmap_mode=self.mmap_mode)
+        else:
+            model = joblib.load(os.path.join(entry_dir, MODEL_FILE), mmap_mode=self.mmap_mode)
+
+        with self._lock:
+            self._loaded[key] = model
+            self._loaded.move_to_end(key)
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+        return model
+
+    def checksum(self, name, version):
+        meta = self._read_current(name, version)
+        return meta["checksum"] if meta else None
+
+    def clear_memory(self):
+        with self._lock:
+            self._loaded.clear()
+
+
+_default_cache = None
+
+
+def load_model(name, version, cache_dir=None, compiled=False):
+    """Модель из registry через общий для процесса кеш"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ModelCache(cache_dir or os.getenv("MLFLOW_MODEL_CACHE", DEFAULT_CACHE_DIR))
+    return _default_cache.load(name, version, compiled=compiled)
@@ -0,0 +1,255 @@
+"""Стоимость получения модели: время, CPU и память по этапам run.
+
+RunProfiler оборачивает тело run и меряет этапы (fit, predict,
+serialization, upload и любые другие): время по часам, процессорное
+время процесса и пик RSS. При выходе все уходит в активный run одним
+log_metrics и одним set_tags:
+
+    profile_<stage>_seconds, profile_<stage>_cpu_seconds, profile_<stage>_peak_rss_mb
+    profile_total_seconds, profile_cpu_seconds, profile_peak_rss_mb
+    теги profile.stages, profile.peak_stage, profile.rss_source, ...
+
+Пик RSS по этапу на Linux честный: перед этапом счетчик VmHWM
+сбрасывается через /proc/self/clear_refs. Где это недоступно,
+берется ru_maxrss - пик за всю жизнь процесса, и тег rss_source
+об этом говорит.
+
+С sample=True в отдельном потоке работает сэмплирующий профилировщик:
+раз в interval секунд снимается стек главного потока. Стеки сохраняются
+в формате folded (flamegraph.pl, speedscope) и сводкой самых частых
+функций в артефакт profile/.
+
+    with mlflow.start_run():
+        with RunProfiler(sample=True) as profiler:
+            with profiler.stage("fit"):
+                model.fit(X, y)
+
+Модули, которые сами не знают о профилировщике (artifact_store),
+отмечают этапы через stage(): внутри активного RunProfiler это этап,
+без него - пустой контекст.
+"""
+import collections
+import contextlib
+import os
+import platform
+import re
+import sys
+import tempfile
+import threading
+import time
+
+import mlflow
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_active = threading.local()
+
+
+def _read_hwm():
+    """Пик RSS в байтах с момента последнего сброса VmHWM, или None"""
+    try:
+        with open("/proc/self/status") as f:
+            match = re.search(r"VmHWM:\s+(\d+)\s+kB", f.read())
+        return int(match.group(1)) * 1024 if match else None
+    except OSError:
+        return None
+
+
+def _reset_hwm():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _maxrss():
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # На macOS ru_maxrss в байтах, на Linux в килобайтах
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class StackSampler:
+    """Сэмплирующий профилировщик главного потока на sys._current_frames"""
+
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.main_thread().ident
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="run-profiler-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self, top=30):
+        """Функции по доле сэмплов, в которых они на вершине стека (self) и где угодно в стеке (total)"""
+        own, total = collections.Counter(), collections.Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        lines = [f"Сэмплов: {self.samples}, интервал: {self.interval * 1000:.1f} мс", "", f"{'self':>7}{'total':>8}  функция"]
+        for frame, count in own.most_common(top):
+            lines.append(f"{count / max(self.samples, 1):>7.1%}{total[frame] / max(self.samples, 1):>8.1%}  {frame}")
+        return "\n".join(lines) + "\n"
+
+
+class RunProfiler:
+    def __init__(self, sample=False, interval=0.005, log_to_mlflow=True, prefix="profile"):
+        self.sample = sample
+        self.interval = interval
+        self.log_to_mlflow = log_to_mlflow
+        self.prefix = prefix
+        self.stages = collections.OrderedDict()
+        self.total_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_rss = 0
+        self.sampler = None
+        self._open = []
+        self._hwm = _read_hwm() is not None and _reset_hwm()
+
+    @property
+    def rss_source(self):
+        return "VmHWM" if self._hwm else "ru_maxrss"
+
+    def _checkpoint(self):
+        """Переносит текущий пик RSS во все открытые этапы и в общий пик"""
+        peak = _read_hwm() if self._hwm else _maxrss()
+        for frame in self._open:
+            frame["peak_rss"] = max(frame["peak_rss"], peak)
+        self.peak_rss = max(self.peak_rss, peak)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Этап run; повторные этапы с тем же именем суммируются, пик RSS - максимум"""
+        self._checkpoint()
+        if self._hwm:
+            _reset_hwm()
+        frame = {"peak_rss": 0}
+        self._open.append(frame)
+        started, cpu_started = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            cpu_seconds = time.process_time() - cpu_started
+            self._checkpoint()
+            self._open.remove(frame)
+            stats = self.stages.setdefault(name, {"seconds": 0.0, "cpu_seconds": 0.0, "peak_rss": 0, "calls": 0})
+            stats["seconds"] += seconds
+            stats["cpu_seconds"] += cpu_seconds
+            stats["peak_rss"] = max(stats["peak_rss"], frame["peak_rss"])
+            stats["calls"] += 1
+
+    def __enter__(self):
+        self._previous = getattr(_active, "profiler", None)
+        _active.profiler = self
+        if self.sample:
+            self.sampler = StackSampler(self.interval).start()
+        self._started, self._cpu_started = time.perf_counter(), time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.total_seconds = time.perf_counter() - self._started
+        self.cpu_seconds = time.process_time() - self._cpu_started
+        self._checkpoint()
+        _active.profiler = self._previous
+        if self.sampler is not None:
+            self.sampler.stop()
+        if self.log_to_mlflow and mlflow.active_run() is not None:
+            self.log()
+        return False
+
+    def metrics(self):
+        mb = 1024 * 1024
+        metrics = {
+            f"{self.prefix}_total_seconds": self.total_seconds,
+            f"{self.prefix}_cpu_seconds": self.cpu_seconds,
+            f"{self.prefix}_peak_rss_mb": self.peak_rss / mb,
+        }
+        for name, stats in self.stages.items():
+            metrics[f"{self.prefix}_{name}_seconds"] = stats["seconds"]
+            metrics[f"{self.prefix}_{name}_cpu_seconds"] = stats["cpu_seconds"]
+            metrics[f"{self.prefix}_{name}_peak_rss_mb"] = stats["peak_rss"] / mb
+        return metrics
+
+    def tags(self):
+        peak_stage = max(self.stages, key=lambda name: self.stages[name]["peak_rss"], default="")
+        return {
+            f"{self.prefix}.stages": ",".join(self.stages),
+            f"{self.prefix}.peak_stage": peak_stage,
+            f"{self.prefix}.rss_source": self.rss_source,
+            f"{self.prefix}.cpu_count": str(os.cpu_count()),
+            f"{self.prefix}.platform": platform.platform(),
+            f"{self.prefix}.python": platform.python_version(),
+            f"{self.prefix}.sampled": str(self.sampler is not None).lower(),
+        }
+
+    def log(self):
+        """Метрики, теги и (если был сэмплинг) стеки в активный run"""
+        mlflow.log_metrics(self.metrics())
+        mlflow.set_tags(self.tags())
+        if self.sampler is not None and self.sampler.samples:
+            with tempfile.TemporaryDirectory() as tmp:
+                with open(os.path.join(tmp, "stacks.folded"), "w") as f:
+                    f.write(self.sampler.folded())
+                with open(os.path.join(tmp, "summary.txt"), "w") as f:
+                    f.write(self.sampler.summary())
+                mlflow.log_artifacts(tmp, self.prefix)
+
+    def report(self):
+        lines = [f"{'этап':<16}{'время, с':>10}{'CPU, с':>10}{'пик RSS, МБ':>14}"]
+        for name, stats in self.stages.items():
+            lines.append(
+                f"{name:<16}{stats['seconds']:>10.3f}{stats['cpu_seconds']:>10.3f}"
+                f"{stats['peak_rss'] / (1024 * 1024):>14.1f}"
+            )
+        lines.append(
+            f"{'всего':<16}{self.total_seconds:>10.3f}{self.cpu_seconds:>10.3f}"
+            f"{self.peak_rss / (1024 * 1024):>14.1f}"
+        )
+        return "\n".join(lines)
+
+
+def current_profiler():
+    return getattr(_active, "profiler", None)
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Этап активного RunProfiler этого потока; без профилировщика ничего не делает"""
+    profiler = current_profiler()
+    if profiler is None:
+        yield
+        return
+    with profiler.stage(name):
+        yield
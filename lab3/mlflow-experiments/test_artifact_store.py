@@ -0,0 +1,129 @@
+from sklearn.datasets import load_iris
+from sklearn.ensemble import RandomForestClassifier
+import mlflow
+import mlflow.sklearn
+import numpy as np
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import os
+import urllib.request
+
+from artifact_store import TRAINING_RUN_TAG, ArtifactStore, log_model
+
+print("=== Проверка контентно-адресуемого хранения моделей ===")
+
+def train_model(n_estimators=20):
+    iris = load_iris()
+    model = RandomForestClassifier(n_estimators=n_estimators, max_depth=3, random_state=42)
+    return model.fit(iris.data, iris.target), iris
+
+def count_files(path):
+    return sum(len(files) for _, _, files in os.walk(path))
+
+def use_tracking(tmp, tracking_uri=None):
+    """Tracking URI и эксперимент теста с артефактами во временном каталоге"""
+    mlflow.set_tracking_uri(tracking_uri or f"sqlite:///{tmp}/mlflow.db")
+    mlflow.set_experiment(experiment_id=mlflow.create_experiment(
+        "Artifact Store Test", artifact_location=f"file://{tmp}/runs"
+    ))
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(tmp):
+    """Настоящий mlflow server на SQLite; возвращает (процесс, URI)"""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "mlflow", "server",
+         "--backend-store-uri", f"sqlite:///{tmp}/server.db",
+         "--default-artifact-root", f"file://{tmp}/server-artifacts",
+         "--host", "127.0.0.1", "--port", str(port), "--workers", "1"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    uri = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{uri}/health", timeout=1):
+                return process, uri
+        except OSError:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("mlflow server не запустился")
+
+def test_identical_models_are_stored_once():
+    """Повторное обучение той же модели не загружает новую копию и не создает версию"""
+    with tempfile.TemporaryDirectory() as tmp:
+        use_tracking(tmp)
+        store = ArtifactStore(artifact_location=f"file://{tmp}/artifacts")
+
+        refs = []
+        for _ in range(2):
+            model, iris = train_model()
+            with mlflow.start_run() as run:
+                refs.append(log_model(model, "model", registered_model_name="Iris_Test", store=store))
+        files_after_two_runs = count_files(f"{tmp}/artifacts")
+
+        assert refs[0].sha256 == refs[1].sha256
+        assert [ref.reused for ref in refs] == [False, True]
+        assert refs[0].uri == refs[1].uri
+        assert refs[0].version == refs[1].version == "1"
+        assert mlflow.get_run(run.info.run_id).data.tags["artifact.model.uri"] == refs[0].uri
+
+        # Кеш процесса не влияет: новый экземпляр находит копию поиском по тегу
+        model, iris = train_model()
+        with mlflow.start_run():
+            assert log_model(model, "model", store=ArtifactStore(artifact_location=f"file://{tmp}/other")).reused
+        assert count_files(f"{tmp}/artifacts") == files_after_two_runs
+
+        loaded = mlflow.sklearn.load_model("models:/Iris_Test/1")
+        assert np.array_equal(loaded.predict(iris.data), model.predict(iris.data))
+    print("   Одинаковые модели хранятся в одной копии: OK")
+
+def test_different_models_get_new_copies():
+    """Другая модель получает свой хеш, свою копию и новую версию"""
+    with tempfile.TemporaryDirectory() as tmp:
+        use_tracking(tmp)
+        store = ArtifactStore(artifact_location=f"file://{tmp}/artifacts")
+
+        with mlflow.start_run():
+            first = log_model(train_model(20)[0], "model", registered_model_name="Iris_Test", store=store)
+            second = log_model(train_model(30)[0], "model", registered_model_name="Iris_Test", store=store)
+
+        assert first.sha256 != second.sha256
+        assert not first.reused and not second.reused
+        assert (first.version, second.version) == ("1", "2")
+        assert count_files(f"{tmp}/artifacts") > 0
+    print("   Разные модели хранятся отдельно: OK")
+
+def test_register_through_tracking_server():
+    """Сервер принимает версию: run_id - run хранилища, run обучения в теге"""
+    with tempfile.TemporaryDirectory() as tmp:
+        process, uri = start_server(tmp)
+        try:
+            use_tracking(tmp, uri)
+            with mlflow.start_run() as run:
+                ref = log_model(train_model()[0], "model", registered_model_name="Iris_Server_Test")
+
+            version = mlflow.MlflowClient().get_model_version("Iris_Server_Test", ref.version)
+            assert version.run_id == ref.store_run_id != run.info.run_id
+            assert version.tags[TRAINING_RUN_TAG] == run.info.run_id
+            assert ref.uri.startswith(f"file://{tmp}/server-artifacts")
+            iris = load_iris()
+            loaded = mlflow.sklearn.load_model(f"models:/Iris_Server_Test/{ref.version}")
+            assert np.array_equal(loaded.predict(iris.data), train_model()[0].predict(iris.data))
+        finally:
+            process.terminate()
+            process.wait()
+    print("   Регистрация через mlflow server: OK")
+
+if __name__ == "__main__":
+    test_identical_models_are_stored_once()
+    test_different_models_get_new_copies()
+    test_register_through_tracking_server()
+    print("=== Проверка завершена! ===")
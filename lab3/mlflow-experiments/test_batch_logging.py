@@ -0,0 +1,112 @@
+import pytest
+import threading
+import time
+
+from batch_logging import (
+    MAX_ENTITIES_PER_BATCH,
+    MAX_METRICS_PER_BATCH,
+    MAX_PARAMS_PER_BATCH,
+    MAX_TAGS_PER_BATCH,
+    BatchLogger,
+)
+
+print("=== Проверка буферизованного логирования ===")
+
+class FakeClient:
+    """log_batch в память; первые failures вызовов падают"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def log_batch(self, run_id, metrics=(), params=(), tags=()):
+        with self.lock:
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("tracking сервер недоступен")
+            self.batches.append((list(metrics), list(params), list(tags)))
+
+    def sent(self, index):
+        return [entity.key for batch in self.batches for entity in batch[index]]
+
+def test_batches_respect_log_batch_limits():
+    """Ни одна пачка не превышает лимиты log_batch, и все записи доходят"""
+    client = FakeClient()
+    with BatchLogger(run_id="run", client=client, max_batch=5000, flush_interval=60) as logger:
+        logger.log_metrics({f"m{i}": i for i in range(2500)})
+        logger.log_params({f"p{i}": i for i in range(250)})
+        logger.set_tags({f"t{i}": i for i in range(150)})
+
+    for metrics, params, tags in client.batches:
+        assert len(metrics) <= MAX_METRICS_PER_BATCH
+        assert len(params) <= MAX_PARAMS_PER_BATCH
+        assert len(tags) <= MAX_TAGS_PER_BATCH
+        assert len(metrics) + len(params) + len(tags) <= MAX_ENTITIES_PER_BATCH
+    assert client.sent(0) == [f"m{i}" for i in range(2500)]
+    assert client.sent(1) == [f"p{i}" for i in range(250)]
+    assert client.sent(2) == [f"t{i}" for i in range(150)]
+    print("   Лимиты log_batch: OK")
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+def test_failed_batch_is_requeued():
+    """Неотправленная пачка возвращается в начало буфера и уходит первой"""
+    client = FakeClient(failures=1)
+    logger = BatchLogger(run_id="run", client=client, flush_interval=60)
+    logger.log_metrics({f"first{i}": i for i in range(5)})
+    with pytest.raises(ConnectionError):
+        logger.flush()
+    logger.log_metrics({f"second{i}": i for i in range(5)})
+
+    logger.close()
+    assert client.sent(0) == [f"first{i}" for i in range(5)] + [f"second{i}" for i in range(5)]
+    print("   Повтор неотправленной пачки: OK")
+
+def test_background_thread_retries_with_backoff():
+    """После ошибки фоновый поток не останавливается и досылает пачку после паузы"""
+    client = FakeClient(failures=2)
+    logger = BatchLogger(run_id="run", client=client, max_batch=10, flush_interval=60, retry_delay=0.01)
+    logger.log_metrics({f"m{i}": i for i in range(10)})
+    wait_for(lambda: client.batches)
+    assert logger._thread.is_alive() and logger._error is None
+
+    logger.log_metrics({f"n{i}": i for i in range(10)})
+    wait_for(lambda: len(client.batches) == 2)
+    logger.close()
+    assert client.sent(0) == [f"m{i}" for i in range(10)] + [f"n{i}" for i in range(10)]
+    print("   Фоновый повтор с паузой: OK")
+
+def test_close_raises_while_server_is_down():
+    """Если сервер так и не ответил, close() пробрасывает ошибку, записи остаются в буфере"""
+    client = FakeClient(failures=1000)
+    logger = BatchLogger(run_id="run", client=client, max_batch=5, flush_interval=60, retry_delay=0.01)
+    logger.log_metrics({f"m{i}": i for i in range(5)})
+    wait_for(lambda: logger._error is not None)
+
+    with pytest.raises(ConnectionError):
+        logger.close()
+    assert [metric.key for metric in logger._metrics] == [f"m{i}" for i in range(5)]
+    assert client.batches == []
+    print("   close() при недоступном сервере: OK")
+
+def test_exit_keeps_exception_from_body():
+    """Ошибка отправки при выходе не подменяет исключение из тела with"""
+    client = FakeClient(failures=1)
+    with pytest.raises(ValueError), pytest.warns(RuntimeWarning):
+        with BatchLogger(run_id="run", client=client, flush_interval=60) as logger:
+            logger.log_metric("accuracy", 0.9)
+            raise ValueError("ошибка в скрипте")
+    print("   Исключение из тела with: OK")
+
+if __name__ == "__main__":
+    test_batches_respect_log_batch_limits()
+    test_failed_batch_is_requeued()
+    test_background_thread_retries_with_backoff()
+    test_close_raises_while_server_is_down()
+    test_exit_keeps_exception_from_body()
+    print("=== Проверка завершена! ===")
@@ -0,0 +1,36 @@
+import os
+import sys
+import tempfile
+
+import check_data_drift
+
+print("=== Проверка отчета о дрифте ===")
+
+def test_report_is_rendered_from_scores():
+    """Карточки и строки признаков в HTML отчете берутся из посчитанных оценок"""
+    assert "evidently" not in sys.modules
+    reference = check_data_drift.generate_reference_data()
+    current = reference.copy()
+    current["petal length (cm)"] += 1.5
+    current["petal width (cm)"] += 1.0
+    scores = check_data_drift.compute_streaming_drift(reference, current)
+    scores["engine"] = "streaming"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = check_data_drift.create_detailed_html_report(scores, os.path.join(tmp, "report.html"))
+        with open(path, encoding="utf-8") as f:
+            report = f.read()
+
+    drifted = [name for name, feature in scores["features"].items() if feature["drift_detected"]]
+    assert drifted == ["petal length (cm)", "petal width (cm)"]
+    assert f">{len(drifted)}/4<" in report
+    assert f">{scores['drift_score']:.2f}<" in report
+    for name, feature in scores["features"].items():
+        assert f"<td>{name}</td>" in report
+        assert f"<td>{feature['wasserstein_normed']:.2f}</td>" in report
+    assert "$" not in report
+    print("   HTML отчет по оценкам: OK")
+
+if __name__ == "__main__":
+    test_report_is_rendered_from_scores()
+    print("=== Проверка завершена! ===")
@@ -0,0 +1,107 @@
+from scipy.stats import wasserstein_distance, ks_2samp
+import numpy as np
+import pandas as pd
+import tempfile
+import tracemalloc
+import os
+
+from drift_profile import (
+    BLOCK_BYTES_PER_VALUE, COLUMN_BUFFER_BYTES, open_source, build_profile, column_blocks, detect_drift,
+    get_or_create_profile, ReferenceProfile
+)
+
+print("=== Проверка пакетного движка дрифта с профилем референса ===")
+
+def make_data(n=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    reference = rng.normal(0, 1, size=(n, 3))
+    current = np.column_stack([
+        rng.normal(0, 1, n),
+        rng.normal(0.3, 1, n),
+        rng.normal(0, 1.5, n),
+    ])
+    return reference, current
+
+def test_scores_match_exact_statistics():
+    """Оценки по профилю совпадают с точными значениями scipy"""
+    reference, current = make_data()
+    profile = build_profile(open_source(reference), workers=2)
+    scores = detect_drift(profile, open_source(current), workers=2)
+    
+    for i, feature in enumerate(scores["features"].values()):
+        assert abs(feature["wasserstein"] - wasserstein_distance(reference[:, i], current[:, i])) < 0.01
+        assert abs(feature["ks_statistic"] - ks_2samp(reference[:, i], current[:, i]).statistic) < 0.01
+    assert [feature["drift_detected"] for feature in scores["features"].values()] == [False, True, True]
+    print("   Оценки совпадают с scipy: OK")
+
+def test_out_of_core_sources_and_column_blocks():
+    """Parquet и .npy (mmap) с блоками по одному столбцу дают те же оценки"""
+    reference, current = make_data(5000, seed=1)
+    profile = build_profile(open_source(reference), workers=1)
+    expected = detect_drift(profile, open_source(current))
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        npy_path = os.path.join(tmp, "current.npy")
+        np.save(npy_path, current)
+        parquet_path = os.path.join(tmp, "current.parquet")
+        pd.DataFrame(current, columns=profile.feature_names).to_parquet(parquet_path)
+        
+        for path in (npy_path, parquet_path):
+            # Бюджет на два столбца при двух потоках: каждый блок - ровно один признак
+            scores = detect_drift(profile, open_source(path), workers=2, memory_budget=5000 * (BLOCK_BYTES_PER_VALUE + COLUMN_BUFFER_BYTES) * 2)
+            for name in profile.feature_names:
+                assert np.isclose(scores["features"][name]["psi"], expected["features"][name]["psi"])
+                assert np.isclose(scores["features"][name]["wasserstein"], expected["features"][name]["wasserstein"])
+    print("   Parquet и mmap: OK")
+
+def test_peak_memory_stays_within_budget():
+    """Пик памяти NumPy при чтении Parquet и расчете не превышает memory_budget"""
+    reference, current = make_data(50000, seed=3)
+    current = np.column_stack([current, current])
+    reference = np.column_stack([reference, reference])
+    budget = 50000 * (BLOCK_BYTES_PER_VALUE * 2 + COLUMN_BUFFER_BYTES)
+    with tempfile.TemporaryDirectory() as tmp:
+        names = [f"feature_{i}" for i in range(6)]
+        paths = []
+        for name, data in (("reference", reference), ("current", current)):
+            paths.append(os.path.join(tmp, f"{name}.parquet"))
+            pd.DataFrame(data, columns=names).to_parquet(paths[-1])
+        reference_source, current_source = (open_source(path) for path in paths)
+        assert len(column_blocks(current_source, budget, workers=1)) == 3
+
+        for workers in (1, 2, 4):
+            tracemalloc.start()
+            try:
+                profile = build_profile(reference_source, workers=workers, memory_budget=budget)
+                _, profile_peak = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                detect_drift(profile, current_source, workers=workers, memory_budget=budget)
+                _, drift_peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            # Сверх бюджета - только массивы профиля (n_quantiles x признаки) и их копии в результатах
+            profile_bytes = profile.quantiles.nbytes * 4
+            assert profile_peak <= budget + profile_bytes and drift_peak <= budget + profile_bytes
+    print("   Пик памяти в бюджете: OK")
+
+def test_profile_is_cached_by_hash():
+    """Повторный вызов на тех же данных загружает профиль из кеша по хешу"""
+    reference, _ = make_data(2000, seed=2)
+    with tempfile.TemporaryDirectory() as tmp:
+        first = get_or_create_profile(open_source(reference), cache_dir=tmp, use_mlflow=False)
+        assert os.listdir(tmp) == [f"{first.profile_hash}.npz"]
+        second = get_or_create_profile(open_source(reference), cache_dir=tmp, use_mlflow=False)
+        assert second.profile_hash == first.profile_hash
+        assert np.array_equal(second.quantiles, first.quantiles)
+        assert isinstance(ReferenceProfile.from_file(os.path.join(tmp, os.listdir(tmp)[0])), ReferenceProfile)
+        
+        changed = get_or_create_profile(open_source(reference + 1), cache_dir=tmp, use_mlflow=False)
+        assert changed.profile_hash != first.profile_hash
+    print("   Кеш профиля по хешу: OK")
+
+if __name__ == "__main__":
+    test_scores_match_exact_statistics()
+    test_out_of_core_sources_and_column_blocks()
+    test_peak_memory_stays_within_budget()
+    test_profile_is_cached_by_hash()
+    print("=== Проверка завершена! ===")
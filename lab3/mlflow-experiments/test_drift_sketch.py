@@ -0,0 +1,57 @@
+from scipy.stats import wasserstein_distance, ks_2samp
+import numpy as np
+
+from drift_sketch import DriftSketch, make_edges, drift_scores, sketch_parallel
+
+print("=== Проверка потоковых скетчей дрифта ===")
+
+def make_data():
+    rng = np.random.default_rng(0)
+    reference = rng.normal(0, 1, size=(20000, 3))
+    current = np.column_stack([
+        rng.normal(0, 1, 20000),      # без дрифта
+        rng.normal(0.3, 1, 20000),    # сдвиг среднего
+        rng.normal(0, 1.5, 20000),    # рост дисперсии
+    ])
+    return reference, current
+
+def test_scores_match_exact_statistics():
+    """Wasserstein и KS по скетчам близки к точным значениям scipy"""
+    reference, current = make_data()
+    edges = make_edges(reference)
+    scores = drift_scores(DriftSketch(edges).update(reference), DriftSketch(edges).update(current))
+    
+    for i, feature in enumerate(scores["features"].values()):
+        exact_wasserstein = wasserstein_distance(reference[:, i], current[:, i])
+        exact_ks = ks_2samp(reference[:, i], current[:, i]).statistic
+        assert abs(feature["wasserstein"] - exact_wasserstein) < 0.01
+        assert abs(feature["ks_statistic"] - exact_ks) < 0.01
+    
+    drifted = [feature["drift_detected"] for feature in scores["features"].values()]
+    assert drifted == [False, True, True]
+    print("   Оценки совпадают с scipy: OK")
+
+def test_chunked_and_merged_sketches_are_identical():
+    """Пачки, слияние окон и параллельные процессы дают тот же скетч"""
+    reference, current = make_data()
+    edges = make_edges(reference)
+    whole = DriftSketch(edges).update(current)
+    
+    windows = [DriftSketch(edges).update(chunk) for chunk in np.array_split(current, 7)]
+    merged = windows[0]
+    for window in windows[1:]:
+        merged.merge(window)
+    parallel = sketch_parallel(edges, np.array_split(current, 8), workers=2)
+    # Генератор читается лениво, в работе не больше одной пачки на процесс
+    streamed = sketch_parallel(edges, (chunk for chunk in np.array_split(current, 20)), workers=2, max_in_flight=2)
+    
+    for sketch in (merged, parallel, streamed):
+        assert np.array_equal(sketch.counts, whole.counts)
+        assert np.allclose(sketch.mean, whole.mean)
+        assert np.allclose(sketch.std, current.std(axis=0, ddof=1))
+    print("   Слияние скетчей: OK")
+
+if __name__ == "__main__":
+    test_scores_match_exact_statistics()
+    test_chunked_and_merged_sketches_are_identical()
+    print("=== Проверка завершена! ===")
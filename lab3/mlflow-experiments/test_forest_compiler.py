@@ -0,0 +1,78 @@
+from sklearn.datasets import load_iris, make_classification
+from sklearn.ensemble import RandomForestClassifier, ExtraTreesClassifier
+import mlflow
+import mlflow.pyfunc
+import numpy as np
+import tempfile
+
+from forest_compiler import compile_forest, CompiledForest, log_compiled_model
+
+print("=== Проверка скомпилированного леса на совпадение с sklearn ===")
+
+def check_parity(model, X):
+    compiled = compile_forest(model)
+    assert np.array_equal(compiled.predict(X), model.predict(X))
+    assert np.allclose(compiled.predict_proba(X), model.predict_proba(X))
+    return compiled
+
+def test_iris_random_forest_parity():
+    """Модель как в train_iris.py: предсказания и вероятности совпадают"""
+    iris = load_iris()
+    model = RandomForestClassifier(n_estimators=100, max_depth=5, random_state=42)
+    model.fit(iris.data, iris.target)
+    
+    # Исходные данные и зашумленные строки, уходящие в другие листья
+    rng = np.random.default_rng(0)
+    X = np.vstack([iris.data, iris.data + rng.normal(0, 0.3, iris.data.shape)])
+    compiled = check_parity(model, X)
+    assert compiled.layout == "complete"
+    print("   Iris RandomForest: OK")
+
+def test_deep_forest_parity_and_mmap_roundtrip():
+    """Глубокие деревья, строковые классы, сохранение и загрузка через mmap"""
+    X, y = make_classification(n_samples=3000, n_features=20, n_informative=10, n_classes=4, random_state=1)
+    labels = np.array(["a", "b", "c", "d"])[y]
+    model = ExtraTreesClassifier(n_estimators=30, random_state=1).fit(X, labels)
+    compiled = check_parity(model, X)
+    # Деревья без ограничения глубины компилируются в раскладку с потомками
+    assert compiled.layout == "sparse"
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        compiled.save(tmp)
+        loaded = CompiledForest.load(tmp)
+        assert isinstance(loaded.threshold, np.memmap)
+        assert np.array_equal(loaded.predict(X), model.predict(X))
+    print("   ExtraTrees (4 класса, mmap): OK")
+
+def test_single_row():
+    """Одна строка - основной режим онлайн-инференса"""
+    iris = load_iris()
+    model = RandomForestClassifier(n_estimators=10, random_state=0).fit(iris.data, iris.target)
+    compiled = compile_forest(model)
+    for row in iris.data[::15]:
+        assert compiled.predict(row.reshape(1, -1))[0] == model.predict(row.reshape(1, -1))[0]
+    print("   Одиночные строки: OK")
+
+def test_logged_pyfunc_matches_sklearn():
+    """Лес, залогированный как pyfunc, загружается обратно и предсказывает как sklearn"""
+    iris = load_iris()
+    model = RandomForestClassifier(n_estimators=20, max_depth=4, random_state=7).fit(iris.data, iris.target)
+    with tempfile.TemporaryDirectory() as tmp:
+        mlflow.set_tracking_uri(f"sqlite:///{tmp}/mlflow.db")
+        mlflow.set_experiment(experiment_id=mlflow.create_experiment(
+            "Compiled Forest Test", artifact_location=f"file://{tmp}/artifacts"
+        ))
+        with mlflow.start_run():
+            info = log_compiled_model(model, registered_model_name="Iris_Compiled_Test")
+
+        for uri in (info.model_uri, "models:/Iris_Compiled_Test/1"):
+            loaded = mlflow.pyfunc.load_model(uri)
+            assert np.array_equal(np.asarray(loaded.predict(iris.data)), model.predict(iris.data))
+    print("   pyfunc из MLflow: OK")
+
+if __name__ == "__main__":
+    test_iris_random_forest_parity()
+    test_deep_forest_parity_and_mmap_roundtrip()
+    test_single_row()
+    test_logged_pyfunc_matches_sklearn()
+    print("=== Проверка завершена! ===")
@@ -0,0 +1,45 @@
+import mlflow
+import mlflow.sklearn
+import tempfile
+
+import hyperparameter_search
+
+print("=== Проверка поиска гиперпараметров ===")
+
+def test_search_logs_candidates_and_registers_best():
+    """Короткий поиск на временном SQLite: дочерние run, лучшая модель в registry"""
+    with tempfile.TemporaryDirectory() as tmp:
+        tracking_uri = f"sqlite:///{tmp}/mlflow.db"
+        previous_uri = hyperparameter_search.TRACKING_URI
+        hyperparameter_search.TRACKING_URI = tracking_uri
+        try:
+            mlflow.set_tracking_uri(tracking_uri)
+            experiment_id = mlflow.create_experiment(
+                hyperparameter_search.EXPERIMENT_NAME, artifact_location=f"file://{tmp}/artifacts"
+            )
+            mlflow.create_experiment("Artifact Store", artifact_location=f"file://{tmp}/store")
+
+            best = hyperparameter_search.hyperparameter_search(
+                ["LogisticRegression"], n_candidates=4, factor=2, n_jobs=1,
+                registered_model_name="Iris_Search_Test"
+            )
+        finally:
+            hyperparameter_search.TRACKING_URI = previous_uri
+
+        assert best["model_type"] == "LogisticRegression"
+        assert best["model_version"] == "1"
+
+        runs = mlflow.search_runs([experiment_id], output_format="list")
+        parent = next(run for run in runs if run.info.run_name == "Hyperparameter Search")
+        children = [run for run in runs if run.data.tags.get("mlflow.parentRunId") == parent.info.run_id]
+        assert len(children) == len(runs) - 1 >= 4
+        assert parent.data.metrics["best_cv_accuracy"] == best["cv_accuracy"]
+        assert parent.data.tags["artifact.model.uri"].startswith(f"file://{tmp}/store")
+
+        loaded = mlflow.sklearn.load_model("models:/Iris_Search_Test/1")
+        assert type(loaded) is type(best["model"])
+    print("   Поиск, дочерние run и регистрация: OK")
+
+if __name__ == "__main__":
+    test_search_logs_candidates_and_registers_best()
+    print("=== Проверка завершена! ===")
@@ -3,12 +3,15 @@ import mlflow.sklearn
 from sklearn.datasets import load_iris
 import pandas as pd
 import numpy as np
+import os
+from batch_logging import BatchLogger
+from model_cache import load_model
 
 print("=== Тестирование зарегистрированной модели ===")
 
 def test_registered_model():
     # Настраиваем MLflow
-    mlflow.set_tracking_uri("http://127.0.0.1:5000")
+    mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI", "http://127.0.0.1:5000"))
     
     # Загружаем тестовые данные
     iris = load_iris()
@@ -20,7 +23,8 @@ def test_registered_model():
     model_version = 1
     
     try:
-        model = mlflow.sklearn.load_model(f"models:/{model_name}/{model_version}")
+        # Версия неизменна: после первой загрузки модель берется из локального кеша
+        model = load_model(model_name, model_version)
         print(f"   Модель '{model_name}' версии {model_version} успешно загружена")
     except Exception as e:
         print(f"   ОШИБКА при загрузке модели: {e}")
@@ -38,16 +42,18 @@ def test_registered_model():
     # Логируем тестовый запуск в MLflow
     print("4. Логируем результаты тестирования...")
     with mlflow.start_run(run_name="Model Testing"):
-        mlflow.log_param("test_samples", len(X_test))
-        mlflow.log_metric("test_accuracy", np.sum(predictions == y_true) / len(y_true))
-        mlflow.log_param("model_name", model_name)
-        mlflow.log_param("model_version", model_version)
-        mlflow.set_tag("test_type", "deployment_test")
-        
-        # Логируем пример предсказаний
-        for i, (true, pred) in enumerate(zip(y_true, predictions)):
-            mlflow.log_metric(f"sample_{i}_true", true)
-            mlflow.log_metric(f"sample_{i}_pred", pred)
+        # Все параметры и метрики уходят пачками через log_batch
+        with BatchLogger() as logger:
+            logger.log_param("test_samples", len(X_test))
+            logger.log_metric("test_accuracy", np.sum(predictions == y_true) / len(y_true))
+            logger.log_param("model_name", model_name)
+            logger.log_param("model_version", model_version)
+            logger.set_tag("test_type", "deployment_test")
+            
+            # Логируем пример предсказаний
+            for i, (true, pred) in enumerate(zip(y_true, predictions)):
+                logger.log_metric(f"sample_{i}_true", true)
+                logger.log_metric(f"sample_{i}_pred", pred)
     
     print("=== Тестирование завершено! ===")
 
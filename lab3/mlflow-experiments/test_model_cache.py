@@ -0,0 +1,82 @@
+from sklearn.datasets import load_iris
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+import mlflow
+import numpy as np
+import os
+import pytest
+import tempfile
+
+from artifact_store import log_model
+from forest_compiler import CompiledForest
+from model_cache import COMPILED_DIR, MODEL_FILE, ModelCache
+
+print("=== Проверка локального кеша моделей ===")
+
+def register(tmp, model, name):
+    mlflow.set_tracking_uri(f"sqlite:///{tmp}/mlflow.db")
+    if mlflow.get_experiment_by_name("Artifact Store") is None:
+        mlflow.create_experiment("Artifact Store", artifact_location=f"file://{tmp}/store")
+    with mlflow.start_run():
+        return log_model(model, "model", registered_model_name=name)
+
+def test_compiled_forest_is_memory_mapped():
+    """Лес из кеша загружается скомпилированным, массивы отображены в память"""
+    iris = load_iris()
+    model = RandomForestClassifier(n_estimators=20, max_depth=4, random_state=42).fit(iris.data, iris.target)
+    with tempfile.TemporaryDirectory() as tmp:
+        register(tmp, model, "Iris_Cache_Test")
+        first = ModelCache(os.path.join(tmp, "cache"))
+        first.load("Iris_Cache_Test", 1)
+        assert first.misses == 1
+
+        # Новый процесс берет запись с диска
+        cache = ModelCache(os.path.join(tmp, "cache"))
+        forest = cache.load("Iris_Cache_Test", 1, compiled=True)
+        assert isinstance(forest, CompiledForest)
+        assert isinstance(forest.threshold, np.memmap) and isinstance(forest.value, np.memmap)
+        assert np.array_equal(forest.predict(iris.data), model.predict(iris.data))
+        assert cache.load("Iris_Cache_Test", 1, compiled=True) is forest
+        assert (cache.misses, cache.disk_hits, cache.hits) == (0, 1, 1)
+    print("   Скомпилированный лес через mmap: OK")
+
+def test_corrupted_entry_is_downloaded_again():
+    """Файл записи, не совпадающий с manifest, не загружается, а скачивается заново"""
+    iris = load_iris()
+    model = RandomForestClassifier(n_estimators=10, max_depth=3, random_state=1).fit(iris.data, iris.target)
+    with tempfile.TemporaryDirectory() as tmp:
+        register(tmp, model, "Iris_Cache_Test")
+        cache_dir = os.path.join(tmp, "cache")
+        ModelCache(cache_dir).load("Iris_Cache_Test", 1)
+        checksum = ModelCache(cache_dir).checksum("Iris_Cache_Test", 1)
+        entry_dir = os.path.join(cache_dir, "Iris_Cache_Test", "1", checksum)
+        for relative in (MODEL_FILE, os.path.join(COMPILED_DIR, "threshold.npy")):
+            with open(os.path.join(entry_dir, relative), "r+b") as f:
+                f.seek(-1, os.SEEK_END)
+                last = f.read(1)
+                f.seek(-1, os.SEEK_END)
+                f.write(bytes([last[0] ^ 0xFF]))
+
+            cache = ModelCache(cache_dir)
+            loaded = cache.load("Iris_Cache_Test", 1, compiled=relative != MODEL_FILE)
+            assert (cache.misses, cache.disk_hits) == (1, 0)
+            assert np.array_equal(loaded.predict(iris.data), model.predict(iris.data))
+    print("   Поврежденная запись: OK")
+
+def test_compiled_requires_forest():
+    """Для моделей, которые не лес, скомпилированной копии нет"""
+    iris = load_iris()
+    model = LogisticRegression(max_iter=200).fit(iris.data, iris.target)
+    with tempfile.TemporaryDirectory() as tmp:
+        register(tmp, model, "Iris_Linear_Test")
+        cache = ModelCache(os.path.join(tmp, "cache"))
+        assert np.array_equal(cache.load("Iris_Linear_Test", 1).predict(iris.data), model.predict(iris.data))
+        with pytest.raises(ValueError):
+            cache.load("Iris_Linear_Test", 1, compiled=True)
+    print("   Модель без леса: OK")
+
+if __name__ == "__main__":
+    test_compiled_forest_is_memory_mapped()
+    test_corrupted_entry_is_downloaded_again()
+    test_compiled_requires_forest()
+    print("=== Проверка завершена! ===")
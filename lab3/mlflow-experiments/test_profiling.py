@@ -0,0 +1,81 @@
+import mlflow
+import numpy as np
+import tempfile
+import time
+
+from profiling import RunProfiler, stage
+
+print("=== Проверка профилирования этапов run ===")
+
+def busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+def allocate(mb):
+    block = np.ones(mb * 1024 * 1024 // 8)
+    return float(block.sum())
+
+def test_stages_time_cpu_and_memory():
+    """Сон не тратит CPU, счет тратит, а пик памяти виден в том этапе, где он был"""
+    with RunProfiler(log_to_mlflow=False) as profiler:
+        with profiler.stage("sleep"):
+            time.sleep(0.2)
+        with profiler.stage("busy"):
+            busy(0.2)
+        with profiler.stage("allocate"):
+            allocate(200)
+        with profiler.stage("busy"):
+            busy(0.1)
+
+    stages = profiler.stages
+    assert stages["sleep"]["seconds"] >= 0.2 and stages["sleep"]["cpu_seconds"] < 0.05
+    assert stages["busy"]["calls"] == 2 and stages["busy"]["cpu_seconds"] > 0.2
+    assert list(stages) == ["sleep", "busy", "allocate"]
+
+    mb = 1024 * 1024
+    if profiler.rss_source == "VmHWM":
+        # Пик считается по каждому этапу отдельно
+        assert stages["allocate"]["peak_rss"] - stages["sleep"]["peak_rss"] > 150 * mb
+        assert profiler.tags()["profile.peak_stage"] == "allocate"
+    assert profiler.peak_rss >= stages["allocate"]["peak_rss"]
+    assert profiler.total_seconds >= 0.5
+    print("   Время, CPU и пик памяти по этапам: OK")
+
+def test_module_stage_and_sampler():
+    """stage() без профилировщика ничего не делает, с ним - пишет в активный, стеки собираются"""
+    with stage("outside"):
+        pass
+
+    with RunProfiler(sample=True, interval=0.002, log_to_mlflow=False) as profiler:
+        with stage("busy"):
+            busy(0.2)
+
+    assert list(profiler.stages) == ["busy"]
+    assert profiler.sampler.samples > 20
+    assert "busy (test_profiling.py" in profiler.sampler.folded()
+    assert "busy (test_profiling.py" in profiler.sampler.summary()
+    print("   Этапы из модулей и сэмплирование: OK")
+
+def test_logged_to_active_run():
+    """Метрики, теги и стеки попадают в активный run"""
+    with tempfile.TemporaryDirectory() as tmp:
+        mlflow.set_tracking_uri(f"sqlite:///{tmp}/mlflow.db")
+        experiment_id = mlflow.create_experiment("Profiling Test", artifact_location=f"file://{tmp}/artifacts")
+        with mlflow.start_run(experiment_id=experiment_id) as run, RunProfiler(sample=True) as profiler:
+            with profiler.stage("fit"):
+                busy(0.05)
+
+        data = mlflow.get_run(run.info.run_id).data
+        assert data.metrics["profile_fit_seconds"] >= 0.05
+        assert {"profile_total_seconds", "profile_cpu_seconds", "profile_peak_rss_mb"} <= set(data.metrics)
+        assert data.tags["profile.stages"] == "fit"
+        artifacts = {a.path for a in mlflow.MlflowClient().list_artifacts(run.info.run_id, "profile")}
+        assert artifacts == {"profile/stacks.folded", "profile/summary.txt"}
+    print("   Логирование в MLflow: OK")
+
+if __name__ == "__main__":
+    test_stages_time_cpu_and_memory()
+    test_module_stage_and_sampler()
+    test_logged_to_active_run()
+    print("=== Проверка завершена! ===")
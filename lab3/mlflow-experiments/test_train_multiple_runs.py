@@ -0,0 +1,39 @@
+import mlflow
+import tempfile
+
+import train_multiple_runs
+
+print("=== Проверка параллельного обучения нескольких моделей ===")
+
+def test_parallel_results_follow_models_config():
+    """Результаты пула процессов идут в порядке models_config и совпадают с записанными run"""
+    with tempfile.TemporaryDirectory() as tmp:
+        tracking_uri = f"sqlite:///{tmp}/mlflow.db"
+        previous_uri = train_multiple_runs.TRACKING_URI
+        # Процессы пула наследуют модуль при fork, поэтому URI подменяется в нем
+        train_multiple_runs.TRACKING_URI = tracking_uri
+        try:
+            mlflow.set_tracking_uri(tracking_uri)
+            experiment_id = mlflow.create_experiment(
+                train_multiple_runs.EXPERIMENT_NAME, artifact_location=f"file://{tmp}/artifacts"
+            )
+            mlflow.create_experiment("Artifact Store", artifact_location=f"file://{tmp}/store")
+
+            results = train_multiple_runs.train_multiple_models(workers=2)
+        finally:
+            train_multiple_runs.TRACKING_URI = previous_uri
+
+        names = [config["name"] for config in train_multiple_runs.get_models_config()]
+        assert [result["model"] for result in results] == names
+
+        runs = mlflow.search_runs([experiment_id], output_format="list")
+        accuracy = {run.info.run_name: run.data.metrics["accuracy"] for run in runs}
+        assert sorted(accuracy) == sorted(names)
+        for result in results:
+            assert result["accuracy"] == accuracy[result["model"]]
+            assert result["fit_seconds"] > 0
+    print("   Порядок результатов параллельного режима: OK")
+
+if __name__ == "__main__":
+    test_parallel_results_follow_models_config()
+    print("=== Проверка завершена! ===")
@@ -1,10 +1,13 @@
 import mlflow
 import mlflow.sklearn
+from artifact_store import log_model
+from profiling import RunProfiler
 from sklearn.datasets import load_iris
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score
 import pandas as pd
+import argparse
 import os
 
 # Для обхода SSL ошибок (временно)
@@ -12,7 +15,7 @@ os.environ['MLFLOW_TRACKING_INSECURE_TLS'] = 'true'
 
 print("start training")
 
-def train_iris_model():
+def train_iris_model(sample=False):
     iris = load_iris()
     X = iris.data
     y = iris.target
@@ -23,11 +26,12 @@ def train_iris_model():
         X, y, test_size=0.3, random_state=42
     )
 
-    # Используем правильный URI
-    mlflow.set_tracking_uri("http://127.0.0.1:5000")
+    # Используем правильный URI (MLFLOW_TRACKING_URI переопределяет сервер, например для бенчмарка)
+    mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI", "http://127.0.0.1:5000"))
     mlflow.set_experiment("Iris Classification")
     
-    with mlflow.start_run():
+    # Время, CPU и пик памяти по этапам уходят в run как метрики profile_*
+    with mlflow.start_run(), RunProfiler(sample=sample) as profiler:
 
         n_estimators = 100
         max_depth = 5
@@ -37,8 +41,10 @@ def train_iris_model():
             max_depth=max_depth,
             random_state=42
         )
-        model.fit(X_train, y_train)
-        y_pred = model.predict(X_test)
+        with profiler.stage("fit"):
+            model.fit(X_train, y_train)
+        with profiler.stage("predict"):
+            y_pred = model.predict(X_test)
         accuracy = accuracy_score(y_test, y_pred)
 
         mlflow.log_param("n_estimators", n_estimators)
@@ -47,17 +53,22 @@ def train_iris_model():
 
         mlflow.log_metric("accuracy", accuracy)
 
-        mlflow.sklearn.log_model(model, "random_forest_model")
         mlflow.set_tag("model_type", "RandomForest")
         mlflow.set_tag("problem_type", "classification")
 
         print(f"Model trained with accuracy: {accuracy:.4f}")
 
-        mlflow.sklearn.log_model(
+        # Модель сериализуется один раз и загружается, только если такой копии еще нет
+        reference = log_model(
             model,
             "model",
             registered_model_name="Iris_RandomForest"
         )
+        status = "reused" if reference.reused else "uploaded"
+        print(f"Model {reference.sha256[:12]} {status}, registered version: {reference.version}")
 
 if __name__ == "__main__":
-    train_iris_model()
+    parser = argparse.ArgumentParser(description="Обучение RandomForest на Iris")
+    parser.add_argument("--profile", action="store_true", help="Сохранить стеки сэмплирующего профилировщика в run")
+    args = parser.parse_args()
+    train_iris_model(args.profile)
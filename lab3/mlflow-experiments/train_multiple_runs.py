@@ -1,5 +1,7 @@
 import mlflow
 import mlflow.sklearn
+from artifact_store import log_model
+from profiling import RunProfiler
 from sklearn.datasets import load_iris
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
@@ -7,24 +9,18 @@ from sklearn.linear_model import LogisticRegression
 from sklearn.svm import SVC
 from sklearn.metrics import accuracy_score, precision_score, recall_score
 import numpy as np
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
 
 print("=== Сравнение нескольких моделей ===")
 
-def train_multiple_models():
-    # Загружаем данные
-    iris = load_iris()
-    X = iris.data
-    y = iris.target
-    
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.3, random_state=42
-    )
-    
-    mlflow.set_tracking_uri("http://127.0.0.1:5000")
-    mlflow.set_experiment("Iris Model Comparison")
-    
+TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI", "http://127.0.0.1:5000")
+EXPERIMENT_NAME = "Iris Model Comparison"
+
+def get_models_config():
     # Пробуем разные модели и параметры
-    models_config = [
+    return [
         {
             "name": "RandomForest_100_5",
             "model": RandomForestClassifier(n_estimators=100, max_depth=5, random_state=42),
@@ -46,52 +42,108 @@ def train_multiple_models():
             "params": {"model_type": "SVM", "kernel": "rbf", "C": 1.0}
         }
     ]
+
+def train_and_log(config, X_train, X_test, y_train, y_test, sample=False):
+    """Обучает одну конфигурацию в отдельном MLflow run и возвращает ее метрики"""
+    # В дочернем процессе настройки MLflow не унаследованы
+    mlflow.set_tracking_uri(TRACKING_URI)
+    mlflow.set_experiment(EXPERIMENT_NAME)
     
-    results = []
+    print(f"\nОбучаем модель: {config['name']}")
     
-    for config in models_config:
-        print(f"\nОбучаем модель: {config['name']}")
-        
-        with mlflow.start_run(run_name=config["name"]):
-            # Обучаем модель
-            model = config["model"]
+    # Кроме качества в run попадает стоимость модели: время, CPU и пик памяти по этапам
+    with mlflow.start_run(run_name=config["name"]), RunProfiler(sample=sample) as profiler:
+        # Обучаем модель
+        model = config["model"]
+        with profiler.stage("fit"):
             model.fit(X_train, y_train)
-            
-            # Предсказания и метрики
+        
+        # Предсказания и метрики
+        with profiler.stage("predict"):
             y_pred = model.predict(X_test)
-            accuracy = accuracy_score(y_test, y_pred)
-            
-            # Для многоклассовой классификации используем macro averaging
-            precision = precision_score(y_test, y_pred, average='macro')
-            recall = recall_score(y_test, y_pred, average='macro')
-            
-            # Логируем параметры
-            for param_name, param_value in config["params"].items():
-                mlflow.log_param(param_name, param_value)
-            
-            # Логируем метрики
-            mlflow.log_metric("accuracy", accuracy)
-            mlflow.log_metric("precision", precision)
-            mlflow.log_metric("recall", recall)
-            mlflow.log_metric("train_samples", len(X_train))
-            mlflow.log_metric("test_samples", len(X_test))
-            
-            # Логируем модель
-            mlflow.sklearn.log_model(model, "model")
-            
-            results.append({
-                "model": config["name"],
-                "accuracy": accuracy,
-                "precision": precision,
-                "recall": recall
-            })
-            
-            print(f"   Accuracy: {accuracy:.4f}, Precision: {precision:.4f}, Recall: {recall:.4f}")
+        accuracy = accuracy_score(y_test, y_pred)
+        
+        # Для многоклассовой классификации используем macro averaging
+        precision = precision_score(y_test, y_pred, average='macro')
+        recall = recall_score(y_test, y_pred, average='macro')
+        
+        # Логируем параметры и метрики одним запросом
+        mlflow.log_params(config["params"])
+        mlflow.log_metrics({
+            "accuracy": accuracy,
+            "precision": precision,
+            "recall": recall,
+            "train_samples": len(X_train),
+            "test_samples": len(X_test)
+        })
+        
+        # Логируем модель: одинаковые модели хранятся в одной копии
+        log_model(model, "model")
+        
+        print(f"   {config['name']}: Accuracy: {accuracy:.4f}, Precision: {precision:.4f}, Recall: {recall:.4f}")
+    
+    stages = profiler.stages
+    return {
+        "model": config["name"],
+        "accuracy": accuracy,
+        "precision": precision,
+        "recall": recall,
+        "fit_seconds": stages["fit"]["seconds"],
+        "predict_seconds": stages["predict"]["seconds"],
+        "peak_rss_mb": profiler.peak_rss / (1024 * 1024)
+    }
+
+def train_multiple_models(workers=1, sample=False):
+    # Загружаем данные
+    iris = load_iris()
+    X = iris.data
+    y = iris.target
+    
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.3, random_state=42
+    )
+    
+    mlflow.set_tracking_uri(TRACKING_URI)
+    mlflow.set_experiment(EXPERIMENT_NAME)
+    
+    models_config = get_models_config()
+    data = (X_train, X_test, y_train, y_test)
+    
+    if workers > 1:
+        # Обучение, метрики и загрузка артефактов идут параллельно в процессах;
+        # map возвращает результаты в порядке models_config
+        workers = min(workers, len(models_config))
+        print(f"Параллельный режим: {workers} процессов")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(
+                train_and_log, models_config, *[[part] * len(models_config) for part in data],
+                [sample] * len(models_config)
+            ))
+    else:
+        results = [train_and_log(config, *data, sample=sample) for config in models_config]
     
     # Выводим сравнение результатов
     print("\n=== Сравнение моделей ===")
     for result in sorted(results, key=lambda x: x["accuracy"], reverse=True):
-        print(f"{result['model']}: Accuracy={result['accuracy']:.4f}")
+        print(
+            f"{result['model']}: Accuracy={result['accuracy']:.4f}, "
+            f"fit={result['fit_seconds'] * 1000:.1f} мс, predict={result['predict_seconds'] * 1000:.2f} мс, "
+            f"пик RSS={result['peak_rss_mb']:.1f} МБ"
+        )
+    
+    return results
 
 if __name__ == "__main__":
-    train_multiple_models()
+    parser = argparse.ArgumentParser(description="Сравнение нескольких моделей на Iris")
+    parser.add_argument(
+        "--parallel", action="store_true",
+        help="Обучать конфигурации параллельно в пуле процессов по числу ядер"
+    )
+    parser.add_argument("--workers", type=int, default=None, help="Число процессов для --parallel")
+    parser.add_argument("--profile", action="store_true", help="Сохранить стеки сэмплирующего профилировщика в каждый run")
+    args = parser.parse_args()
+    
+    workers = 1
+    if args.parallel:
+        workers = args.workers or os.cpu_count() or 1
+    train_multiple_models(workers, args.profile)